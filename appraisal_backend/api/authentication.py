@@ -1,13 +1,39 @@
 import logging
 from time import perf_counter
 
+from django.conf import settings
+from django.db import router
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from core.models import TokenUser
+from core.services.metrics import Histogram
+from core.services.revocation import current_generation
 
 logger = logging.getLogger("api.performance")
+AUTH_SECONDS = Histogram(
+    "auth_jwt_duration_seconds",
+    "Time spent authenticating a request's JWT.",
+    ["outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+# Claims LoginSerializer.get_token adds; tokens without them (issued before
+# stateless mode existed) are authenticated with a user lookup instead.
+STATELESS_CLAIMS = ("username", "role", "must_change_password", "gen")
 
 
 class PasswordChangeEnforcedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that blocks users who must change their password.
+
+    With settings.JWT_STATELESS the user is built from the token claims
+    (a core.models.TokenUser) instead of being loaded from the database;
+    tokens are revoked by bumping the user's token generation
+    (core.services.revocation).
+    """
+
     ALLOWED_PATHS = {
         "/api/token/",
         "/api/token/refresh/",
@@ -20,14 +46,43 @@ class PasswordChangeEnforcedJWTAuthentication(JWTAuthentication):
         "/api/me/",
     }
 
+    def get_user(self, validated_token):
+        if not getattr(settings, "JWT_STATELESS", False):
+            return super().get_user(validated_token)
+        if any(claim not in validated_token for claim in STATELESS_CLAIMS):
+            return super().get_user(validated_token)
+
+        user_id = TokenUser._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        generation = current_generation(user_id)
+        if generation is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if validated_token["gen"] != generation:
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+        claims = {
+            "id": user_id,
+            "username": validated_token["username"],
+            "role": validated_token["role"],
+            "must_change_password": validated_token["must_change_password"],
+            # Deactivating a user bumps the token generation (core.signals),
+            # so a token that passed the check above belongs to an active user.
+            "is_active": True,
+            "token_generation": generation,
+        }
+        # from_db() expects values in field order; the rest stay deferred.
+        fields = [field.attname for field in TokenUser._meta.concrete_fields if field.attname in claims]
+        return TokenUser.from_db(router.db_for_read(TokenUser), fields, [claims[name] for name in fields])
+
     def authenticate(self, request):
         started = perf_counter()
         result = super().authenticate(request)
         if not result:
-            logger.info(
+            duration = perf_counter() - started
+            AUTH_SECONDS.observe(duration, outcome="anonymous")
+            logger.debug(
                 "auth.jwt_timing path=%s authenticated=false total_ms=%.2f",
                 request.path,
-                (perf_counter() - started) * 1000,
+                duration * 1000,
             )
             return None
 
@@ -39,20 +94,26 @@ class PasswordChangeEnforcedJWTAuthentication(JWTAuthentication):
             and path.startswith("/api/")
             and path not in self.ALLOWED_PATHS
         ):
-            logger.info(
-                "auth.jwt_timing path=%s user_id=%s role=%s blocked=must_change_password total_ms=%.2f",
+            duration = perf_counter() - started
+            AUTH_SECONDS.observe(duration, outcome="blocked")
+            logger.debug(
+                "auth.jwt_timing path=%s user_id=%s role=%s stateless=%s blocked=must_change_password total_ms=%.2f",
                 path,
                 getattr(user, "id", None),
                 getattr(user, "role", None),
-                (perf_counter() - started) * 1000,
+                isinstance(user, TokenUser),
+                duration * 1000,
             )
             raise AuthenticationFailed("Password change required")
 
-        logger.info(
-            "auth.jwt_timing path=%s user_id=%s role=%s authenticated=true total_ms=%.2f",
+        duration = perf_counter() - started
+        AUTH_SECONDS.observe(duration, outcome="stateless" if isinstance(user, TokenUser) else "authenticated")
+        logger.debug(
+            "auth.jwt_timing path=%s user_id=%s role=%s stateless=%s authenticated=true total_ms=%.2f",
             path,
             getattr(user, "id", None),
             getattr(user, "role", None),
-            (perf_counter() - started) * 1000,
+            isinstance(user, TokenUser),
+            duration * 1000,
         )
         return user, validated_token
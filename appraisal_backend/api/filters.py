@@ -0,0 +1,44 @@
+from core.models import Appraisal
+from workflow.states import States
+
+ALL_STATES = {value for key, value in vars(States).items() if key.isupper()}
+FORM_TYPES = {value for value, _ in Appraisal.FORM_TYPE_CHOICES}
+
+
+def filter_appraisals(queryset, params, allow_department=True):
+    """
+    Apply the optional list filters from the query string:
+      status         comma-separated workflow states
+      academic_year  exact match, e.g. 2024-25
+      form_type      SPPU / PBAS / FACULTY
+      department     department id or name (principal queues only)
+    Raises ValueError for unknown values so callers can answer 400.
+    """
+    status = params.get("status")
+    if status:
+        statuses = [s.strip().upper() for s in status.split(",") if s.strip()]
+        unknown = sorted(set(statuses) - ALL_STATES)
+        if unknown:
+            raise ValueError(f"Unknown status: {', '.join(unknown)}")
+        queryset = queryset.filter(status__in=statuses)
+
+    academic_year = params.get("academic_year")
+    if academic_year:
+        queryset = queryset.filter(academic_year=academic_year.strip())
+
+    form_type = params.get("form_type")
+    if form_type:
+        form_type = form_type.strip().upper()
+        if form_type not in FORM_TYPES:
+            raise ValueError(f"form_type must be one of: {', '.join(sorted(FORM_TYPES))}")
+        queryset = queryset.filter(form_type=form_type)
+
+    department = params.get("department")
+    if department and allow_department:
+        department = department.strip()
+        if department.isdigit():
+            queryset = queryset.filter(department_id=int(department))
+        else:
+            queryset = queryset.filter(department__department_name__iexact=department)
+
+    return queryset
@@ -1,37 +1,287 @@
 import logging
+import random
+import re
+import threading
+from collections import Counter as Tally
 from time import perf_counter
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from core.services.metrics import Counter, Histogram
+from core.services.profiler import PROFILE_HEADER, StackSampler, save_profile, token_user_id
+
 
 logger = logging.getLogger("api.performance")
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route pattern.",
+    ["method", "route", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements per sampled API request.",
+    ["route"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL per sampled API request.",
+    ["route"],
+)
+DUPLICATE_QUERIES = Counter(
+    "http_request_duplicate_queries",
+    "Repeated executions of one statement shape within a sampled request (N+1 candidates).",
+    ["route"],
+)
+
+# Statements run at least this often in one request are reported as duplicates.
+DUPLICATE_THRESHOLD = 3
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+
+
+def fingerprint(sql):
+    """Statement shape: literals and IN-lists collapsed, whitespace normalized."""
+    shape = _LITERALS.sub("?", sql)
+    shape = _IN_LIST.sub("(...)", shape)
+    return " ".join(shape.split())
+
+
+class QueryStats:
+    """connection.execute_wrapper that tallies the statements of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = (0.0, "")
+        self.shapes = Tally()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if elapsed > self.slowest[0]:
+                self.slowest = (elapsed, sql)
+            self.shapes[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return {shape: count for shape, count in self.shapes.items() if count >= DUPLICATE_THRESHOLD}
+
+
+def _sampled(setting):
+    rate = getattr(settings, setting, 0.0)
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+# Under ASGI, sync views run on the request's thread-sensitive executor
+# thread (asgiref.sync.ThreadSensitiveContext), which has its own database
+# connection; async middleware calls these through sync_to_async so they
+# act on that thread.
+def _add_execute_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
 
 
 class APIPerformanceLoggingMiddleware:
     """
     Lightweight timing middleware for API endpoints.
+
+    A SQL_STATS_SAMPLE_RATE fraction of requests also has its statements
+    counted and timed (see QueryStats); those responses carry a
+    Server-Timing header with the database share of the request.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         if not request.path.startswith("/api/"):
             return self.get_response(request)
 
+        stats = QueryStats() if _sampled("SQL_STATS_SAMPLE_RATE") else None
+        started = perf_counter()
+        if stats is None:
+            response = self.get_response(request)
+        else:
+            with connection.execute_wrapper(stats):
+                response = self.get_response(request)
+        self._record(request, response, stats, perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not request.path.startswith("/api/"):
+            return await self.get_response(request)
+
+        stats = QueryStats() if _sampled("SQL_STATS_SAMPLE_RATE") else None
         started = perf_counter()
-        response = self.get_response(request)
-        duration_ms = (perf_counter() - started) * 1000
+        if stats is None:
+            response = await self.get_response(request)
+        else:
+            await sync_to_async(_add_execute_wrapper)(stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(_remove_execute_wrapper)(stats)
+        self._record(request, response, stats, perf_counter() - started)
+        return response
 
+    def _record(self, request, response, stats, duration):
         user = getattr(request, "user", None)
         user_id = getattr(user, "id", None) if getattr(user, "is_authenticated", False) else None
         role = getattr(user, "role", None) if getattr(user, "is_authenticated", False) else None
 
-        logger.info(
+        # Label by URL pattern, not path, so ids do not multiply the series.
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match else "unmatched"
+        REQUEST_SECONDS.observe(
+            duration,
+            method=request.method,
+            route=route,
+            status=getattr(response, "status_code", "n/a"),
+        )
+        logger.debug(
             "api.request_timing method=%s path=%s status=%s duration_ms=%.2f user_id=%s role=%s",
             request.method,
             request.path,
             getattr(response, "status_code", "n/a"),
-            duration_ms,
+            duration * 1000,
             user_id,
             role,
         )
+        if stats is not None:
+            self._report_queries(request, response, route, stats, duration)
+
+    def _report_queries(self, request, response, route, stats, duration):
+        duplicates = stats.duplicates()
+        REQUEST_QUERIES.observe(stats.count, route=route)
+        REQUEST_DB_SECONDS.observe(stats.duration, route=route)
+        if duplicates:
+            DUPLICATE_QUERIES.inc(sum(count - 1 for count in duplicates.values()), route=route)
+
+        response["Server-Timing"] = (
+            f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", '
+            f"app;dur={duration * 1000:.2f}"
+        )
+        logger.info(
+            "api.sql_timing method=%s path=%s queries=%s db_ms=%.2f slowest_ms=%.2f slowest_sql=%.200s",
+            request.method,
+            request.path,
+            stats.count,
+            stats.duration * 1000,
+            stats.slowest[0] * 1000,
+            stats.slowest[1],
+        )
+        for shape, count in duplicates.items():
+            logger.warning(
+                "api.duplicate_queries method=%s route=%s count=%s sql=%.300s",
+                request.method,
+                route,
+                count,
+                shape,
+            )
+
+
+class RequestProfilerMiddleware:
+    """
+    Runs a stack-sampling profiler (core.services.profiler) around API
+    requests that carry a valid X-Profile-Token header, and around a
+    PROFILE_SAMPLE_RATE fraction of the rest. Under ASGI the sampled thread
+    is the one sync views run on.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampler(self, thread_id):
+        return StackSampler(thread_id, getattr(settings, "PROFILE_INTERVAL_SECONDS", 0.005))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith("/api/"):
+            return self.get_response(request)
+
+        token = request.headers.get(PROFILE_HEADER)
+        requested_by = token_user_id(token) if token else None
+        if requested_by is None and not _sampled("PROFILE_SAMPLE_RATE"):
+            return self.get_response(request)
+
+        sampler = self._sampler(threading.get_ident())
+        started = perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        return self._save(request, response, sampler, requested_by, perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not request.path.startswith("/api/"):
+            return await self.get_response(request)
+
+        token = request.headers.get(PROFILE_HEADER)
+        requested_by = await sync_to_async(token_user_id)(token) if token else None
+        if requested_by is None and not _sampled("PROFILE_SAMPLE_RATE"):
+            return await self.get_response(request)
+
+        sampler = self._sampler(await sync_to_async(threading.get_ident)())
+        started = perf_counter()
+        sampler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            sampler.stop()
+        return await sync_to_async(self._save)(request, response, sampler, requested_by, perf_counter() - started)
+
+    def _save(self, request, response, sampler, requested_by, duration):
+        user = getattr(request, "user", None)
+        match = getattr(request, "resolver_match", None)
+        try:
+            profile = save_profile(
+                sampler,
+                method=request.method,
+                path=request.path,
+                route=match.route if match else "unmatched",
+                status_code=getattr(response, "status_code", None),
+                user_id_snapshot=user.pk if getattr(user, "is_authenticated", False) else None,
+                requested_by=requested_by,
+                trigger="SIGNED" if requested_by is not None else "SAMPLED",
+                duration_ms=duration * 1000,
+            )
+        except Exception:
+            logger.exception("api.profile_failed method=%s path=%s", request.method, request.path)
+            return response
+
+        logger.info(
+            "api.profile method=%s path=%s profile_id=%s samples=%s duration_ms=%.2f",
+            request.method,
+            request.path,
+            profile.profile_id,
+            profile.samples,
+            duration * 1000,
+        )
+        if requested_by is not None:
+            response["X-Profile-Id"] = str(profile.profile_id)
         return response
@@ -0,0 +1,92 @@
+"""
+Keyset (cursor) pagination for appraisal queues.
+
+Pages are ordered newest first on (updated_at, appraisal_id) and the next
+page starts strictly after the last row of the previous one, so the query
+cost stays flat however deep the client scrolls, and rows inserted at the
+head of the queue do not shift later pages.
+
+updated_at is mutable, so a scroll is not a snapshot. A row not yet
+served that is updated mid-scroll moves ahead of the cursor and is
+skipped; a served row whose updated_at moves back behind the cursor (a
+restore or an import that sets it) is served again. Clients that need
+every change should restart from the first page or follow the change feed.
+
+List views opt in: with no `cursor` / `limit` query param they keep their
+legacy plain-list response.
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+ORDERING = ("-updated_at", "-appraisal_id")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def wants_pagination(request):
+    return "cursor" in request.query_params or "limit" in request.query_params
+
+
+def encode_keyset(moment, row_id):
+    """Opaque cursor for a (datetime, id) keyset position."""
+    raw = json.dumps([moment.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_keyset(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii"))
+        moment, row_id = json.loads(raw)
+        moment = parse_datetime(moment)
+        row_id = int(row_id)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor("Invalid cursor")
+    if moment is None:
+        raise InvalidCursor("Invalid cursor")
+    return moment, row_id
+
+
+def encode_cursor(appraisal):
+    return encode_keyset(appraisal.updated_at, appraisal.appraisal_id)
+
+
+def page_size(request):
+    raw = request.query_params.get("limit")
+    if raw in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise InvalidCursor("limit must be an integer")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def paginate_appraisals(queryset, request):
+    """
+    Return (rows, next_cursor) for the page requested by `cursor` / `limit`.
+    Raises InvalidCursor for malformed parameters.
+    """
+    limit = page_size(request)
+    queryset = queryset.order_by(*ORDERING)
+
+    cursor = request.query_params.get("cursor")
+    if cursor:
+        updated_at, appraisal_id = decode_keyset(cursor)
+        queryset = queryset.filter(
+            Q(updated_at__lt=updated_at)
+            | Q(updated_at=updated_at, appraisal_id__lt=appraisal_id)
+        )
+
+    # One extra row tells us whether another page exists without a COUNT(*).
+    rows = list(queryset[: limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
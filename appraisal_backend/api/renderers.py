@@ -0,0 +1,67 @@
+"""
+orjson-backed drop-ins for DRF's JSONRenderer / JSONParser.
+
+Output matches rest_framework's JSONRenderer byte for byte for the
+payloads this API returns: datetimes, dates, Decimals, UUIDs and lazy
+strings all go through DRF's own JSONEncoder.default, compact separators,
+U+2028/U+2029 escaped. Anything orjson cannot take (indent requested,
+ASCII-only output, integers beyond 64 bits, orjson not installed) falls
+back to the stock implementation, so enabling these is always safe.
+
+Enable per view with `renderer_classes` / `parser_classes`, or for every
+view with API_FAST_JSON=1 (see REST_FRAMEWORK in settings).
+"""
+
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+if orjson is not None:
+    # Datetimes go through DRF's encoder so they keep its millisecond / "Z"
+    # formatting instead of orjson's native microsecond output.
+    _DUMP_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=_DUMP_OPTIONS)
+        except TypeError:
+            # orjson.JSONEncodeError: big ints, non-string keys it cannot
+            # coerce, etc. The stock renderer handles or reports these.
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read() if stream is not None else b''
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Let the stdlib parser produce DRF's usual error message (and
+            # accept NaN/Infinity when STRICT_JSON is off).
+            return super().parse(io.BytesIO(body), media_type, parser_context)
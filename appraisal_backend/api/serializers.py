@@ -135,3 +135,28 @@ class AppraisalSerializer(serializers.ModelSerializer):
     class Meta:
         model = Appraisal
         fields = "__all__"
+
+
+class AppraisalListSerializer(serializers.ModelSerializer):
+    """
+    Queue/list representation. Excludes appraisal_data so list queries can
+    use `.only(*AppraisalListSerializer.Meta.fields)` and never load the JSON.
+    """
+
+    class Meta:
+        model = Appraisal
+        fields = (
+            "appraisal_id",
+            "faculty",
+            "hod",
+            "principal",
+            "form_type",
+            "academic_year",
+            "semester",
+            "is_hod_appraisal",
+            "status",
+            "remarks",
+            "version",
+            "created_at",
+            "updated_at",
+        )
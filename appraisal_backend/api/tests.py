@@ -1,3 +1,892 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from time import perf_counter
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.contrib import admin
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from api.authentication import PasswordChangeEnforcedJWTAuthentication
+from api.middleware import REQUEST_QUERIES, QueryStats, fingerprint
+from api.renderers import FastJSONParser, FastJSONRenderer
+from api.views.auth import LoginSerializer
+from api.urls import urlpatterns
+from core.admin import EstimatedCountPaginator, RequestProfileAdmin
+from core.models import (
+    Appraisal,
+    AppraisalScore,
+    AuditLog,
+    Department,
+    DraftBuffer,
+    FacultyProfile,
+    GeneratedPDF,
+    HODProfile,
+    RequestProfile,
+    ReviewInbox,
+    TokenUser,
+    User,
+)
+from core.services.profiler import StackSampler, issue_token, token_user_id
+from core.services.revocation import revoke_tokens
+from core.services.scope import scope_for_user
+from workflow.inbox import sync_inbox
+from workflow.states import States
+from workflow.tests import WorkflowTestMixin
+
+
+class QueuePaginationTests(WorkflowTestMixin, TestCase):
+    def _queue(self, count):
+        base = timezone.now()
+        appraisals = [
+            self._appraisal(year=f"20{10 + i}-{11 + i}", status=States.HOD_APPROVED)
+            for i in range(count)
+        ]
+        # Two rows share updated_at so the appraisal_id tie-breaker is exercised.
+        for i, appraisal in enumerate(appraisals):
+            Appraisal.objects.filter(pk=appraisal.pk).update(updated_at=base - timedelta(minutes=i // 2))
+        sync_inbox([appraisal.pk for appraisal in appraisals])
+        return appraisals
+
+    def test_principal_queue_keyset_pages_cover_every_row_once(self):
+        self._queue(5)
+        self.client.force_authenticate(self.principal)
+
+        seen = []
+        cursor = ""
+        while True:
+            response = self.client.get("/api/principal/appraisals/", {"limit": 2, "cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row["id"] for row in response.data["results"])
+            cursor = response.data["next_cursor"]
+            if not cursor:
+                break
+
+        expected = list(
+            Appraisal.objects.order_by("-updated_at", "-appraisal_id").values_list("appraisal_id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_filters_and_legacy_shape(self):
+        self._appraisal(faculty=self.outsider, status=States.HOD_APPROVED)
+        mine = self._appraisal(status=States.HOD_APPROVED, year="2030-31")
+        self.client.force_authenticate(self.principal)
+
+        response = self.client.get(
+            "/api/principal/appraisals/",
+            {"department": self.department.pk, "academic_year": "2030-31"},
+        )
+        self.assertEqual([row["id"] for row in response.data], [mine.pk])
+
+        response = self.client.get("/api/principal/appraisals/", {"status": "BOGUS"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_malformed_cursor(self):
+        self.client.force_authenticate(self.hod)
+        response = self.client.get("/api/hod/appraisals/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), "query_budgets.json")
+ROLES = ("FACULTY", "HOD", "PRINCIPAL", "ADMIN")
+GRADED = {"hod_review": {"table1_verified_teaching": "Good", "table1_verified_activities": "Good"}}
+NEW_PASSWORD = "Budget-Route-2026!"
+SUBMISSION_META = {"academic_year": "2025-26", "semester": "Odd", "form_type": "PBAS"}
+SUBMISSION = {
+    "submit_action": "submit",
+    "general": {"faculty_name": "Faculty 0-0", "department": "Department 0", "designation": "Professor"},
+    "teaching": {
+        "courses": [
+            {
+                "semester": "1/2025-26",
+                "course_code": "CS101",
+                "course_name": "Data Structures",
+                "scheduled_classes": 48,
+                "held_classes": 45,
+            }
+        ]
+    },
+    "activities": {
+        "administrative_responsibility": True,
+        "exam_duties": True,
+        "student_related": False,
+        "organizing_events": False,
+        "phd_guidance": False,
+        "research_project": False,
+        "sponsored_project": False,
+    },
+    "research": {"entries": [{"type": "journal_papers", "count": 1, "title": "Graphs", "year": 2025}]},
+    "pbas": {
+        "student_feedback": [
+            {"semester": "1/2025-26", "course_code": "CS101", "course_name": "Data Structures", "feedback_score": 18}
+        ],
+        "departmental_activities": [{"activity": "NBA Coordinator", "semester": "1/2025-26", "credits_claimed": 3}],
+        "institute_activities": [],
+        "society_activities": [],
+        "teaching_process": 18,
+        "feedback": 17,
+        "department": 3,
+        "institute": 0,
+        "acr": 9,
+        "society": 0,
+    },
+    "acr": {"grade": "A"},
+}
+
+
+def _login(test, role, target):
+    return {"username": test.users[role].username, "password": "x"}
+
+
+# Bodies that take each route to its success path. Callables receive the
+# test, the calling role and the target appraisal and run before measuring.
+REQUEST_BODIES = {
+    "auth/login/": _login,
+    "login/": _login,
+    "logout/": lambda test, role, target: {"refresh": str(LoginSerializer.get_token(test.users[role]))},
+    "auth/change-password/": {"old_password": "x", "new_password": NEW_PASSWORD},
+    "auth/forgot-password/": lambda test, role, target: {"email": test.users[role].username},
+    "auth/reset-password/": lambda test, role, target: {
+        "email": test.users[role].username,
+        "new_password": NEW_PASSWORD,
+    },
+    "register/": {
+        "email": "new.principal@example.com",
+        "password": NEW_PASSWORD,
+        "role": "PRINCIPAL",
+        "full_name": "New Principal",
+        "designation": "Principal",
+    },
+    "me/": {"full_name": "Renamed"},
+    "faculty/submit/": {**SUBMISSION_META, "appraisal_data": SUBMISSION},
+    "faculty/appraisal/<int:appraisal_id>/resubmit/": {**SUBMISSION_META, "appraisal_data": SUBMISSION},
+    "hod/submit/": {**SUBMISSION_META, "appraisal_data": SUBMISSION},
+    "hod/resubmit/<int:appraisal_id>/": {**SUBMISSION_META, "appraisal_data": SUBMISSION},
+    "score/calculate/": SUBMISSION,
+    "workflow/transition/": {
+        "role": "HOD",
+        "current_state": States.SUBMITTED,
+        "next_state": States.REVIEWED_BY_HOD,
+    },
+    "appraisal/<int:appraisal_id>/draft/": lambda test, role, target: {
+        "updated_at": target.updated_at.isoformat(),
+        "operations": [{"op": "replace", "path": "/general/designation", "value": "Associate Professor"}],
+    },
+    "appraisal/<int:appraisal_id>/autosave/": {"sections": {"general": SUBMISSION["general"]}},
+    "hod/appraisal/<int:appraisal_id>/verify-grade/": {
+        "table1_verified_teaching": "Good",
+        "table1_verified_activities": "Good",
+    },
+    "principal/appraisal/<int:appraisal_id>/verify-grade/": {
+        "table1_verified_teaching": "Good",
+        "table1_verified_activities": "Good",
+    },
+    "hod/appraisal/<int:appraisal_id>/return/": {"remarks": "Attach proofs"},
+    "principal/appraisal/<int:appraisal_id>/return/": {"remarks": "Attach proofs"},
+}
+
+
+def _route_methods(pattern):
+    view_class = getattr(pattern.callback, "view_class", None)
+    if view_class is None:
+        return ["GET"]
+    return [m.upper() for m in ("get", "post", "put", "patch", "delete") if hasattr(view_class, m)]
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Calls every route in api/urls.py as every role against a synthetic
+    institution and checks the query count and wall time against
+    api/query_budgets.json. Each route is called with a target and body that
+    reach its success path for the role allowed to use it; a 5xx, or a route
+    no role gets a 2xx/3xx from, fails the test. Run with
+    UPDATE_QUERY_BUDGETS=1 to rewrite the query counts after an intentional
+    change.
+    """
+
+    DEPARTMENTS = 3
+    FACULTY_PER_DEPARTMENT = 4
+    YEARS = ("2022-23", "2023-24")
+    STATES = (
+        States.SUBMITTED,
+        States.REVIEWED_BY_HOD,
+        States.HOD_APPROVED,
+        States.REVIEWED_BY_PRINCIPAL,
+        States.PRINCIPAL_APPROVED,
+        States.FINALIZED,
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {}
+        cls.targets = {}
+        departments = [
+            Department.objects.create(department_name=f"Department {i}") for i in range(cls.DEPARTMENTS)
+        ]
+
+        cls.users["PRINCIPAL"] = User.objects.create_user(
+            username="principal@example.com", password="x", role="PRINCIPAL"
+        )
+        cls.users["ADMIN"] = User.objects.create_user(username="admin@example.com", password="x", role="ADMIN")
+        for d, department in enumerate(departments):
+            hod = User.objects.create_user(
+                username=f"hod{d}@example.com", password="x", role="HOD", department=department
+            )
+            department.hod = hod
+            department.save()
+            FacultyProfile.objects.create(user=hod, department=department, full_name=f"HOD {d}")
+            HODProfile.objects.create(user=hod, department=department, full_name=f"HOD {d}")
+            cls.users.setdefault("HOD", hod)
+
+            for f in range(cls.FACULTY_PER_DEPARTMENT):
+                user = User.objects.create_user(
+                    username=f"faculty{d}-{f}@example.com", password="x", role="FACULTY", department=department
+                )
+                faculty = FacultyProfile.objects.create(
+                    user=user, department=department, full_name=f"Faculty {d}-{f}", designation="Professor"
+                )
+                cls.users.setdefault("FACULTY", user)
+                for y, year in enumerate(cls.YEARS):
+                    appraisal = Appraisal.objects.create(
+                        faculty=faculty,
+                        form_type="SPPU",
+                        academic_year=year,
+                        semester="Odd",
+                        appraisal_data=GRADED,
+                        status=cls.STATES[(f + y) % len(cls.STATES)],
+                    )
+                    AppraisalScore.objects.create(appraisal=appraisal, total_score=50)
+
+        own = Appraisal.objects.filter(faculty__user=cls.users["FACULTY"]).first()
+        cls.targets["FACULTY"] = own
+        cls.targets["HOD"] = Appraisal.objects.filter(
+            department=departments[0], status=States.REVIEWED_BY_HOD
+        ).first()
+        cls.targets["PRINCIPAL"] = cls.targets["ADMIN"] = Appraisal.objects.filter(
+            status=States.HOD_APPROVED
+        ).first()
+
+        draft_data = {**SUBMISSION, "submit_action": "draft"}
+        faculty_draft = Appraisal.objects.create(
+            faculty=own.faculty, form_type="PBAS", academic_year="2024-25", semester="Odd",
+            appraisal_data=draft_data, status=States.DRAFT,
+        )
+        hod_draft = Appraisal.objects.create(
+            faculty=FacultyProfile.objects.get(user=cls.users["HOD"]), form_type="PBAS",
+            academic_year="2024-25", semester="Odd", appraisal_data=draft_data,
+            status=States.DRAFT, is_hod_appraisal=True,
+        )
+        hod_under_review = Appraisal.objects.create(
+            faculty=FacultyProfile.objects.get(user__username="hod1@example.com"), form_type="SPPU",
+            academic_year="2023-24", semester="Odd", appraisal_data=GRADED,
+            status=States.REVIEWED_BY_PRINCIPAL, is_hod_appraisal=True,
+        )
+        in_state = lambda status: Appraisal.objects.filter(status=status, is_hod_appraisal=False).first()
+        # Routes whose success path needs a target other than the role's default.
+        cls.route_targets = {
+            "appraisal/<int:appraisal_id>/pdf/download/<int:pdf_id>/": own,
+            "appraisal/<int:appraisal_id>/draft/": faculty_draft,
+            "appraisal/<int:appraisal_id>/autosave/": faculty_draft,
+            "faculty/appraisal/<int:appraisal_id>/resubmit/": faculty_draft,
+            "hod/resubmit/<int:appraisal_id>/": hod_draft,
+            "hod/appraisal/<int:appraisal_id>/start-review/": Appraisal.objects.filter(
+                department=departments[0], status=States.SUBMITTED
+            ).first(),
+            "principal/appraisal/<int:appraisal_id>/verify-grade/": hod_under_review,
+            "principal/appraisal/<int:appraisal_id>/approve/": in_state(States.REVIEWED_BY_PRINCIPAL),
+            "principal/appraisal/<int:appraisal_id>/finalize/": in_state(States.PRINCIPAL_APPROVED),
+        }
+
+        pdf_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, pdf_dir, ignore_errors=True)
+        pdf_path = os.path.join(pdf_dir, "SPPU_PBAS_appraisal.pdf")
+        with open(pdf_path, "wb") as fh:
+            fh.write(b"%PDF-1.4\n%%EOF\n")
+        cls.pdf = GeneratedPDF.objects.create(appraisal=own, pdf_path=pdf_path)
+
+    def _target(self, route, role):
+        return self.route_targets.get(route, self.targets[role])
+
+    def _url(self, route, role):
+        target = self._target(route, role)
+        url = route.replace("<int:appraisal_id>", str(target.pk)).replace("<int:pdf_id>", str(self.pdf.pk))
+        url = url.replace("<str:entity>", "Appraisal").replace("<int:entity_id>", str(target.pk))
+        return f"/api/{url}"
+
+    def _body(self, method, route, role):
+        if method == "GET":
+            return {}
+        if route.endswith("bulk-transition/"):
+            return {"action": "start_review", "appraisal_ids": [self._target(route, role).pk]}
+        body = REQUEST_BODIES.get(route, {})
+        return body(self, role, self._target(route, role)) if callable(body) else body
+
+    def _measure(self, client, method, route, role):
+        # Roll back after each call so every request sees the same data.
+        with transaction.atomic():
+            body = self._body(method, route, role)
+            with CaptureQueriesContext(connection) as queries:
+                started = perf_counter()
+                response = getattr(client, method.lower())(self._url(route, role), body, format="json")
+                if response.streaming:
+                    # Streaming bodies run their queries while being consumed.
+                    b"".join(response.streaming_content)
+                elapsed_ms = (perf_counter() - started) * 1000
+            if hasattr(response, "file_to_stream"):
+                response.close()
+            transaction.set_rollback(True)
+        # Cached state (token generations, scopes) must not outlive the rollback.
+        cache.clear()
+        return response, queries.captured_queries, elapsed_ms
+
+    def test_every_route_within_budget(self):
+        with open(BUDGETS_PATH, encoding="utf-8") as fh:
+            config = json.load(fh)
+        budgets = config["budgets"]
+        skip = config.get("skip", {})
+        default_ms = config["default_max_ms"]
+        updating = os.environ.get("UPDATE_QUERY_BUDGETS") == "1"
+
+        observed = {}
+        failures = []
+        broken = []
+        for pattern in urlpatterns:
+            route = str(pattern.pattern)
+            for method in _route_methods(pattern):
+                if f"{method} {route}" in skip:
+                    continue
+                statuses = []
+                for role in ROLES:
+                    key = f"{role} {method} {route}"
+                    client = APIClient(raise_request_exception=False)
+                    client.force_authenticate(self.users[role])
+                    response, queries, elapsed_ms = self._measure(client, method, route, role)
+                    observed[key] = {"queries": len(queries), "status": response.status_code}
+                    statuses.append(response.status_code)
+                    if response.status_code >= 500:
+                        broken.append(f"{key}: {response.status_code} {getattr(response, 'data', '')}")
+
+                    budget = budgets.get(key)
+                    if budget is None:
+                        failures.append(f"{key}: no budget in query_budgets.json ({len(queries)} queries)")
+                        continue
+                    if len(queries) > budget["queries"] or elapsed_ms > budget.get("max_ms", default_ms):
+                        sql = "\n    ".join(q["sql"] for q in queries)
+                        failures.append(
+                            f"{key}: {len(queries)} queries (budget {budget['queries']}), "
+                            f"{elapsed_ms:.0f}ms (budget {budget.get('max_ms', default_ms)}ms)\n    {sql}"
+                        )
+                if not any(code < 400 for code in statuses):
+                    broken.append(f"{method} {route}: no role reached the success path ({statuses})")
+
+        # A budget measured on an error path says nothing about the real one.
+        if broken:
+            self.fail("\n\n" + "\n\n".join(broken))
+
+        if updating:
+            config["budgets"] = {
+                key: {**budgets.get(key, {}), **observed[key]} for key in sorted(observed)
+            }
+            with open(BUDGETS_PATH, "w", encoding="utf-8") as fh:
+                json.dump(config, fh, indent=2)
+                fh.write("\n")
+            return
+
+        stale = sorted(set(budgets) - set(observed))
+        if stale:
+            failures.append("Budgets for routes that no longer exist: " + ", ".join(stale))
+        if failures:
+            self.fail("\n\n" + "\n\n".join(failures))
+
+
+class AppraisalExportTests(WorkflowTestMixin, TestCase):
+    def test_streams_csv_with_selected_columns_and_filters(self):
+        scored = self._appraisal(year="2023-24")
+        AppraisalScore.objects.create(appraisal=scored, teaching_score="40.00", total_score="75.50")
+        self._appraisal(year="2024-25")
+
+        self.client.force_authenticate(self.principal)
+        response = self.client.get(
+            "/api/principal/appraisals/export/",
+            {"columns": "appraisal_id,department,teaching_score,total_score", "academic_year": "2023-24"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ["Appraisal ID,Department,Teaching,Total", f"{scored.pk},Computer,40.0,75.5"])
+
+    def test_rejects_unknown_column(self):
+        self.client.force_authenticate(self.principal)
+        response = self.client.get("/api/principal/appraisals/export/", {"columns": "appraisal_data"})
+        self.assertEqual(response.status_code, 400)
+
+
+class FastJSONTests(TestCase):
+    def test_renders_identically_to_drf(self):
+        payload = {
+            "score": Decimal("42.50"),
+            "when": timezone.now(),
+            "day": date(2024, 6, 1),
+            "span": timedelta(hours=2),
+            "id": uuid.uuid4(),
+            "text": "Marathi \u0928\u092e\u0938\u094d\u0924\u0947 \u2028 line",
+            "nested": [{"n": 1, "f": 1.5, "none": None, "ok": True}],
+        }
+        self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        # Beyond orjson's 64-bit range: falls back to the stdlib encoder.
+        payload["big"] = 2 ** 70
+        self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(
+            FastJSONRenderer().render(payload, "application/json; indent=2"),
+            JSONRenderer().render(payload, "application/json; indent=2"),
+        )
+
+    def test_parser_matches_drf(self):
+        body = json.dumps({"a": [1, 2.5, "x"], "b": {"c": None}}).encode()
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(body)),
+            JSONParser().parse(io.BytesIO(body)),
+        )
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b"{broken"))
+
+
+class DraftPatchTests(WorkflowTestMixin, TestCase):
+    def test_applies_operations_and_rejects_stale_edits(self):
+        draft = self._appraisal(
+            status=States.DRAFT,
+            data={"teaching": {"courses": [{"course_code": "CS101", "held_classes": 40}]}, "research": {"papers": []}},
+        )
+        self.client.force_authenticate(self.faculty.user)
+        url = f"/api/appraisal/{draft.pk}/draft/"
+        operations = [
+            {"op": "replace", "path": "/teaching/courses/0/held_classes", "value": 45},
+            {"op": "add", "path": "/teaching/courses/-", "value": {"course_code": "CS102"}},
+        ]
+
+        response = self.client.patch(url, {"updated_at": draft.updated_at.isoformat(), "operations": operations}, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["sections"], ["teaching"])
+
+        draft.refresh_from_db()
+        self.assertEqual(draft.appraisal_data["teaching"]["courses"][0]["held_classes"], 45)
+        self.assertEqual(len(draft.appraisal_data["teaching"]["courses"]), 2)
+        # Untouched sections are not normalized (no activities/pbas added).
+        self.assertEqual(set(draft.appraisal_data), {"teaching", "research"})
+
+        # Re-using the old updated_at is a stale edit.
+        stale = self.client.patch(url, {"updated_at": "2000-01-01T00:00:00Z", "operations": operations}, format="json")
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(self.client.patch(url, {"operations": operations}, format="json").status_code, 428)
+
+        bad = self.client.patch(
+            url,
+            {"updated_at": response.data["updated_at"], "operations": [{"op": "remove", "path": "/missing"}]},
+            format="json",
+        )
+        self.assertEqual(bad.status_code, 422)
+
+        self.client.force_authenticate(self.outsider.user)
+        self.assertEqual(
+            self.client.patch(url, {"updated_at": response.data["updated_at"], "operations": operations}, format="json").status_code,
+            404,
+        )
+
+    def test_touching_activities_renormalizes(self):
+        draft = self._appraisal(status=States.DRAFT, data={"activities": {}, "pbas": {}})
+        self.client.force_authenticate(self.faculty.user)
+        response = self.client.patch(
+            f"/api/appraisal/{draft.pk}/draft/",
+            {
+                "updated_at": draft.updated_at.isoformat(),
+                "operations": [{"op": "add", "path": "/activities/selected_activities", "value": []}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        draft.refresh_from_db()
+        self.assertIn("pbas_reclassified_counts", draft.appraisal_data["activities"])
+
+
+class UserScopeTests(WorkflowTestMixin, TestCase):
+    def test_scope_is_cached_and_follows_department_hod_changes(self):
+        scope = scope_for_user(self.hod)
+        self.assertEqual(scope.hod_department_id, self.department.pk)
+        scope_for_user(self.faculty.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(scope_for_user(self.faculty.user).faculty_department_id, self.department.pk)
+
+        self.department.hod = None
+        self.department.save()
+        self.other_department.hod = self.hod
+        self.other_department.save()
+        self.assertEqual(scope_for_user(self.hod).hod_department_id, self.other_department.pk)
+
+    def test_hod_department_is_not_served_from_the_cache(self):
+        scope_for_user(self.hod)
+        # As if another worker reassigned the HOD: no invalidation reaches this cache.
+        Department.objects.filter(pk=self.other_department.pk).update(hod=self.hod)
+        Department.objects.filter(pk=self.department.pk).update(hod=None)
+        with self.assertNumQueries(1):
+            self.assertEqual(scope_for_user(self.hod).hod_department_id, self.other_department.pk)
+
+    def test_changes_reach_scopes_cached_by_other_processes(self):
+        user = User.objects.get(pk=self.faculty.user_id)
+        scope_for_user(user)
+        # As if another worker moved the faculty: its cache delete does not reach this process.
+        with mock.patch("core.services.scope.cache.delete_many"):
+            self.faculty.department = self.other_department
+            self.faculty.save()
+
+        user = User.objects.get(pk=self.faculty.user_id)  # as the next request loads it
+        self.assertEqual(scope_for_user(user).faculty_department_id, self.other_department.pk)
+
+    def test_faculty_move_bumps_appraisal_version_and_refreshes_the_inbox(self):
+        appraisal = self._appraisal()
+        self.faculty.department = self.other_department
+        self.faculty.save()
+
+        moved = Appraisal.objects.get(pk=appraisal.pk)
+        self.assertEqual((moved.department_id, moved.version), (self.other_department.pk, appraisal.version + 1))
+        self.assertEqual(
+            set(ReviewInbox.objects.filter(appraisal=appraisal).values_list("department_id", flat=True)),
+            {self.other_department.pk},
+        )
+
+    def test_admin_save_invalidates_the_department_heads_scope(self):
+        request = RequestFactory().post("/")
+        request.user = self.principal
+        department_admin = admin.site._registry[Department]
+        with mock.patch("core.admin.invalidate_scope") as invalidate:
+            self.department.hod = None
+            department_admin.save_model(request, self.department, None, True)
+            department_admin.save_related(request, mock.Mock(instance=self.department), [], True)
+        invalidate.assert_called_once_with(self.hod.pk, None)
+
+    def test_hod_can_open_detail_of_own_department_only(self):
+        own = self._appraisal()
+        foreign = self._appraisal(faculty=self.outsider)
+        self.client.force_authenticate(self.hod)
+
+        self.assertEqual(self.client.get(f"/api/appraisal/{own.pk}/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/appraisal/{foreign.pk}/").status_code, 403)
+        self.assertEqual(self.client.get(f"/api/appraisal/{foreign.pk}/download/").status_code, 403)
+
+
+@override_settings(JWT_STATELESS=True)
+class StatelessJWTTests(WorkflowTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Cached generations outlive each test's rolled-back transaction.
+        cache.clear()
+
+    def _login(self, user):
+        response = self.client.post("/api/auth/login/", {"username": user.username, "password": "x"}, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data["access"]
+
+    def _authenticate(self, access):
+        request = APIRequestFactory().get("/api/hod/appraisals/", HTTP_AUTHORIZATION=f"Bearer {access}")
+        return PasswordChangeEnforcedJWTAuthentication().authenticate(request)
+
+    def test_token_user_is_built_without_queries_until_revoked(self):
+        access = self._login(self.hod)
+        self._authenticate(access)  # warms the generation cache
+
+        with self.assertNumQueries(0):
+            user, _ = self._authenticate(access)
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual((user.pk, user.role, user.is_active), (self.hod.pk, "HOD", True))
+        # Fields outside the token load together, on demand.
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, self.hod.email)
+            self.assertEqual(user.date_joined, self.hod.date_joined)
+
+        self.hod.role = "FACULTY"
+        self.hod.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate(access)
+
+    def test_deactivation_revokes_outstanding_tokens(self):
+        access = self._login(self.hod)
+        self._authenticate(access)
+        generation = User.objects.get(pk=self.hod.pk).token_generation
+
+        self.hod.is_active = False
+        self.hod.save(update_fields=["is_active"])
+        self.assertNotEqual(User.objects.get(pk=self.hod.pk).token_generation, generation)
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate(access)
+
+    def test_password_change_revokes_old_token_and_returns_new_ones(self):
+        User.objects.filter(pk=self.faculty.user_id).update(must_change_password=True)
+        access = self._login(self.faculty.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(self.client.get("/api/faculty/appraisals/").status_code, 401)
+
+        response = self.client.post(
+            "/api/auth/change-password/", {"old_password": "x", "new_password": "N3w-passw0rd!"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.client.get("/api/me/").status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get("/api/faculty/appraisals/").status_code, 200)
+
+
+class RefreshTokenRevocationTests(WorkflowTestMixin, TestCase):
+    def _login(self):
+        response = self.client.post("/api/auth/login/", {"username": "hod@example.com", "password": "x"}, format="json")
+        return response.data
+
+    def test_rotated_refresh_token_is_rejected_at_once(self):
+        tokens = self._login()
+        response = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_token_blacklisted_elsewhere_is_rejected_at_once(self):
+        tokens = self._login()
+        # As another process would: only the blacklist row exists.
+        jti = RefreshToken(tokens["refresh"])["jti"]
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+        response = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_purge_tokens_deletes_expired_rows_in_batches(self):
+        for _ in range(3):
+            self._login()
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(days=1))
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.first())
+        self._login()
+
+        out = io.StringIO()
+        call_command("purge_tokens", "--batch-size", "2", stdout=out)
+        self.assertIn("Done. outstanding=3 blacklisted=1", out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+
+
+class AuditLogAPITests(WorkflowTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        base = timezone.now()
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                user_id_snapshot=self.hod.pk,
+                username_snapshot=self.hod.username,
+                role_snapshot="HOD",
+                action="HOD_APPROVE" if i % 2 else "SUBMIT_APPRAISAL",
+                entity="Appraisal",
+                entity_id=i % 3,
+                # Pairs share logged_at so the log_id tie-breaker is exercised.
+                logged_at=base - timedelta(minutes=i // 2),
+            )
+            for i in range(9)
+        ])
+
+    def test_keyset_pages_cover_every_matching_row_once_newest_first(self):
+        self.client.force_authenticate(self.principal)
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, "entity": "Appraisal", **({"cursor": cursor} if cursor else {})}
+            response = self.client.get("/api/audit-logs/", params)
+            self.assertEqual(response.status_code, 200, response.data)
+            seen += response.data["results"]
+            cursor = response.data["next_cursor"]
+            if not cursor:
+                break
+        expected = list(AuditLog.objects.order_by("-logged_at", "-log_id").values_list("log_id", flat=True))
+        self.assertEqual([row["log_id"] for row in seen], expected)
+
+        response = self.client.get("/api/audit-logs/", {"action": "hod_approve", "user": self.hod.pk})
+        self.assertEqual(len(response.data["results"]), 4)
+        response = self.client.get("/api/audit-logs/Appraisal/1/")
+        self.assertEqual({row["entity_id"] for row in response.data["results"]}, {1})
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_faculty_cannot_read_the_audit_trail_and_bad_params_are_rejected(self):
+        self.client.force_authenticate(self.faculty.user)
+        self.assertEqual(self.client.get("/api/audit-logs/").status_code, 403)
+        self.client.force_authenticate(self.principal)
+        self.assertEqual(self.client.get("/api/audit-logs/", {"since": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/audit-logs/", {"cursor": "nope"}).status_code, 400)
+
+    def test_admin_paginator_caps_filtered_counts(self):
+        with mock.patch.object(EstimatedCountPaginator, "COUNT_LIMIT", 5):
+            paginator = EstimatedCountPaginator(AuditLog.objects.filter(entity="Appraisal"), 2)
+            self.assertEqual(paginator.count, 5)
+            self.assertEqual(paginator.num_pages, 3)
+
+
+class SQLStatsTests(WorkflowTestMixin, TestCase):
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 7 AND name = 'x'"),
+            fingerprint("SELECT  *  FROM t WHERE id = 42 AND name = 'o''brien'"),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s)'),
+            'SELECT * FROM "t" WHERE "id" IN (...)',
+        )
+
+    def test_repeated_statements_are_reported_as_duplicates(self):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            for user in User.objects.all():
+                FacultyProfile.objects.filter(user_id=user.pk).first()
+        self.assertEqual(stats.count, User.objects.count() + 1)
+        self.assertEqual(list(stats.duplicates().values()), [User.objects.count()])
+
+    @override_settings(SQL_STATS_SAMPLE_RATE=1)
+    def test_sampled_requests_carry_server_timing(self):
+        appraisal = self._appraisal()
+        self.client.force_authenticate(self.principal)
+        before = REQUEST_QUERIES.count(route="api/appraisal/<int:appraisal_id>/")
+        response = self.client.get(f"/api/appraisal/{appraisal.appraisal_id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+        self.assertEqual(REQUEST_QUERIES.count(route="api/appraisal/<int:appraisal_id>/"), before + 1)
+
+        with override_settings(SQL_STATS_SAMPLE_RATE=0):
+            response = self.client.get(f"/api/appraisal/{appraisal.appraisal_id}/")
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(SQL_STATS_SAMPLE_RATE=1)
+    async def test_sync_view_statements_are_counted_under_asgi(self):
+        appraisal = await sync_to_async(self._appraisal)()
+        token = str(AccessToken.for_user(self.principal))
+        response = await self.async_client.get(
+            f"/api/appraisal/{appraisal.appraisal_id}/", headers={"Authorization": f"Bearer {token}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        queries = int(re.search(r'desc="(\d+) queries"', response["Server-Timing"]).group(1))
+        self.assertGreater(queries, 0)
+
+
+@override_settings(PROFILE_DIR=tempfile.mkdtemp(), PROFILE_SAMPLE_RATE=0)
+class RequestProfilerTests(WorkflowTestMixin, TestCase):
+    def test_sampler_collapses_the_target_threads_stacks(self):
+        def busy_loop():
+            deadline = perf_counter() + 0.05
+            while perf_counter() < deadline:
+                pass
+
+        sampler = StackSampler(threading.get_ident(), 0.001)
+        sampler.start()
+        busy_loop()
+        sampler.stop()
+        self.assertGreater(sampler.samples, 0)
+        stacks = dict(line.rsplit(" ", 1) for line in sampler.collapsed().splitlines())
+        self.assertTrue(any(stack.endswith(f"{__name__}:busy_loop") for stack in stacks), stacks)
+
+    def test_signed_requests_are_profiled_and_downloadable(self):
+        appraisal = self._appraisal()
+        self.client.force_authenticate(self.faculty.user)
+        self.assertEqual(self.client.post("/api/profiling/token/").status_code, 403)
+        admin_user = User.objects.create_superuser(username="admin@example.com", password="x")
+        self.client.force_authenticate(admin_user)
+        token = self.client.post("/api/profiling/token/").data["token"]
+
+        self.client.force_authenticate(self.principal)
+        url = f"/api/appraisal/{appraisal.appraisal_id}/"
+        self.client.get(url, HTTP_X_PROFILE_TOKEN="forged")
+        self.assertFalse(RequestProfile.objects.exists())
+        response = self.client.get(url, HTTP_X_PROFILE_TOKEN=token)
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response["X-Profile-Id"], str(profile.profile_id))
+        self.assertEqual((profile.trigger, profile.route, profile.requested_by), ("SIGNED", "api/appraisal/<int:appraisal_id>/", admin_user.pk))
+        self.assertEqual(profile.user_id_snapshot, self.principal.pk)
+
+        request = RequestFactory().get("/")
+        request.user = admin_user
+        download = RequestProfileAdmin(RequestProfile, admin.site).download_view(request, profile.profile_id)
+        self.assertIn(f"profile-{profile.profile_id}.folded", download["Content-Disposition"])
+        with open(profile.file_path, "rb") as fh:
+            self.assertEqual(b"".join(download.streaming_content), fh.read())
+
+    def test_profiling_token_stops_working_once_its_admin_is_revoked_or_demoted(self):
+        admin_user = User.objects.create_superuser(username="admin@example.com", password="x")
+        token = issue_token(admin_user)
+        self.assertEqual(token_user_id(token), admin_user.pk)
+
+        revoke_tokens(admin_user)
+        self.assertIsNone(token_user_id(token))
+
+        token = issue_token(admin_user)
+        User.objects.filter(pk=admin_user.pk).update(role="FACULTY")
+        self.assertIsNone(token_user_id(token))
+
+
+class DraftAutosaveTests(WorkflowTestMixin, TestCase):
+    def test_autosaves_are_buffered_merged_on_read_and_flushed(self):
+        draft = self._appraisal(status=States.DRAFT, data={"teaching": {"courses": []}, "research": {"papers": ["a"]}})
+        version = draft.version
+        self.client.force_authenticate(self.faculty.user)
+        url = f"/api/appraisal/{draft.pk}/autosave/"
+
+        for held in (10, 20):
+            response = self.client.post(
+                url, {"sections": {"teaching": {"courses": [{"held_classes": held}]}}}, format="json"
+            )
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertFalse(response.data["flushed"])
+        response = self.client.post(
+            url, {"operations": [{"op": "add", "path": "/research/papers/-", "value": "b"}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+        # The appraisal row is untouched, but the owner reads the merged view.
+        draft.refresh_from_db()
+        self.assertEqual(draft.version, version)
+        self.assertEqual(draft.appraisal_data["teaching"], {"courses": []})
+        current = self.client.get("/api/appraisal/current/")
+        self.assertEqual(current.data["appraisal_data"]["teaching"], {"courses": [{"held_classes": 20}]})
+        self.assertEqual(current.data["appraisal_data"]["research"], {"papers": ["a", "b"]})
+
+        out = io.StringIO()
+        call_command("flush_draft_buffers", "--once", "--idle-seconds", "0", stdout=out)
+        self.assertIn("flushed=1", out.getvalue())
+        draft.refresh_from_db()
+        self.assertEqual(draft.version, version + 1)
+        self.assertEqual(draft.appraisal_data["teaching"], {"courses": [{"held_classes": 20}]})
+        self.assertEqual(draft.appraisal_data["research"], {"papers": ["a", "b"]})
+        self.assertFalse(DraftBuffer.objects.exists())
+
+    def test_explicit_save_flushes_and_submitted_appraisals_are_rejected(self):
+        draft = self._appraisal(status=States.DRAFT, data={})
+        self.client.force_authenticate(self.faculty.user)
+        response = self.client.post(
+            f"/api/appraisal/{draft.pk}/autosave/", {"sections": {"general": {"x": 1}}, "flush": True}, format="json"
+        )
+        self.assertTrue(response.data["flushed"])
+        draft.refresh_from_db()
+        self.assertEqual(draft.appraisal_data, {"general": {"x": 1}})
+
+        submitted = self._appraisal(status=States.SUBMITTED, year="2023-24")
+        response = self.client.post(
+            f"/api/appraisal/{submitted.pk}/autosave/", {"sections": {"general": {}}}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
@@ -8,7 +8,8 @@ from api.views.auth import (
     ResetPasswordConfirmAPI,
 )
 from api.views.test import WhoAmI
-from api.views.faculty import FacultyAppraisalListAPI, FacultySubmitAPI, FacultyResubmitAPI
+from api.views.profiling import ProfileTokenAPI
+from api.views.faculty import AppraisalAutosaveAPI, AppraisalDraftPatchAPI, FacultyAppraisalListAPI, FacultySubmitAPI, FacultyResubmitAPI
 from api.views.principal import PrincipalApproveAPI, PrincipalReturnAPI
 from api.views.scoring_api import ScoringAPI
 from api.views.workflow_api import WorkflowAPI
@@ -20,7 +21,9 @@ from api.views.hod import (
     HODVerifyGradeAPI,
     HODSubmitAPI,
     HODResubmitAPI,
-    HODAppraisalListAPI   # 👈 ADD THIS
+    HODAppraisalListAPI,   # 👈 ADD THIS
+    HODBulkTransitionAPI,
+    HODDashboardSummaryAPI,
 )
 from api.views.principal import(
     PrincipalApproveAPI,
@@ -29,12 +32,20 @@ from api.views.principal import(
     PrincipalReturnAPI,
     PrincipalFinalizeAPI,
     PrincipalVerifyGradeAPI,
+    PrincipalBulkTransitionAPI,
+    PrincipalDashboardSummaryAPI,
+    PrincipalAgingQueueAPI,
+    PrincipalDwellReportAPI,
+    PrincipalAppraisalExportAPI,
 )
 from api.views.me import MeView 
+from api.views.events import StreamTicketAPI, event_stream
+from api.views.audit import AuditEntityTimelineAPI, AuditLogListAPI
 from api.views.appraisal_views import (
     CurrentFacultyAppraisalAPIView, 
     FacultyAppraisalStatusAPI,
     FacultyAppraisalStatusAPI,
+    AppraisalChangesAPI,
     AppraisalDetailAPI,
     DownloadAppraisalPDF
 )
@@ -92,6 +103,8 @@ urlpatterns = [
     path("hod/submit/", HODSubmitAPI.as_view()),
     path("hod/appraisals/me/", HODAppraisalListAPI.as_view()),
     path("hod/resubmit/<int:appraisal_id>/", HODResubmitAPI.as_view()),
+    path("hod/appraisals/bulk-transition/", HODBulkTransitionAPI.as_view()),
+    path("hod/dashboard/summary/", HODDashboardSummaryAPI.as_view()),
 
 
     # PRINCIPAL   
@@ -101,10 +114,23 @@ urlpatterns = [
     path("principal/appraisal/<int:appraisal_id>/verify-grade/",PrincipalVerifyGradeAPI.as_view()),
     path("principal/appraisal/<int:appraisal_id>/return/", PrincipalReturnAPI.as_view()),
     path("principal/appraisal/<int:appraisal_id>/finalize/", PrincipalFinalizeAPI.as_view()),
+    path("principal/appraisals/bulk-transition/", PrincipalBulkTransitionAPI.as_view()),
+    path("principal/dashboard/summary/", PrincipalDashboardSummaryAPI.as_view()),
+    path("principal/appraisals/aging/", PrincipalAgingQueueAPI.as_view()),
+    path("principal/reports/dwell/", PrincipalDwellReportAPI.as_view()),
+    path("principal/appraisals/export/", PrincipalAppraisalExportAPI.as_view()),
     # OTHER
     path("score/calculate/", ScoringAPI.as_view()),
     path("appraisal/<int:appraisal_id>/", AppraisalDetailAPI.as_view()),
+    path("appraisals/changes/", AppraisalChangesAPI.as_view()),
+    path("events/", event_stream),
+    path("events/ticket/", StreamTicketAPI.as_view()),
+    path("appraisal/<int:appraisal_id>/draft/", AppraisalDraftPatchAPI.as_view()),
+    path("appraisal/<int:appraisal_id>/autosave/", AppraisalAutosaveAPI.as_view()),
     path("workflow/transition/", WorkflowAPI.as_view()),
+    path("audit-logs/", AuditLogListAPI.as_view()),
+    path("audit-logs/<str:entity>/<int:entity_id>/", AuditEntityTimelineAPI.as_view()),
+    path("profiling/token/", ProfileTokenAPI.as_view()),
     
     # PDF Generation
     path("appraisal/<int:appraisal_id>/pdf/sppu-enhanced/", generate_enhanced_sppu_pdf, name="enhanced_sppu_pdf"),
@@ -4,9 +4,15 @@ from time import perf_counter
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 
 from core.models import Appraisal
 from api.permissions import IsFaculty, IsHOD
+from api.renderers import FastJSONParser, FastJSONRenderer
+from core.services.draft_buffer import merged_data
+from core.services.metrics import Histogram
+from core.services.scope import get_scope
+from workflow.changes import DEFAULT_LIMIT, MAX_LIMIT, changes_since, head, scope_for
 from workflow.states import States
 from core.services.sppu_verified import extract_verified_grading, TABLE2_VERIFIED_KEYS
 from scoring.engine import calculate_full_score
@@ -14,10 +20,17 @@ from core.services.pdf.enhanced_sppu_mapper import get_enhanced_sppu_pdf_data
 from scoring.activity_selection import get_activity_sections
 
 logger = logging.getLogger("api.performance")
+DETAIL_PHASE_SECONDS = Histogram(
+    "appraisal_detail_phase_seconds",
+    "Time spent in each phase of the appraisal detail endpoint.",
+    ["phase"],
+)
 
 
 class CurrentFacultyAppraisalAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    parser_classes = [FastJSONParser]
 
     def get(self, request):
         started = perf_counter()
@@ -47,6 +60,7 @@ class CurrentFacultyAppraisalAPIView(APIView):
                 ],
                 is_hod_appraisal=is_hod
             )
+            .select_related("draft_buffer")
             .order_by(
                 Case(
                     When(status=States.RETURNED_BY_HOD, then=Value(0)),
@@ -77,8 +91,9 @@ class CurrentFacultyAppraisalAPIView(APIView):
             "academic_year": appraisal.academic_year,
             "semester": appraisal.semester,
             "form_type": appraisal.form_type,
-            "appraisal_data": appraisal.appraisal_data,
+            "appraisal_data": merged_data(appraisal),
             "remarks": appraisal.remarks,
+            "updated_at": appraisal.updated_at.isoformat(),
             "activity_sections": get_activity_sections(),
         }
         payload_ms = (perf_counter() - payload_started) * 1000
@@ -202,16 +217,49 @@ class FacultyAppraisalStatusAPI(APIView):
         return "-"
 
 
+class AppraisalChangesAPI(APIView):
+    """
+    GET ?since=<cursor>&limit=N
+
+    Status / remarks changes into or out of the caller's views after
+    `since`, oldest first; `removed` marks those that take the appraisal out
+    of view. Without `since` only the current cursor is returned, to be
+    taken right after loading the full list.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        raw_since = request.query_params.get("since")
+        if raw_since in (None, ""):
+            return Response({"changes": [], "cursor": head(), "has_more": False})
+        try:
+            since = int(raw_since)
+            limit = int(request.query_params.get("limit") or DEFAULT_LIMIT)
+        except ValueError:
+            return Response({"error": "since and limit must be integers"}, status=400)
+        if since < 0:
+            return Response({"error": "since must not be negative"}, status=400)
+
+        scope = scope_for(get_scope(request))
+        if scope is None:
+            return Response({"changes": [], "cursor": since, "has_more": False})
+
+        rows, cursor, has_more = changes_since(scope, since, max(1, min(limit, MAX_LIMIT)))
+        return Response({"changes": rows, "cursor": cursor, "has_more": has_more})
+
+
 class AppraisalDetailAPI(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    parser_classes = [FastJSONParser]
 
     def get(self, request, appraisal_id):
         started = perf_counter()
         lookup_started = perf_counter()
         try:
-            appraisal = Appraisal.objects.select_related("faculty__department").get(appraisal_id=appraisal_id)
+            appraisal = Appraisal.objects.select_related("faculty__department", "draft_buffer").get(appraisal_id=appraisal_id)
         except Appraisal.DoesNotExist:
-            logger.info(
+            logger.debug(
                 "faculty.detail_timing user_id=%s appraisal_id=%s lookup_ms=%.2f total_ms=%.2f found=false",
                 getattr(request.user, "id", None),
                 appraisal_id,
@@ -223,21 +271,17 @@ class AppraisalDetailAPI(APIView):
 
         # Basic permission check
         perm_started = perf_counter()
-        is_owner = appraisal.faculty.user == request.user
-        is_principal = request.user.role == "PRINCIPAL"
-
-        is_hod = False
-        if request.user.role == "HOD":
-            from core.models import Department
-            try:
-                dept = Department.objects.get(hod=request.user)
-                if appraisal.faculty.department == dept:
-                    is_hod = True
-            except Department.DoesNotExist:
-                pass
+        scope = get_scope(request)
+        is_owner = appraisal.faculty.user_id == request.user.pk
+        is_principal = scope.role == "PRINCIPAL"
+        is_hod = (
+            scope.role == "HOD"
+            and scope.hod_department_id is not None
+            and appraisal.faculty.department_id == scope.hod_department_id
+        )
 
         if not (is_owner or is_principal or is_hod):
-            logger.info(
+            logger.debug(
                 "faculty.detail_timing user_id=%s appraisal_id=%s lookup_ms=%.2f perm_ms=%.2f total_ms=%.2f authorized=false",
                 getattr(request.user, "id", None),
                 appraisal_id,
@@ -247,6 +291,9 @@ class AppraisalDetailAPI(APIView):
             )
             return Response({"error": "Unauthorized access"}, status=403)
         perm_ms = (perf_counter() - perm_started) * 1000
+        if is_owner:
+            # Owners see their buffered autosaves.
+            appraisal.appraisal_data = merged_data(appraisal)
 
         include_heavy = request.query_params.get("include_heavy") == "true"
 
@@ -330,7 +377,18 @@ class AppraisalDetailAPI(APIView):
             }
         }
         payload_ms = (perf_counter() - payload_started) * 1000
-        logger.info(
+        total_ms = (perf_counter() - started) * 1000
+        for phase, elapsed_ms in (
+            ("lookup", lookup_ms),
+            ("permission", perm_ms),
+            ("verified", verified_ms),
+            ("score", score_ms),
+            ("sppu_mapper", sppu_ms),
+            ("payload", payload_ms),
+            ("total", total_ms),
+        ):
+            DETAIL_PHASE_SECONDS.observe(elapsed_ms / 1000, phase=phase)
+        logger.debug(
             "faculty.detail_timing user_id=%s appraisal_id=%s lookup_ms=%.2f perm_ms=%.2f verified_ms=%.2f score_ms=%.2f sppu_mapper_ms=%.2f payload_ms=%.2f include_heavy=%s total_ms=%.2f",
             getattr(request.user, "id", None),
             appraisal_id,
@@ -341,7 +399,7 @@ class AppraisalDetailAPI(APIView):
             sppu_ms,
             payload_ms,
             include_heavy,
-            (perf_counter() - started) * 1000,
+            total_ms,
         )
 
         return Response(payload)
@@ -386,14 +444,14 @@ class DownloadAppraisalPDF(APIView):
         except Appraisal.DoesNotExist:
             return Response({"error": "Appraisal not found"}, status=404)
 
-        is_owner = appraisal.faculty.user == request.user
-        is_principal = request.user.role == "PRINCIPAL"
-
-        is_hod = False
-        if request.user.role == "HOD":
-            # Simple check if HOD manages this faculty's department
-            if request.user.department_set.filter(pk=appraisal.faculty.department.pk).exists():
-                is_hod = True
+        scope = get_scope(request)
+        is_owner = appraisal.faculty.user_id == request.user.pk
+        is_principal = scope.role == "PRINCIPAL"
+        is_hod = (
+            scope.role == "HOD"
+            and scope.hod_department_id is not None
+            and appraisal.faculty.department_id == scope.hod_department_id
+        )
 
         if not (is_owner or is_principal or is_hod):
             return Response({"error": "Unauthorized"}, status=403)
@@ -0,0 +1,95 @@
+from itertools import islice
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.pagination import decode_keyset, encode_keyset, page_size
+from api.permissions import IsPrincipal
+from core.services.audit_archive import iter_audit_logs
+
+
+def _serialize(entry):
+    return {
+        "log_id": entry.log_id,
+        "logged_at": entry.logged_at,
+        "user_id": entry.user_id_snapshot,
+        "username": entry.username_snapshot,
+        "role": entry.role_snapshot,
+        "action": entry.action,
+        "entity": entry.entity,
+        "entity_id": entry.entity_id,
+        "old_value": entry.old_value,
+        "new_value": entry.new_value,
+        "ip_address": entry.ip_address,
+    }
+
+
+def _page(request, filters):
+    """
+    One newest-first page keyed on (logged_at, log_id). ?since / ?until bound
+    logged_at (ISO 8601); ?archived=1 continues into archived months.
+    Raises ValueError for malformed parameters.
+    """
+    limit = page_size(request)
+    cursor = request.query_params.get("cursor")
+    bounds = {}
+    for name in ("since", "until"):
+        raw = request.query_params.get(name)
+        if raw:
+            moment = parse_datetime(raw)
+            if moment is None:
+                raise ValueError(f"{name} must be an ISO 8601 datetime")
+            bounds[name] = moment
+
+    rows = list(islice(
+        iter_audit_logs(
+            before=decode_keyset(cursor) if cursor else None,
+            limit=limit + 1,
+            include_archived=request.query_params.get("archived") in ("1", "true"),
+            **bounds,
+            **filters,
+        ),
+        limit + 1,
+    ))
+    next_cursor = encode_keyset(rows[limit - 1].logged_at, rows[limit - 1].log_id) if len(rows) > limit else None
+    return Response({"results": [_serialize(entry) for entry in rows[:limit]], "next_cursor": next_cursor})
+
+
+class AuditLogListAPI(APIView):
+    """
+    GET ?entity=&entity_id=&user=&action=&since=&until=&cursor=&limit=&archived=1
+
+    Audit trail for principals and admins, newest first.
+    """
+    permission_classes = [IsAuthenticated, IsPrincipal]
+
+    def get(self, request):
+        params = request.query_params
+        filters = {}
+        if params.get("entity"):
+            filters["entity"] = params["entity"]
+        if params.get("action"):
+            filters["action"] = params["action"].upper()
+        for param, field in (("entity_id", "entity_id"), ("user", "user_id_snapshot")):
+            if params.get(param):
+                if not params[param].isdigit():
+                    return Response({"error": f"{param} must be an integer"}, status=400)
+                filters[field] = int(params[param])
+
+        try:
+            return _page(request, filters)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+
+class AuditEntityTimelineAPI(APIView):
+    """Every audited action on one entity (e.g. Appraisal 42), newest first."""
+    permission_classes = [IsAuthenticated, IsPrincipal]
+
+    def get(self, request, entity, entity_id):
+        try:
+            return _page(request, {"entity": entity, "entity_id": entity_id})
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
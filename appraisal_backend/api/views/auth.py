@@ -46,6 +46,9 @@ class LoginSerializer(TokenObtainPairSerializer):
         # Custom claims
         token["username"] = user.username
         token["role"] = user.role
+        # Enough to authenticate without a user lookup in stateless JWT mode.
+        token["must_change_password"] = user.must_change_password
+        token["gen"] = user.token_generation
 
         return token
 
@@ -147,7 +150,16 @@ class ChangePasswordAPI(APIView):
         user.must_change_password = False
         user.save(update_fields=["password", "must_change_password"])
 
-        return Response({"detail": "Password changed successfully"}, status=status.HTTP_200_OK)
+        # Saving revoked the caller's tokens (core.signals); hand out new ones.
+        refresh = LoginSerializer.get_token(user)
+        return Response(
+            {
+                "detail": "Password changed successfully",
+                "refresh": str(refresh),
+                "access": str(refresh.access_token),
+            },
+            status=status.HTTP_200_OK,
+        )
 
 
 class ForgotPasswordRequestAPI(APIView):
@@ -0,0 +1,142 @@
+"""
+GET /api/events/ - Server-Sent Events stream of workflow updates.
+
+This is a plain async Django view: an idle connection is a suspended
+coroutine, not a busy worker thread, so it must be served by the ASGI app
+under an ASGI server. The API runs on gthread WSGI workers (start.sh) and
+answers 503 here; start_events.sh serves the stream alone from
+appraisal_backend.asgi.events_application, at settings.EVENTS_STREAM_URL.
+
+EventSource cannot set headers, and access tokens do not belong in URLs
+(they end up in proxy and access logs), so browsers first POST to
+/api/events/ticket/ for a stream ticket and the stream URL: a signed
+token valid for TICKET_SECONDS that only opens this stream, passed as
+?ticket=. It is
+checked when the stream opens, so fetch a new one before reconnecting.
+Other clients may send the access token in the Authorization header.
+
+Events are described in workflow.events; after a "resync" event the client
+should reload via the change feed (/api/appraisals/changes/).
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from api.authentication import PasswordChangeEnforcedJWTAuthentication
+from core.models import User
+from core.services.events import broker, get_backend
+
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 5000
+TICKET_SALT = "api.views.events.ticket"
+TICKET_SECONDS = 30
+
+
+def issue_ticket(user):
+    """Signed ticket that opens the caller's event stream within TICKET_SECONDS."""
+    return signing.dumps({"uid": user.pk, "gen": user.token_generation}, salt=TICKET_SALT)
+
+
+def _ticket_user(ticket):
+    try:
+        data = signing.loads(ticket, salt=TICKET_SALT, max_age=TICKET_SECONDS)
+    except signing.BadSignature:
+        return None
+    user = User.objects.filter(pk=data.get("uid"), is_active=True).first()
+    # A password change or logout everywhere since issue revokes the ticket too.
+    if user is None or user.token_generation != data.get("gen"):
+        return None
+    return user
+
+
+def _authenticate(request):
+    ticket = request.GET.get("ticket")
+    if ticket:
+        user = _ticket_user(ticket)
+    else:
+        authentication = PasswordChangeEnforcedJWTAuthentication()
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        user = authentication.get_user(authentication.get_validated_token(raw_token))
+    if user is None or getattr(user, "must_change_password", False):
+        return None
+    return user
+
+
+class StreamTicketAPI(APIView):
+    """POST: a short-lived ticket for GET <url>?ticket=..."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            "ticket": issue_ticket(request.user),
+            "expires_in": TICKET_SECONDS,
+            "url": getattr(settings, "EVENTS_STREAM_URL", "/api/events/"),
+        })
+
+
+def _channels(user):
+    channels = [f"user:{user.id}"]
+    if user.role == "PRINCIPAL":
+        channels.append("role:PRINCIPAL")
+    return channels
+
+
+def _format(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def event_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "The event stream is only available from the ASGI server"}, status=503)
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        user = None
+    if user is None:
+        return JsonResponse({"error": "Authentication credentials were not provided or are invalid"}, status=401)
+
+    get_backend().start_listener()
+    subscription = broker.subscribe(_channels(user))
+
+    async def stream():
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            yield _format("ready", {"user_id": user.id})
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.overflowed:
+                    # Events were dropped for this slow client.
+                    subscription.overflowed = False
+                    yield _format("resync", {})
+                yield _format(message["event"], message["data"])
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    # GZipMiddleware would buffer the stream; it leaves encoded responses alone.
+    response["Content-Encoding"] = "identity"
+    return response
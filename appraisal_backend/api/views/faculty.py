@@ -11,8 +11,20 @@ from api.permissions import IsFaculty
 from workflow.states import States
 from core.models import FacultyProfile, Appraisal, AppraisalScore
 
+from core.services.draft_buffer import (
+    EDITABLE_STATES,
+    buffer_autosave,
+    discard_buffer,
+    flush_buffer,
+    merged_data,
+)
+from core.services.draft_patch import MAX_OPERATIONS, patch_draft
+from core.services.scope import get_scope
 from core.utils.audit import log_action
+from core.utils.json_patch import JSONPatchError, apply_patch
+from django.utils.dateparse import parse_datetime
 from scoring.activity_selection import normalize_appraisal_activity_mapping
+from workflow.services import TransitionConflict
 
 class FacultySubmitAPI(APIView):
     permission_classes = [IsAuthenticated, IsFaculty]
@@ -95,6 +107,8 @@ class FacultySubmitAPI(APIView):
                 status=States.DRAFT,
                 is_hod_appraisal=False
             )
+        # The full payload supersedes any buffered autosaves.
+        discard_buffer(appraisal.appraisal_id)
 
         if submit_action == "submit":
             # 4️⃣ SCORING (Only for submission)
@@ -185,10 +199,12 @@ class FacultyAppraisalListAPI(APIView):
     permission_classes = [IsAuthenticated, IsFaculty]
 
     def get(self, request):
-        faculty = FacultyProfile.objects.get(user=request.user)
+        faculty_id = get_scope(request).faculty_profile_id
+        if not faculty_id:
+            return Response({"error": "Faculty profile not found"}, status=400)
 
         appraisals = Appraisal.objects.filter(
-            faculty=faculty
+            faculty_id=faculty_id
         ).order_by("-updated_at")
 
         serializer = AppraisalSerializer(appraisals, many=True)
@@ -199,12 +215,17 @@ class FacultyResubmitAPI(APIView):
 
     @transaction.atomic
     def post(self, request, appraisal_id):
-        faculty = FacultyProfile.objects.get(user=request.user)
+        faculty_id = get_scope(request).faculty_profile_id
+        if not faculty_id:
+            return Response({"error": "Faculty profile not found"}, status=400)
 
-        appraisal = Appraisal.objects.get(
-            appraisal_id=appraisal_id,
-            faculty=faculty
-        )
+        try:
+            appraisal = Appraisal.objects.get(
+                appraisal_id=appraisal_id,
+                faculty_id=faculty_id
+            )
+        except Appraisal.DoesNotExist:
+            return Response({"error": "Appraisal not found"}, status=404)
 
         if appraisal.status not in [States.DRAFT, States.RETURNED_BY_HOD, States.RETURNED_BY_PRINCIPAL]:
             return Response(
@@ -213,7 +234,9 @@ class FacultyResubmitAPI(APIView):
             )
 
         # update data
-        data = request.data["appraisal_data"]
+        data = request.data.get("appraisal_data")
+        if not data:
+            return Response({"error": "appraisal_data is required"}, status=400)
         data = normalize_appraisal_activity_mapping(data)
         appraisal.appraisal_data = data
 
@@ -239,6 +262,7 @@ class FacultyResubmitAPI(APIView):
             )
 
         appraisal.save()
+        discard_buffer(appraisal.appraisal_id)
 
         # CREATE/UPDATE SCORE
         if score_result:
@@ -262,7 +286,121 @@ class FacultyResubmitAPI(APIView):
                 old_value=old_state,
                 new_value={
                     "status": appraisal.status,
-                    "faculty_id": faculty.pk
+                    "faculty_id": faculty_id
                 }
             )
         return Response({"message": "Appraisal resubmitted"})
+
+
+def _same_instant(client_value, stored):
+    # Clients may echo updated_at as rendered by DRF (millisecond precision).
+    return client_value.replace(microsecond=client_value.microsecond // 1000 * 1000) == stored.replace(
+        microsecond=stored.microsecond // 1000 * 1000
+    )
+
+
+class AppraisalDraftPatchAPI(APIView):
+    """
+    PATCH {"updated_at": "<as last read>", "operations": [RFC 6902 ops]}
+
+    Applies the operations to the caller's own draft (or returned)
+    appraisal. A missing `updated_at` is answered with 428, a stale one with
+    412 and the current value, so the client can reload before retrying.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def patch(self, request, appraisal_id):
+        operations = request.data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return Response({"error": "operations must be a non-empty list"}, status=400)
+        if len(operations) > MAX_OPERATIONS:
+            return Response({"error": f"At most {MAX_OPERATIONS} operations per request"}, status=400)
+
+        raw_updated_at = request.data.get("updated_at")
+        if not raw_updated_at:
+            return Response({"error": "updated_at precondition is required"}, status=428)
+        client_updated_at = parse_datetime(str(raw_updated_at))
+        if client_updated_at is None:
+            return Response({"error": "updated_at must be an ISO 8601 datetime"}, status=400)
+
+        # No row lock: the write is conditional on the version read here.
+        appraisal = Appraisal.objects.filter(appraisal_id=appraisal_id, faculty__user=request.user).first()
+        if appraisal is None:
+            return Response({"error": "Appraisal not found"}, status=404)
+        if appraisal.status not in EDITABLE_STATES:
+            return Response({"error": "Only draft or returned appraisals can be edited"}, status=400)
+        if not _same_instant(client_updated_at, appraisal.updated_at):
+            return Response(
+                {
+                    "error": "Appraisal was modified since it was loaded. Reload and try again.",
+                    "updated_at": appraisal.updated_at.isoformat(),
+                },
+                status=412,
+            )
+
+        try:
+            sections = patch_draft(appraisal, operations)
+        except JSONPatchError as e:
+            return Response({"error": str(e)}, status=422)
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
+
+        return Response({
+            "message": "Draft updated",
+            "appraisal_id": appraisal.appraisal_id,
+            "updated_at": appraisal.updated_at.isoformat(),
+            "sections": sections,
+        })
+
+
+class AppraisalAutosaveAPI(APIView):
+    """
+    POST {"sections": {name: value}} or {"operations": [RFC 6902 ops]}
+
+    Buffers an autosave of the caller's own draft without rewriting the
+    appraisal row; `"flush": true` (explicit save) persists it immediately.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, appraisal_id):
+        sections = request.data.get("sections")
+        operations = request.data.get("operations")
+        flush = request.data.get("flush") is True
+        if sections is not None and not isinstance(sections, dict):
+            return Response({"error": "sections must be an object"}, status=400)
+        if operations is not None and (not isinstance(operations, list) or len(operations) > MAX_OPERATIONS):
+            return Response({"error": f"operations must be a list of at most {MAX_OPERATIONS} items"}, status=400)
+        if not (sections or operations or flush):
+            return Response({"error": "sections or operations is required"}, status=400)
+
+        queryset = Appraisal.objects.filter(appraisal_id=appraisal_id, faculty__user=request.user)
+        if not operations:
+            queryset = queryset.defer("appraisal_data")
+        appraisal = queryset.select_related("draft_buffer").first()
+        if appraisal is None:
+            return Response({"error": "Appraisal not found"}, status=404)
+        if appraisal.status not in EDITABLE_STATES:
+            return Response({"error": "Only draft or returned appraisals can be edited"}, status=400)
+
+        if operations:
+            # Patch the merged view and buffer the whole of each touched section.
+            try:
+                patched, touched = apply_patch(merged_data(appraisal), operations)
+            except JSONPatchError as e:
+                return Response({"error": str(e)}, status=422)
+            sections = {**(sections or {}), **{name: patched.get(name) for name in touched}}
+
+        flushed = False
+        try:
+            if sections:
+                _, flushed = buffer_autosave(appraisal, sections)
+            if flush and not flushed:
+                flushed = flush_buffer(appraisal.appraisal_id) is not None
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
+
+        return Response({
+            "appraisal_id": appraisal.appraisal_id,
+            "sections": sorted(sections or ()),
+            "flushed": flushed,
+        })
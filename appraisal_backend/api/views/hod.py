@@ -4,16 +4,29 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
 from api.permissions import IsHOD
-from core.models import Appraisal, ApprovalHistory, Department
-from workflow.engine import perform_action
+from core.models import Appraisal, ApprovalHistory, ReviewInbox
+from workflow.services import (
+    TransitionConflict,
+    approval_scores,
+    bulk_transition,
+    hod_review_data,
+    parse_bulk_request,
+    transition_appraisal,
+    update_appraisal,
+)
+from workflow.counters import counter_rows, live_rows, summarize
 from workflow.states import States
 from scoring.engine import calculate_full_score
 from validation.master_validator import validate_full_form
 from django.db import transaction
 from django.utils import timezone
-from api.serializers import AppraisalSerializer
-from core.models import FacultyProfile, Appraisal, AppraisalScore, User, HODProfile
+from api.filters import filter_appraisals
+from api.pagination import paginate_appraisals, wants_pagination
+from api.serializers import AppraisalListSerializer
+from core.models import FacultyProfile, Appraisal, AppraisalScore, User
 from core.utils.audit import log_action
+from core.services.draft_buffer import discard_buffer
+from core.services.scope import get_scope
 from core.services.sppu_verified import (
     ALLOWED_VERIFIED_GRADES,
     merge_verified_grading,
@@ -22,27 +35,6 @@ from core.services.sppu_verified import (
 from scoring.activity_selection import normalize_appraisal_activity_mapping
 
 
-def _get_hod_department(user):
-    """
-    Resolve HOD department primarily via Department.hod and fallback to HODProfile.
-    Keeps existing data model behavior while supporting legacy records.
-    """
-    department = Department.objects.filter(hod=user).first()
-    if department:
-        return department
-
-    hod_profile = HODProfile.objects.select_related("department").filter(user=user).first()
-    if not hod_profile:
-        return None
-
-    # Best-effort sync so subsequent requests use Department.hod path.
-    if hod_profile.department.hod_id != user.id:
-        hod_profile.department.hod = user
-        hod_profile.department.save(update_fields=["hod"])
-
-    return hod_profile.department
-
-
 class HODSubmitAPI(APIView):
     permission_classes = [IsAuthenticated, IsHOD]
 
@@ -89,8 +81,10 @@ class HODSubmitAPI(APIView):
                 )
             # Update existing draft
             appraisal = existing_appraisal
-            appraisal.appraisal_data = payload
-            appraisal.save()
+            try:
+                update_appraisal(appraisal, appraisal_data=payload)
+            except TransitionConflict as e:
+                return Response({"error": str(e)}, status=409)
         else:
             # 5️⃣ CREATE APPRAISAL (INITIAL STATE = DRAFT)
             appraisal = Appraisal.objects.create(
@@ -103,17 +97,19 @@ class HODSubmitAPI(APIView):
                 is_hod_appraisal=True,
                 principal=User.objects.filter(role="PRINCIPAL").first()
             )
+        # The full payload supersedes any buffered autosaves.
+        discard_buffer(appraisal.appraisal_id)
 
         if submit_action == "submit":
             old_state = {"status": appraisal.status}
             score_result = calculate_full_score(payload)
 
-            appraisal.status = perform_action(
-                current_state=appraisal.status,
-                next_state=States.SUBMITTED,
-                appraisal=appraisal
-            )
-            appraisal.save()
+            try:
+                transition_appraisal(appraisal, States.SUBMITTED)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+            except TransitionConflict as e:
+                return Response({"error": str(e)}, status=409)
 
             AppraisalScore.objects.create(
                 appraisal=appraisal,
@@ -159,18 +155,28 @@ class HODAppraisalListAPI(APIView):
     permission_classes = [IsAuthenticated, IsHOD]
 
     def get(self, request):
-        faculty = FacultyProfile.objects.filter(user=request.user).first()
-        if not faculty:
+        faculty_id = get_scope(request).faculty_profile_id
+        if not faculty_id:
             return Response({"error": "Faculty profile not found for HOD"}, status=400)
 
         appraisals = Appraisal.objects.filter(
-            faculty=faculty,
+            faculty_id=faculty_id,
             is_hod_appraisal=True
-        ).order_by("-updated_at")
+        ).only(*AppraisalListSerializer.Meta.fields)
 
+        try:
+            appraisals = filter_appraisals(appraisals, request.query_params, allow_department=False)
+            if wants_pagination(request):
+                page, next_cursor = paginate_appraisals(appraisals, request)
+                return Response({
+                    "results": AppraisalListSerializer(page, many=True).data,
+                    "next_cursor": next_cursor,
+                })
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
         return Response(
-            AppraisalSerializer(appraisals, many=True).data
+            AppraisalListSerializer(appraisals.order_by("-updated_at"), many=True).data
         )
 
 
@@ -179,15 +185,18 @@ class HODResubmitAPI(APIView):
 
     @transaction.atomic
     def post(self, request, appraisal_id):
-        faculty = FacultyProfile.objects.filter(user=request.user).first()
-        if not faculty:
+        faculty_id = get_scope(request).faculty_profile_id
+        if not faculty_id:
             return Response({"error": "Faculty profile not found for HOD"}, status=400)
 
-        appraisal = Appraisal.objects.get(
-            appraisal_id=appraisal_id,
-            faculty=faculty,
-            is_hod_appraisal=True
-        )
+        try:
+            appraisal = Appraisal.objects.get(
+                appraisal_id=appraisal_id,
+                faculty_id=faculty_id,
+                is_hod_appraisal=True
+            )
+        except Appraisal.DoesNotExist:
+            return Response({"error": "Appraisal not found"}, status=404)
 
         if appraisal.status not in [States.DRAFT, States.RETURNED_BY_PRINCIPAL]:
             return Response(
@@ -200,9 +209,10 @@ class HODResubmitAPI(APIView):
         }
 
         # update data
-        data = request.data["appraisal_data"]
+        data = request.data.get("appraisal_data")
+        if not data:
+            return Response({"error": "appraisal_data is required"}, status=400)
         data = normalize_appraisal_activity_mapping(data)
-        appraisal.appraisal_data = data
 
         submit_action = data.get("submit_action", "submit").lower()
 
@@ -215,13 +225,16 @@ class HODResubmitAPI(APIView):
             score_result = calculate_full_score(data)
 
         # workflow
-        if submit_action == "submit":
-            appraisal.status = perform_action(
-                current_state=appraisal.status,
-                next_state=States.SUBMITTED
-            )
-        
-        appraisal.save()
+        try:
+            if submit_action == "submit":
+                transition_appraisal(appraisal, States.SUBMITTED, appraisal_data=data)
+            else:
+                update_appraisal(appraisal, appraisal_data=data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
+        discard_buffer(appraisal.appraisal_id)
 
         # CREATE/UPDATE SCORE
         if score_result:
@@ -270,8 +283,8 @@ class HODStartReviewAppraisal(APIView):
             return Response({"error": "Appraisal not found"}, status=404)
 
         # 2️⃣ Fetch HOD department
-        department = _get_hod_department(request.user)
-        if not department:
+        department_id = get_scope(request).hod_department_id
+        if not department_id:
             return Response(
                 {"error": "HOD is not assigned to any department"},
                 status=400
@@ -279,27 +292,20 @@ class HODStartReviewAppraisal(APIView):
 
         
         # 3️⃣ Ownership check
-        if appraisal.faculty.department != department:
+        if appraisal.department_id != department_id:
             return Response(
                 {"error": "You cannot review appraisals outside your department"},
                 status=403
             )
 
-        # 4️⃣ Workflow transition
+        # 4️⃣ Workflow transition + save (conditional on the version read above)
         try:
-            new_state = perform_action(
-                current_state=appraisal.status,
-                next_state=States.REVIEWED_BY_HOD
-            )
+            new_state = transition_appraisal(appraisal, States.REVIEWED_BY_HOD)
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
-        # 5️⃣ Save
-        appraisal.status = new_state
-  
-        appraisal.save()
-
-        
         return Response({
             "message": "Appraisal moved to HOD review",
             "current_state": new_state
@@ -313,46 +319,68 @@ class HODAppraisalList(APIView):
     permission_classes = [IsAuthenticated, IsHOD]
 
     def get(self, request):
-        department = _get_hod_department(request.user)
-        if not department:
+        department_id = get_scope(request).hod_department_id
+        if not department_id:
             return Response(
                 {"error": "HOD is not assigned to any department"},
                 status=400
             )
 
-        appraisals = Appraisal.objects.select_related(
-            "faculty", "faculty__department"
-        ).filter(
-            faculty__department=department,
-            is_hod_appraisal=False,
-            status__in=[
-                States.SUBMITTED, 
-                States.REVIEWED_BY_HOD, 
-                States.HOD_APPROVED,
-                States.REVIEWED_BY_PRINCIPAL,
-                States.PRINCIPAL_APPROVED,
-                States.FINALIZED,
-                States.RETURNED_BY_HOD,
-                States.RETURNED_BY_PRINCIPAL,
-            ]
-        ).order_by("-updated_at")
-        
-        return Response([
-            {
-                "appraisal_id": a.appraisal_id,          # ✅ REQUIRED
-                "academic_year": a.academic_year,
-                "semester": a.semester,
-                "status": a.status,
+        # Served from the ReviewInbox read model (workflow.inbox).
+        appraisals = ReviewInbox.objects.filter(role="HOD", department_id=department_id)
+
+        try:
+            appraisals = filter_appraisals(appraisals, request.query_params, allow_department=False)
+            if wants_pagination(request):
+                page, next_cursor = paginate_appraisals(appraisals, request)
+                return Response({
+                    "results": [self._row(a) for a in page],
+                    "next_cursor": next_cursor,
+                })
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        return Response([self._row(a) for a in appraisals.order_by("-updated_at")])
+
+    @staticmethod
+    def _row(a):
+        return {
+            "appraisal_id": a.appraisal_id,          # ✅ REQUIRED
+            "academic_year": a.academic_year,
+            "semester": a.semester,
+            "status": a.status,
+
+            # ✅ REQUIRED FOR UI
+            "faculty_name": a.faculty_name,
+            "designation": a.designation,
+            "department": a.department_name,
+
+            "total_score": a.total_score,
+            "status_since": a.status_since,
+        }
+
 
-                # ✅ REQUIRED FOR UI
-                "faculty_name": a.faculty.full_name,
-                "designation": a.faculty.designation,
-                "department": a.faculty.department.department_name,
-            }
-            for a in appraisals
-        ])
 
 
+class HODDashboardSummaryAPI(APIView):
+    permission_classes = [IsAuthenticated, IsHOD]
+
+    def get(self, request):
+        department_id = get_scope(request).hod_department_id
+        if not department_id:
+            return Response(
+                {"error": "HOD is not assigned to any department"},
+                status=400
+            )
+        academic_year = request.query_params.get("academic_year")
+
+        # ?verify=1 recomputes from the appraisals table instead of the counters
+        verify = request.query_params.get("verify") in ("1", "true")
+        rows = (live_rows if verify else counter_rows)(department_id, academic_year)
+
+        payload = summarize(rows)
+        payload["source"] = "live" if verify else "counters"
+        return Response(payload)
 
 
 # =========================
@@ -372,14 +400,14 @@ class HODApproveAppraisal(APIView):
             return Response({"error": "Appraisal not found"}, status=404)
 
         # 🔒 Department check
-        department = _get_hod_department(request.user)
-        if not department:
+        department_id = get_scope(request).hod_department_id
+        if not department_id:
             return Response(
                 {"error": "HOD is not assigned to any department"},
                 status=400
             )
 
-        if appraisal.faculty.department != department:
+        if appraisal.department_id != department_id:
             return Response(
                 {"error": "You cannot act on appraisals outside your department"},
                 status=403
@@ -412,65 +440,42 @@ class HODApproveAppraisal(APIView):
 
         overall_verified_grade = derive_overall_grade(table1_teaching, table1_activities)
 
-        # Recalculate scores so verified score persists with HOD approval as well.
-        try:
-            score_result = calculate_full_score(appraisal.appraisal_data)
-        except Exception:
-            score_result = None
-
-        AppraisalScore.objects.update_or_create(
-            appraisal=appraisal,
-            defaults={
-                "verified_grade": overall_verified_grade,
-                **(
-                    {
-                        "teaching_score": score_result["teaching"]["score"],
-                        "research_score": score_result["research"]["total"],
-                        "activity_score": score_result["activities"]["score"],
-                        "feedback_score": score_result["pbas"]["total"],
-                        "total_score": score_result["total_score"],
-                        "acr_score": score_result["acr"]["credit_point"],
-                    }
-                    if score_result else {}
-                ),
-            }
-        )
+        # Same review data and recalculated scores as a bulk approval.
+        appraisal_data = hod_review_data(appraisal_data, request.data)
+        scores = approval_scores(appraisal_data)
 
-        hod_review = appraisal_data.get("hod_review", {})
-        if not isinstance(hod_review, dict):
-            hod_review = {}
-        hod_review["comments_table1"] = request.data.get("hod_comments_table1", "") or ""
-        hod_review["comments_table2"] = request.data.get("hod_comments_table2", "") or ""
-        hod_review["remarks_suggestions"] = request.data.get("hod_remarks", "") or ""
-        hod_review["justification"] = request.data.get("hod_justification_not_satisfactory", "") or ""
-        appraisal_data["hod_review"] = hod_review
-        appraisal.appraisal_data = appraisal_data
-
-        # ✅ Approve
-        new_state = perform_action(
-            current_state=appraisal.status,
-            next_state=States.HOD_APPROVED
-        )
+        # ✅ Approve (state, score and history commit together or not at all)
+        try:
+            with transaction.atomic():
+                new_state = transition_appraisal(
+                    appraisal,
+                    States.HOD_APPROVED,
+                    appraisal_data=appraisal_data,
+                )
 
-        appraisal.status = new_state
-        appraisal.save()
+                AppraisalScore.objects.update_or_create(
+                    appraisal=appraisal,
+                    defaults={"verified_grade": overall_verified_grade, **scores},
+                )
 
-        ApprovalHistory.objects.update_or_create(
-            appraisal=appraisal,
-            role="HOD",
-            defaults={
-                "approved_by": request.user,
-                "action": "APPROVED",
-                "from_state": States.REVIEWED_BY_HOD,
-                "to_state": new_state,
-                "remarks": None
-            }
-        )
+                ApprovalHistory.objects.update_or_create(
+                    appraisal=appraisal,
+                    role="HOD",
+                    defaults={
+                        "approved_by": request.user,
+                        "action": "APPROVED",
+                        "from_state": States.REVIEWED_BY_HOD,
+                        "to_state": new_state,
+                        "remarks": None
+                    }
+                )
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
 
         return Response({
             "message": "Approved by HOD",
             "new_state": new_state,
-            "total_score": score_result.get("total_score") if score_result else None
+            "total_score": scores.get("total_score")
         })
 
 
@@ -483,14 +488,14 @@ class HODVerifyGradeAPI(APIView):
         except Appraisal.DoesNotExist:
             return Response({"error": "Appraisal not found"}, status=404)
 
-        department = _get_hod_department(request.user)
-        if not department:
+        department_id = get_scope(request).hod_department_id
+        if not department_id:
             return Response(
                 {"error": "HOD is not assigned to any department"},
                 status=400
             )
 
-        if appraisal.faculty.department != department:
+        if appraisal.department_id != department_id:
             return Response(
                 {"error": "You cannot act on appraisals outside your department"},
                 status=403
@@ -541,8 +546,6 @@ class HODVerifyGradeAPI(APIView):
         hod_review["verification_saved_at"] = saved_at
         hod_review["verification_saved_by"] = request.user.id
         appraisal_data["hod_review"] = hod_review
-        appraisal.appraisal_data = appraisal_data
-        appraisal.save(update_fields=["appraisal_data"])
 
         overall_verified_grade = derive_overall_grade(
             table1_teaching,
@@ -552,28 +555,34 @@ class HODVerifyGradeAPI(APIView):
         # Recalculate scores so the frontend "verified score" field can be auto-filled while HOD is reviewing.
         # This keeps the persisted AppraisalScore in sync with the latest verified grades.
         try:
-            score_result = calculate_full_score(appraisal.appraisal_data)
+            score_result = calculate_full_score(appraisal_data)
         except Exception:
             score_result = None
 
-        AppraisalScore.objects.update_or_create(
-            appraisal=appraisal,
-            defaults={
-                "verified_grade": overall_verified_grade,
-                # Persist calculated scores so they reflect on the verify screen without manual entry
-                **(
-                    {
-                        "teaching_score": score_result["teaching"]["score"],
-                        "research_score": score_result["research"]["total"],
-                        "activity_score": score_result["activities"]["score"],
-                        "feedback_score": score_result["pbas"]["total"],
-                        "total_score": score_result["total_score"],
-                        "acr_score": score_result["acr"]["credit_point"],
+        try:
+            with transaction.atomic():
+                update_appraisal(appraisal, appraisal_data=appraisal_data)
+
+                AppraisalScore.objects.update_or_create(
+                    appraisal=appraisal,
+                    defaults={
+                        "verified_grade": overall_verified_grade,
+                        # Persist calculated scores so they reflect on the verify screen without manual entry
+                        **(
+                            {
+                                "teaching_score": score_result["teaching"]["score"],
+                                "research_score": score_result["research"]["total"],
+                                "activity_score": score_result["activities"]["score"],
+                                "feedback_score": score_result["pbas"]["total"],
+                                "total_score": score_result["total_score"],
+                                "acr_score": score_result["acr"]["credit_point"],
+                            }
+                            if score_result else {}
+                        ),
                     }
-                    if score_result else {}
-                ),
-            }
-        )
+                )
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
 
         return Response(
             {
@@ -607,14 +616,14 @@ class HODReturnAppraisal(APIView):
         except Appraisal.DoesNotExist:
             return Response({"error": "Appraisal not found"}, status=404)
 
-        department = _get_hod_department(request.user)
-        if not department:
+        department_id = get_scope(request).hod_department_id
+        if not department_id:
             return Response(
                 {"error": "HOD is not assigned to any department"},
                 status=400
             )
 
-        if appraisal.faculty.department != department:
+        if appraisal.department_id != department_id:
             return Response(
                 {"error": "You cannot act on appraisals outside your department"},
                 status=403
@@ -627,33 +636,69 @@ class HODReturnAppraisal(APIView):
             )
 
 
-        
-        new_state = perform_action(
-            current_state=appraisal.status,
-            next_state=States.RETURNED_BY_HOD
-        )
+        from_state = appraisal.status
+        try:
+            with transaction.atomic():
+                new_state = transition_appraisal(
+                    appraisal,
+                    States.RETURNED_BY_HOD,
+                    remarks=remarks,
+                )
 
+                ApprovalHistory.objects.update_or_create(
+                    appraisal=appraisal,
+                    role="HOD",
+                    defaults={
+                        "approved_by": request.user,
+                        "action": "SENT_BACK",
+                        "from_state": from_state,
+                        "to_state": new_state,
+                        "remarks": remarks
+                    }
+                )
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
+
+        return Response({
+            "message": "Returned to faculty",
+            "new_state": new_state
+        })
+
+
+
+
+
+# =========================
+# HOD BULK TRANSITION
+# =========================
+class HODBulkTransitionAPI(APIView):
+    permission_classes = [IsAuthenticated, IsHOD]
 
-        appraisal.status = new_state
+    def post(self, request):
+        appraisal_ids, action, remarks, error = parse_bulk_request(request.data, "HOD")
+        if error:
+            return Response({"error": error}, status=400)
 
-        appraisal.remarks = remarks
-        appraisal.save()
+        department_id = get_scope(request).hod_department_id
+        if not department_id:
+            return Response(
+                {"error": "HOD is not assigned to any department"},
+                status=400
+            )
 
-        ApprovalHistory.objects.update_or_create(
-            appraisal=appraisal,
+        results = bulk_transition(
+            request=request,
             role="HOD",
-            defaults={
-                "approved_by": request.user,
-                "action": "SENT_BACK",
-                "from_state": appraisal.status, # Use dynamic state
-                "to_state": new_state,
-                "remarks": remarks
-            }
+            action=action,
+            appraisal_ids=appraisal_ids,
+            remarks=remarks,
+            department_id=department_id,
         )
+        succeeded = sum(1 for item in results if item["ok"])
 
         return Response({
-            "message": "Returned to faculty",
-            "new_state": new_state
+            "action": action,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results,
         })
-
-
@@ -3,13 +3,14 @@ import logging
 from time import perf_counter
 
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 
 
+from api.authentication import PasswordChangeEnforcedJWTAuthentication
 from core.models import FacultyProfile, HODProfile, PrincipalProfile
+from core.services.scope import get_scope
 
 logger = logging.getLogger("api.performance")
 
@@ -36,8 +37,12 @@ def _build_media_url(request, image_field):
     return request.build_absolute_uri(url)
 
 
+def _by_pk(model, pk):
+    return model.objects.filter(pk=pk).first() if pk else None
+
+
 class MeView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PasswordChangeEnforcedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
@@ -55,8 +60,10 @@ class MeView(APIView):
         date_of_joining = user.date_joined
         profile_image = None
 
+        # Profile ids come from the cached scope; absent profiles cost no query.
+        scope = get_scope(request)
         if user.role == "FACULTY":
-            profile = FacultyProfile.objects.filter(user=user).first()
+            profile = _by_pk(FacultyProfile, scope.faculty_profile_id)
             if profile:
                 date_of_joining = profile.date_of_joining or user.date_joined
                 profile_image = _build_media_url(request, profile.profile_image)
@@ -69,13 +76,16 @@ class MeView(APIView):
                 }
 
         elif user.role == "HOD":
-            profile = HODProfile.objects.filter(user=user).first()
-            faculty_profile = FacultyProfile.objects.filter(user=user).first()
+            profile = _by_pk(HODProfile, scope.hod_profile_id)
             if profile:
-                date_of_joining = (
-                    (faculty_profile.date_of_joining if faculty_profile else None)
-                    or user.date_joined
-                )
+                faculty_joined = None
+                if scope.faculty_profile_id:
+                    faculty_joined = (
+                        FacultyProfile.objects.filter(pk=scope.faculty_profile_id)
+                        .values_list("date_of_joining", flat=True)
+                        .first()
+                    )
+                date_of_joining = faculty_joined or user.date_joined
                 profile_image = _build_media_url(request, profile.profile_image)
                 profile_data = {
                     "full_name": profile.full_name or user.full_name,
@@ -86,7 +96,7 @@ class MeView(APIView):
                 }
 
         elif user.role == "PRINCIPAL":
-            profile = PrincipalProfile.objects.filter(user=user).first()
+            profile = _by_pk(PrincipalProfile, scope.principal_profile_id)
             if profile:
                 profile_data = {
                     "full_name": profile.full_name or user.full_name,
@@ -1,21 +1,36 @@
-
-from core.services.pdf.data_mapper import get_common_pdf_data
-from core.services.pdf.sppu_mapper import get_sppu_pdf_data
-from core.services.pdf.pbas_mapper import get_pbas_pdf_data
-from core.services.pdf.html_pdf import generate_pdf_from_html
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
+from api.filters import ALL_STATES, filter_appraisals
+from api.pagination import decode_keyset, encode_keyset, page_size, paginate_appraisals, wants_pagination
 from api.permissions import IsPrincipal
-from core.models import Appraisal, AppraisalScore
+from core.models import Appraisal, AppraisalScore, DwellRollup, ReviewInbox
+from workflow.aging import oldest_in_state
+from workflow.counters import counter_rows, live_rows, summarize
 from workflow.states import States
-from workflow.engine import perform_action
+from workflow.services import (
+    TransitionConflict,
+    bulk_transition,
+    parse_bulk_request,
+    principal_review_data,
+    transition_appraisal,
+    update_appraisal,
+)
 from core.models import ApprovalHistory
-from core.services.pdf.save import save_pdf
+from core.services.appraisal_export import (
+    ExportUnavailable,
+    export_queryset,
+    iter_csv,
+    resolve_columns,
+    write_xlsx,
+)
+from core.services.outbox import enqueue
 from core.utils.audit import log_action
 from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
+from datetime import timedelta
 from core.services.sppu_verified import (
     ALLOWED_VERIFIED_GRADES,
     merge_verified_grading,
@@ -57,41 +72,37 @@ class PrincipalApproveAPI(APIView):
                 )
 
             overall_verified_grade = derive_overall_grade(table1_teaching, table1_activities)
-            AppraisalScore.objects.update_or_create(
-                appraisal=appraisal,
-                defaults={"verified_grade": overall_verified_grade}
-            )
-
-        new_state = perform_action(
-            current_state=appraisal.status,
-            next_state=States.PRINCIPAL_APPROVED
-        )
+        else:
+            overall_verified_grade = None
 
-        appraisal.status = new_state
-        appraisal.principal = request.user
-        appraisal.appraisal_data = appraisal_data
+        changes = {"principal": request.user, "appraisal_data": appraisal_data}
         if principal_remarks is not None:
-            appraisal.remarks = principal_remarks
-
-            principal_review = appraisal_data.get("principal_review", {})
-            if not isinstance(principal_review, dict):
-                principal_review = {}
-            principal_review["remarks"] = principal_remarks
-            appraisal_data["principal_review"] = principal_review
-            appraisal.appraisal_data = appraisal_data
-        appraisal.save()
-
-        ApprovalHistory.objects.update_or_create(
-            appraisal=appraisal,
-            role="PRINCIPAL",
-            defaults={
-                "approved_by": request.user,
-                "action": "APPROVED",
-                "from_state": States.REVIEWED_BY_PRINCIPAL,
-                "to_state": new_state,
-                "remarks": appraisal.remarks
-            }
-        )
+            changes["remarks"] = principal_remarks
+            changes["appraisal_data"] = principal_review_data(appraisal_data, principal_remarks)
+
+        try:
+            with transaction.atomic():
+                new_state = transition_appraisal(appraisal, States.PRINCIPAL_APPROVED, **changes)
+
+                if overall_verified_grade:
+                    AppraisalScore.objects.update_or_create(
+                        appraisal=appraisal,
+                        defaults={"verified_grade": overall_verified_grade}
+                    )
+
+                ApprovalHistory.objects.update_or_create(
+                    appraisal=appraisal,
+                    role="PRINCIPAL",
+                    defaults={
+                        "approved_by": request.user,
+                        "action": "APPROVED",
+                        "from_state": States.REVIEWED_BY_PRINCIPAL,
+                        "to_state": new_state,
+                        "remarks": appraisal.remarks
+                    }
+                )
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
 
         return Response({
             "message": "Approved by Principal",
@@ -148,17 +159,20 @@ class PrincipalVerifyGradeAPI(APIView):
         principal_review["verification_saved_at"] = saved_at
         principal_review["verification_saved_by"] = request.user.id
         appraisal_data["principal_review"] = principal_review
-        appraisal.appraisal_data = appraisal_data
-        appraisal.save(update_fields=["appraisal_data"])
 
         overall_verified_grade = derive_overall_grade(
             table1_teaching,
             table1_activities,
         )
-        AppraisalScore.objects.update_or_create(
-            appraisal=appraisal,
-            defaults={"verified_grade": overall_verified_grade}
-        )
+        try:
+            with transaction.atomic():
+                update_appraisal(appraisal, appraisal_data=appraisal_data)
+                AppraisalScore.objects.update_or_create(
+                    appraisal=appraisal,
+                    defaults={"verified_grade": overall_verified_grade}
+                )
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
 
         return Response(
             {
@@ -178,47 +192,192 @@ class PrincipalAppraisalList(APIView):
     permission_classes = [IsAuthenticated, IsPrincipal]
 
     def get(self, request):
-        from django.db.models import Q
-        
-        appraisals = (
-            Appraisal.objects
-            .filter(
-                Q(status__in=[
-                    States.HOD_APPROVED,
-                    States.REVIEWED_BY_PRINCIPAL,
-                    States.PRINCIPAL_APPROVED,
-                    States.FINALIZED,
-                ]) |
-                Q(status=States.SUBMITTED, is_hod_appraisal=True)
-            )
-            .select_related("faculty__user")
-            .order_by("-updated_at")
+        # Served from the ReviewInbox read model (workflow.inbox).
+        appraisals = ReviewInbox.objects.filter(role="PRINCIPAL")
+
+        try:
+            appraisals = filter_appraisals(appraisals, request.query_params)
+            if wants_pagination(request):
+                page, next_cursor = paginate_appraisals(appraisals, request)
+                return Response({
+                    "results": [self._row(a) for a in page],
+                    "next_cursor": next_cursor,
+                })
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        return Response([self._row(a) for a in appraisals.order_by("-updated_at")])
+
+    @staticmethod
+    def _row(a):
+        return {
+            "id": a.appraisal_id,
+
+            # ✅ FACULTY DETAILS
+            "faculty_name": a.faculty_name,
+            "designation": a.designation,
+            "department": a.department_name,
+
+            # ✅ APPRAISAL DETAILS
+            "academic_year": a.academic_year,
+            "semester": a.semester,
+            "status": a.status,
+            "remarks": a.remarks,
+            "is_hod_appraisal": a.is_hod_appraisal,
+            "total_score": a.total_score,
+            "status_since": a.status_since,
+        }
+
+
+class PrincipalDashboardSummaryAPI(APIView):
+    permission_classes = [IsAuthenticated, IsPrincipal]
+
+    def get(self, request):
+        department = request.query_params.get("department")
+        if department and not department.isdigit():
+            return Response({"error": "department must be a department id"}, status=400)
+        department_id = int(department) if department else None
+        academic_year = request.query_params.get("academic_year")
+
+        # ?verify=1 recomputes from the appraisals table instead of the counters
+        verify = request.query_params.get("verify") in ("1", "true")
+        rows = (live_rows if verify else counter_rows)(department_id, academic_year)
+
+        payload = summarize(rows)
+        payload["source"] = "live" if verify else "counters"
+        return Response(payload)
+
+
+class PrincipalAgingQueueAPI(APIView):
+    """
+    Appraisals that have waited longest in their current state.
+    ?state=SUBMITTED,REVIEWED_BY_HOD (default) &limit=N &department=<id>;
+    a cursor pages through a single state.
+    """
+    permission_classes = [IsAuthenticated, IsPrincipal]
+
+    DEFAULT_STATES = [States.SUBMITTED, States.REVIEWED_BY_HOD]
+
+    def get(self, request):
+        raw_states = request.query_params.get("state")
+        states = (
+            [s.strip().upper() for s in raw_states.split(",") if s.strip()]
+            if raw_states else self.DEFAULT_STATES
         )
+        unknown = sorted(set(states) - ALL_STATES)
+        if unknown:
+            return Response({"error": f"Unknown status: {', '.join(unknown)}"}, status=400)
+
+        department = request.query_params.get("department")
+        if department and not department.isdigit():
+            return Response({"error": "department must be a department id"}, status=400)
+
+        cursor = request.query_params.get("cursor")
+        if cursor and len(states) != 1:
+            return Response({"error": "cursor requires exactly one state"}, status=400)
+
+        try:
+            limit = page_size(request)
+            after = decode_keyset(cursor) if cursor else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        now = timezone.now()
+        payload = {}
+        for state in states:
+            rows = oldest_in_state(
+                state,
+                limit=limit + 1,
+                after=after,
+                department_id=int(department) if department else None,
+            )
+            next_cursor = (
+                encode_keyset(rows[limit - 1].entered_at, rows[limit - 1].transition_id)
+                if len(rows) > limit else None
+            )
+            payload[state] = {
+                "results": [
+                    {
+                        "appraisal_id": row.appraisal_id,
+                        "faculty_name": row.appraisal.faculty.full_name,
+                        "department": row.department.department_name if row.department else None,
+                        "academic_year": row.appraisal.academic_year,
+                        "semester": row.appraisal.semester,
+                        "entered_at": row.entered_at,
+                        "age_hours": round((now - row.entered_at).total_seconds() / 3600, 1),
+                    }
+                    for row in rows[:limit]
+                ],
+                "next_cursor": next_cursor,
+            }
 
-        response_data = []
+        return Response({"states": payload})
 
-        for a in appraisals:
-            faculty = a.faculty
-            user = faculty.user if faculty else None
 
-            response_data.append({
-                "id": a.appraisal_id,
+class PrincipalDwellReportAPI(APIView):
+    """Nightly p50/p95 time-in-state per department (see manage.py rollup_dwell)."""
+    permission_classes = [IsAuthenticated, IsPrincipal]
 
-                # ✅ FACULTY DETAILS
-                "faculty_name": faculty.full_name if faculty else None,
-                "designation": faculty.designation if faculty else None,
-                "department": user.department if user else None,
+    def get(self, request):
+        try:
+            days = max(1, min(int(request.query_params.get("days", 30)), 366))
+        except ValueError:
+            return Response({"error": "days must be an integer"}, status=400)
+
+        since = timezone.localdate() - timedelta(days=days)
+        rows = (
+            DwellRollup.objects.filter(day__gt=since)
+            .select_related("department")
+            .order_by("-day", "state", "department_id")
+        )
+        return Response([
+            {
+                "day": row.day,
+                "department_id": row.department_id,
+                "department": row.department.department_name if row.department else None,
+                "state": row.state,
+                "samples": row.samples,
+                "p50_hours": round(row.p50_seconds / 3600, 1),
+                "p95_hours": round(row.p95_seconds / 3600, 1),
+            }
+            for row in rows
+        ])
 
-                # ✅ APPRAISAL DETAILS
-                "academic_year": a.academic_year,
-                "semester": a.semester,
-                "status": a.status,
-                "remarks": a.remarks,
-                "is_hod_appraisal": a.is_hod_appraisal,
-            })
 
+class PrincipalAppraisalExportAPI(APIView):
+    """
+    Stream every matching appraisal with its score breakdown.
+    ?file_type=csv|xlsx &columns=a,b,c plus the list filters
+    (status, academic_year, form_type, department).
+    """
+    permission_classes = [IsAuthenticated, IsPrincipal]
 
-        return Response(response_data)
+    def get(self, request):
+        file_type = request.query_params.get("file_type", "csv").lower()
+        if file_type not in ("csv", "xlsx"):
+            return Response({"error": "file_type must be csv or xlsx"}, status=400)
+
+        try:
+            columns = resolve_columns(request.query_params.get("columns"))
+            appraisals = filter_appraisals(Appraisal.objects.all(), request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        appraisals = export_queryset(appraisals)
+
+        filename = f"appraisals_{timezone.localdate():%Y%m%d}.{file_type}"
+        if file_type == "csv":
+            response = StreamingHttpResponse(iter_csv(appraisals, columns), content_type="text/csv")
+        else:
+            try:
+                workbook = write_xlsx(appraisals, columns)
+            except ExportUnavailable as e:
+                return Response({"error": str(e)}, status=400)
+            response = FileResponse(
+                workbook,
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
 
 
 class PrincipalStartReviewAPI(APIView):
@@ -238,17 +397,16 @@ class PrincipalStartReviewAPI(APIView):
 
 
         try:
-            new_state = perform_action(
-                current_state=appraisal.status,
-                next_state=States.REVIEWED_BY_PRINCIPAL
+            new_state = transition_appraisal(
+                appraisal,
+                States.REVIEWED_BY_PRINCIPAL,
+                principal=request.user,
             )
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
-        appraisal.status = new_state
-        appraisal.principal = request.user
-        appraisal.save()
-
         return Response({
             "message": "Moved to principal review",
             "current_state": new_state
@@ -276,28 +434,29 @@ class PrincipalReturnAPI(APIView):
             status=403
         )
 
-        new_state = perform_action(
-            current_state=appraisal.status,
-            next_state=States.RETURNED_BY_PRINCIPAL
-        )
-
-
-        appraisal.status = new_state
-        appraisal.principal = request.user
-        appraisal.remarks = remarks
-        appraisal.save()
+        from_state = appraisal.status
+        try:
+            with transaction.atomic():
+                new_state = transition_appraisal(
+                    appraisal,
+                    States.RETURNED_BY_PRINCIPAL,
+                    principal=request.user,
+                    remarks=remarks,
+                )
 
-        ApprovalHistory.objects.update_or_create(
-            appraisal=appraisal,
-            role="PRINCIPAL",
-            defaults={
-                "approved_by": request.user,
-                "action": "SENT_BACK",
-                "from_state": appraisal.status, # Use dynamic state
-                "to_state": new_state,
-                "remarks": remarks
-            }
-        )
+                ApprovalHistory.objects.update_or_create(
+                    appraisal=appraisal,
+                    role="PRINCIPAL",
+                    defaults={
+                        "approved_by": request.user,
+                        "action": "SENT_BACK",
+                        "from_state": from_state,
+                        "to_state": new_state,
+                        "remarks": remarks
+                    }
+                )
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
 
         return Response({
             "message": "Returned to faculty",
@@ -324,25 +483,15 @@ class PrincipalFinalizeAPI(APIView):
         }
 
         # 1️⃣ Finalize workflow state
-        new_state = perform_action(
-            current_state=appraisal.status,
-            next_state=States.FINALIZED
-        )
-
-        appraisal.status = new_state
-        appraisal.save()
-
-        # 2️⃣ Generate SPPU PDF (Full)
-        sppu_data = get_sppu_pdf_data(appraisal)
-        sppu_pdf = generate_pdf_from_html("pdf/sppu_pbas_form.html", sppu_data)
-        save_pdf(appraisal, sppu_pdf, "SPPU_PBAS")
+        try:
+            new_state = transition_appraisal(appraisal, States.FINALIZED)
+        except TransitionConflict as e:
+            return Response({"error": str(e)}, status=409)
 
-        # 3️⃣ Generate AICTE PBAS PDF (Truncated/Partial)
-        pbas_data = get_pbas_pdf_data(appraisal)
-        aicte_pdf = generate_pdf_from_html("pdf/aicte_pbas_form.html", pbas_data)
-        save_pdf(appraisal, aicte_pdf, "AICTE_PBAS")
+        # 2️⃣ PDFs are rendered by the outbox worker after commit
+        enqueue("appraisal.finalized", {"appraisal_id": appraisal.appraisal_id})
 
-        # 4️⃣ Audit log
+        # 3️⃣ Audit log
         log_action(
                 request=request,
                 action="SUBMIT_APPRAISAL",
@@ -356,8 +505,33 @@ class PrincipalFinalizeAPI(APIView):
                 }
             )
 
-        # 5️⃣ Return response LAST
+        # 4️⃣ Return response LAST
         return Response({
             "message": "Appraisal finalized successfully",
             "final_state": new_state
         })
+
+
+class PrincipalBulkTransitionAPI(APIView):
+    permission_classes = [IsAuthenticated, IsPrincipal]
+
+    def post(self, request):
+        appraisal_ids, action, remarks, error = parse_bulk_request(request.data, "PRINCIPAL")
+        if error:
+            return Response({"error": error}, status=400)
+
+        results = bulk_transition(
+            request=request,
+            role="PRINCIPAL",
+            action=action,
+            appraisal_ids=appraisal_ids,
+            remarks=remarks,
+        )
+        succeeded = sum(1 for item in results if item["ok"])
+
+        return Response({
+            "action": action,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results,
+        })
@@ -0,0 +1,23 @@
+from django.conf import settings
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.permissions import IsAdmin
+from core.services.profiler import PROFILE_HEADER, issue_token
+
+
+class ProfileTokenAPI(APIView):
+    """
+    POST → a token that, sent as the X-Profile-Token header, profiles the
+    requests carrying it. Profiles are listed in the Django admin
+    (Request profiles) with a download link for each.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        return Response({
+            "header": PROFILE_HEADER,
+            "token": issue_token(request.user),
+            "expires_in": getattr(settings, "PROFILE_TOKEN_SECONDS", 3600),
+        })
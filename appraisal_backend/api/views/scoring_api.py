@@ -6,8 +6,10 @@ from scoring.engine import calculate_full_score
 
 class ScoringAPI(APIView):
     def post(self, request):
-        score = calculate_full_score(request.data)
+        try:
+            score = calculate_full_score(request.data)
+        except KeyError as e:
+            return Response({"error": f"{e.args[0]} is required"}, status=400)
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=400)
         return Response(score)
-
-
-
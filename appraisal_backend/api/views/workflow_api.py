@@ -6,10 +6,15 @@ from workflow.engine import perform_action
 
 class WorkflowAPI(APIView):
     def post(self, request):
-        role = request.data["role"]
-        action = request.data["action"]
-        current_state = request.data["current_state"]
-
-        new_state = perform_action(role, action, current_state)
+        try:
+            new_state = perform_action(
+                role=request.data.get("role"),
+                current_state=request.data["current_state"],
+                next_state=request.data["next_state"],
+            )
+        except KeyError as e:
+            return Response({"error": f"{e.args[0]} is required"}, status=400)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
         return Response({"new_state": new_state})
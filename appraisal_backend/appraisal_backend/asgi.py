@@ -3,6 +3,12 @@ ASGI config for appraisal_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The API itself is served over WSGI (start.sh). The async SSE endpoint
+(/api/events/, api.views.events) needs an ASGI server, so start_events.sh
+runs ``events_application`` as a separate service: it passes only the
+stream to Django and answers 404 for every other path, keeping the sync
+API views off the ASGI thread pool.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +20,17 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'appraisal_backend.settings')
 
 application = get_asgi_application()
+
+EVENT_PATHS = ("/api/events/",)
+
+
+async def events_application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] not in EVENT_PATHS:
+        await send({
+            "type": "http.response.start",
+            "status": 404,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+        })
+        await send({"type": "http.response.body", "body": b"Not found\n"})
+        return
+    await application(scope, receive, send)
@@ -81,7 +81,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-  
+    'api.middleware.RequestProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'appraisal_backend.urls'
@@ -189,6 +189,18 @@ REST_FRAMEWORK = {
     ),
 }
 
+# orjson-backed JSON for every view; the large appraisal views use it regardless.
+if env_bool("API_FAST_JSON", False):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = (
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    )
+
 SIMPLE_JWT = {
     "USER_ID_FIELD": "id",
     "USER_ID_CLAIM": "user_id",
@@ -199,6 +211,33 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
 }
 
+# Trust role/password-change claims in access tokens instead of loading the
+# user on every request; see api.authentication and core.services.revocation.
+JWT_STATELESS = env_bool("JWT_STATELESS", False)
+JWT_GENERATION_CACHE_SECONDS = int(os.getenv("JWT_GENERATION_CACHE_SECONDS", "60"))
+
+# Audit rows are buffered per process and bulk-inserted; see core.services.audit_writer.
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "100"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "2"))
+AUDIT_FALLBACK_PATH = os.getenv("AUDIT_FALLBACK_PATH", str(BASE_DIR / "audit_fallback.jsonl"))
+# Months exported by `manage.py archive_audit_logs`; see core.services.audit_archive.
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", str(BASE_DIR / "audit_archive"))
+
+# /metrics (core.services.metrics) requires METRICS_TOKEN unless DEBUG is on.
+# Under gunicorn point METRICS_MULTIPROC_DIR at a directory shared by the
+# workers and empty it before each start (start.sh does).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR") or None
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+# Fraction of API requests whose SQL is counted and timed (api.middleware).
+SQL_STATS_SAMPLE_RATE = float(os.getenv("SQL_STATS_SAMPLE_RATE", "0.05"))
+# Request profiles (core.services.profiler): admins get X-Profile-Token
+# headers from api/profiling/token/; PROFILE_SAMPLE_RATE profiles at random.
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))
+PROFILE_TOKEN_SECONDS = int(os.getenv("PROFILE_TOKEN_SECONDS", "3600"))
+
 AUTH_USER_MODEL = "core.User"
 
 AUTHENTICATION_BACKENDS = [
@@ -215,6 +254,7 @@ CSRF_TRUSTED_ORIGINS = env_list("DJANGO_CSRF_TRUSTED_ORIGINS", CORS_ALLOWED_ORIG
 
 CORS_ALLOW_HEADERS = list(default_headers) + [
     'authorization',
+    'x-profile-token',
 ]
 
 CORS_ALLOW_METHODS = [
@@ -234,6 +274,13 @@ if DEBUG:
 else:
     PDF_RENDER_ENGINE = "playwright"
     PDF_ALLOW_FALLBACK = False
+# Live workflow events (core.services.events): "local" or "postgres" (LISTEN/NOTIFY).
+# Use "postgres" whenever the stream is served by another process than the API.
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local")
+# Where clients open the stream (api.views.events), e.g. the URL of the
+# separate ASGI events service started by start_events.sh.
+EVENTS_STREAM_URL = os.getenv("EVENTS_STREAM_URL", "/api/events/")
+
 EDGE_BROWSER_PATH = os.getenv("EDGE_BROWSER_PATH", "")
 PLAYWRIGHT_BROWSER_PATH = os.getenv("PLAYWRIGHT_BROWSER_PATH", "")
 
@@ -21,6 +21,8 @@ from django.conf.urls.static import static
 from django.views.static import serve
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from core.views.metrics_views import metrics_view
+
 
 
 urlpatterns = [
@@ -28,6 +30,7 @@ urlpatterns = [
     path("api/", include("api.urls")),
     path('api/token/', TokenObtainPairView.as_view()),
     path('api/token/refresh/', TokenRefreshView.as_view()),
+    path('metrics', metrics_view),
 ]
 
 if settings.DEBUG:
@@ -1,6 +1,15 @@
+import os
+
 from django.contrib import admin
-from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
 from django.contrib.auth.hashers import identify_hasher
+from django.db import connection
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 
 from .models import (
     Appraisal,
@@ -13,16 +22,64 @@ from .models import (
     GeneratedPDF,
     HODProfile,
     PrincipalProfile,
+    RequestProfile,
     User,
 )
+from .services.scope import invalidate_scope
+
+
+class ScopeInvalidatingAdmin(admin.ModelAdmin):
+    """
+    Invalidates the cached UserScope (core.services.scope) of every user an
+    admin change can affect, before and after the change. It runs from
+    save_related, after save_model and anything it writes on the side.
+    """
+
+    def scope_user_ids(self, obj):
+        return [getattr(obj, "user_id", None)]
+
+    def _stored_scope_user_ids(self, obj):
+        stored = type(obj).objects.filter(pk=obj.pk).first() if obj.pk else None
+        return self.scope_user_ids(stored) if stored is not None else []
+
+    def save_model(self, request, obj, form, change):
+        obj._scope_user_ids_before = self._stored_scope_user_ids(obj)
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        obj = form.instance
+        invalidate_scope(*getattr(obj, "_scope_user_ids_before", []), *self.scope_user_ids(obj))
+
+    def delete_model(self, request, obj):
+        user_ids = self.scope_user_ids(obj)
+        super().delete_model(request, obj)
+        invalidate_scope(*user_ids)
+
+    def delete_queryset(self, request, queryset):
+        user_ids = [user_id for obj in queryset for user_id in self.scope_user_ids(obj)]
+        super().delete_queryset(request, queryset)
+        invalidate_scope(*user_ids)
+
+
+class ProfileAdmin(ScopeInvalidatingAdmin):
+    pass
+
+
+class DepartmentAdmin(ScopeInvalidatingAdmin):
+    def scope_user_ids(self, obj):
+        return [obj.hod_id]
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(ScopeInvalidatingAdmin):
     list_display = ("username", "full_name", "role", "is_active", "is_staff", "must_change_password")
     list_filter = ("role", "is_active", "is_staff", "must_change_password")
     search_fields = ("username", "full_name", "email")
 
+    def scope_user_ids(self, obj):
+        return [obj.pk]
+
     def save_model(self, request, obj, form, change):
         password_value = form.cleaned_data.get("password")
         if password_value and (not change or "password" in form.changed_data):
@@ -64,6 +121,8 @@ class UserAdmin(admin.ModelAdmin):
             obj.must_change_password = True
 
         super().save_model(request, obj, form, change)
+        # Profiles and Department.hod are written below; save_related then
+        # invalidates the scope (ScopeInvalidatingAdmin).
 
         if obj.role in ["FACULTY", "HOD"]:
             faculty_profile, _ = FacultyProfile.objects.get_or_create(user=obj)
@@ -92,6 +151,36 @@ class UserAdmin(admin.ModelAdmin):
             principal_profile.save()
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts a whole large table: unfiltered, it uses the
+    planner's row estimate (PostgreSQL); filtered, it counts at most
+    COUNT_LIMIT rows, so later pages of a huge result are not reachable
+    from the page links (narrow the filter instead).
+    """
+
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                # The parent of a partitioned table has no estimate; sum its partitions.
+                cursor.execute(
+                    """
+                    SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint FROM pg_class c
+                    WHERE c.oid = %s::regclass
+                       OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+                    """,
+                    [queryset.model._meta.db_table] * 2,
+                )
+                estimate = cursor.fetchone()[0]
+            if estimate:
+                return estimate
+        return queryset.order_by()[: self.COUNT_LIMIT].count()
+
+
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
     list_display = (
@@ -115,7 +204,9 @@ class AuditLogAdmin(admin.ModelAdmin):
         "entity_id",
     )
     readonly_fields = [field.name for field in AuditLog._meta.fields]
-    ordering = ("-logged_at",)
+    ordering = ("-logged_at", "-log_id")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def has_add_permission(self, request):
         return False
@@ -132,11 +223,70 @@ class GeneratedPDFAdmin(admin.ModelAdmin):
     list_display = ("appraisal", "pdf_path", "generated_at")
 
 
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("profile_id", "created_at", "method", "route", "status_code", "duration_ms", "samples", "trigger", "download")
+    list_filter = ("trigger", "method", "created_at")
+    search_fields = ("path", "route")
+    readonly_fields = [field.name for field in RequestProfile._meta.fields]
+    ordering = ("-created_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:profile_id>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="core_requestprofile_download",
+            ),
+        ] + super().get_urls()
+
+    @admin.display(description="Collapsed stacks")
+    def download(self, obj):
+        url = reverse("admin:core_requestprofile_download", args=[obj.profile_id])
+        return format_html('<a href="{}">{}.folded</a>', url, obj.profile_id)
+
+    def download_view(self, request, profile_id):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, profile_id=profile_id)
+        if not os.path.exists(profile.file_path):
+            raise Http404("Profile file is missing")
+        return FileResponse(
+            open(profile.file_path, "rb"),
+            as_attachment=True,
+            filename=f"profile-{profile.profile_id}.folded",
+            content_type="text/plain; charset=utf-8",
+        )
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._remove_files([obj.file_path])
+
+    def delete_queryset(self, request, queryset):
+        paths = list(queryset.values_list("file_path", flat=True))
+        super().delete_queryset(request, queryset)
+        self._remove_files(paths)
+
+    @staticmethod
+    def _remove_files(paths):
+        for file_path in paths:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+
 admin.site.register(Appraisal)
-admin.site.register(Department)
-admin.site.register(FacultyProfile)
+admin.site.register(Department, DepartmentAdmin)
+admin.site.register(FacultyProfile, ProfileAdmin)
 admin.site.register(ApprovalHistory)
 admin.site.register(AppraisalScore)
 admin.site.register(Document)
-admin.site.register(HODProfile)
-admin.site.register(PrincipalProfile)
+admin.site.register(HODProfile, ProfileAdmin)
+admin.site.register(PrincipalProfile, ProfileAdmin)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.services.audit_archive import (
+    ARCHIVE_DIR,
+    add_months,
+    archive_month,
+    ensure_partitions,
+    live_months,
+    month_start,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly audit log partitions, then export months older "
+        "than --keep-months to compressed JSONL archives and drop them from the "
+        "live table. Run monthly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-months", type=int, default=12, help="Months kept in the live table, this one included")
+        parser.add_argument("--dir", default=ARCHIVE_DIR, help="Archive directory")
+        parser.add_argument("--dry-run", action="store_true", help="Only list the months that would be archived")
+
+    def handle(self, *args, **options):
+        keep_months = options["keep_months"]
+        if keep_months < 1:
+            raise CommandError("--keep-months must be at least 1")
+
+        created = ensure_partitions()
+        if created:
+            self.stdout.write(f"partitions through {created[-1]:%Y-%m}")
+
+        cutoff = add_months(month_start(timezone.now()), 1 - keep_months)
+        months = [month for month in live_months() if month < cutoff]
+        total = 0
+        for month in months:
+            if options["dry_run"]:
+                self.stdout.write(f"would archive {month:%Y-%m}")
+                continue
+            try:
+                count = archive_month(month, options["dir"])
+            except FileExistsError as exc:
+                raise CommandError(f"{month:%Y-%m} is already archived: {exc}")
+            total += count
+            self.stdout.write(f"archived {month:%Y-%m} rows={count}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. months={len(months)} rows={total}"))
@@ -0,0 +1,97 @@
+import copy
+import json
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer, orjson
+
+
+def _grow_lists(value, size):
+    """Copy of `value` with every non-empty list padded to `size` items."""
+    if isinstance(value, dict):
+        return {key: _grow_lists(item, size) for key, item in value.items()}
+    if isinstance(value, list):
+        items = [_grow_lists(item, size) for item in value]
+        while items and len(items) < size:
+            items.append(copy.deepcopy(items[len(items) % len(value)]))
+        return items
+    return value
+
+
+def _detail_response(appraisal_data):
+    """Shape of an AppraisalDetailAPI response around `appraisal_data`."""
+    now = timezone.now()
+    return {
+        "id": 1,
+        "faculty_name": "Benchmark Faculty",
+        "department": "Computer Engineering",
+        "academic_year": "2024-25",
+        "status": "SUBMITTED",
+        "appraisal_data": appraisal_data,
+        "calculated_scores": {
+            "teaching": {"score": Decimal("42.50"), "percentage": Decimal("88.333")},
+            "research": {"score": Decimal("17.25"), "total": Decimal("31.00")},
+            "activities": {"score": Decimal("9.00")},
+            "total_score": Decimal("68.75"),
+        },
+        "created_at": now - timedelta(days=30),
+        "updated_at": now,
+        "submitted_on": now.date(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer with api.renderers.FastJSONRenderer on a "
+        "typical appraisal detail response and a maximal one (every list grown "
+        "to --max-items entries)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--payload",
+            default=str(Path(settings.BASE_DIR) / "Sample_Payload.json"),
+            help="Appraisal submission JSON whose appraisal_data is used as the typical payload",
+        )
+        parser.add_argument("--max-items", type=int, default=200, help="List length for the maximal payload")
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["payload"], encoding="utf-8") as fh:
+                sample = json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read payload: {exc}")
+
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed; FastJSONRenderer falls back to the stdlib."))
+
+        appraisal_data = sample.get("appraisal_data", sample)
+        payloads = {
+            "typical": _detail_response(appraisal_data),
+            "maximal": _detail_response(_grow_lists(appraisal_data, options["max_items"])),
+        }
+        renderers = {"drf": JSONRenderer(), "fast": FastJSONRenderer()}
+        iterations = max(1, options["iterations"])
+
+        for name, payload in payloads.items():
+            timings = {}
+            for label, renderer in renderers.items():
+                body = renderer.render(payload)
+                started = perf_counter()
+                for _ in range(iterations):
+                    renderer.render(payload)
+                timings[label] = (perf_counter() - started) * 1000 / iterations
+
+            speedup = timings["drf"] / timings["fast"] if timings["fast"] else float("inf")
+            self.stdout.write(
+                f"{name}: {len(body)} bytes  drf={timings['drf']:.3f}ms  "
+                f"fast={timings['fast']:.3f}ms  speedup={speedup:.1f}x"
+            )
@@ -0,0 +1,60 @@
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.filters import filter_appraisals
+from core.models import Appraisal
+from core.services.appraisal_export import (
+    COLUMNS,
+    ExportUnavailable,
+    export_queryset,
+    iter_csv,
+    resolve_columns,
+    write_xlsx,
+)
+
+
+class Command(BaseCommand):
+    help = "Export appraisals with score breakdowns to CSV or XLSX with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", help="Output file; defaults to stdout for CSV")
+        parser.add_argument("--file-type", choices=["csv", "xlsx"], default="csv")
+        parser.add_argument("--columns", help=f"Comma-separated subset of: {', '.join(COLUMNS)}")
+        parser.add_argument("--status", help="Comma-separated workflow states")
+        parser.add_argument("--academic-year")
+        parser.add_argument("--form-type")
+        parser.add_argument("--department", help="Department id or name")
+
+    def handle(self, *args, **options):
+        filters = {
+            "status": options["status"],
+            "academic_year": options["academic_year"],
+            "form_type": options["form_type"],
+            "department": options["department"],
+        }
+        try:
+            columns = resolve_columns(options["columns"])
+            appraisals = export_queryset(filter_appraisals(Appraisal.objects.all(), filters))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = options["output"]
+        if options["file_type"] == "xlsx":
+            if not output:
+                raise CommandError("--output is required for XLSX")
+            try:
+                with open(output, "wb") as fh:
+                    write_xlsx(appraisals, columns, fh)
+            except ExportUnavailable as e:
+                raise CommandError(str(e))
+        else:
+            fh = open(output, "w", encoding="utf-8", newline="") if output else self.stdout
+            try:
+                for line in iter_csv(appraisals, columns):
+                    fh.write(line)
+            finally:
+                if output:
+                    fh.close()
+
+        if output:
+            self.stderr.write(f"Wrote {output}")
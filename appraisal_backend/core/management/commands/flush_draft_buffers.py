@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.draft_buffer import IDLE_SECONDS, flush_idle
+
+
+class Command(BaseCommand):
+    help = (
+        "Persist autosave buffers that have been idle for --idle-seconds into "
+        "their appraisals. Run from cron with --once or as a long-lived worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--idle-seconds", type=int, default=IDLE_SECONDS)
+        parser.add_argument("--limit", type=int, default=500, help="Buffers flushed per pass")
+        parser.add_argument("--interval", type=float, default=30.0, help="Seconds between passes")
+        parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+
+    def handle(self, *args, **options):
+        idle_seconds = max(0, options["idle_seconds"])
+        limit = max(1, options["limit"])
+        total = 0
+
+        try:
+            while True:
+                flushed = flush_idle(idle_seconds=idle_seconds, limit=limit)
+                total += flushed
+                if flushed:
+                    self.stdout.write(f"flushed={flushed}")
+                if options["once"]:
+                    break
+                if flushed < limit:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Done. flushed={total}"))
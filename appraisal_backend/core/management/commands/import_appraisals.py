@@ -0,0 +1,160 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from time import perf_counter
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.appraisal_import import ImportBatchWriter, prepare_record
+
+
+def _read_checkpoint(path, source):
+    if not path or not os.path.exists(path):
+        return 0, 0, 0
+    with open(path, "r", encoding="utf-8") as fh:
+        state = json.load(fh)
+    if state.get("source") != source:
+        raise CommandError(
+            f"Checkpoint {path} belongs to '{state.get('source')}', not '{source}'"
+        )
+    return int(state.get("line", 0)), int(state.get("imported", 0)), int(state.get("failed", 0))
+
+
+def _write_checkpoint(path, source, line_no, imported, failed):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(
+            {"source": source, "line": line_no, "imported": imported, "failed": failed},
+            fh,
+        )
+    os.replace(tmp_path, path)
+
+
+def _iter_records(fh, start_after):
+    """
+    Yield (line_no, record_or_None, decode_error) for every non-blank line
+    after `start_after`. Lines are read lazily so memory stays flat.
+    """
+    for line_no, line in enumerate(fh, start=1):
+        if line_no <= start_after:
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except json.JSONDecodeError as exc:
+            yield line_no, None, f"Invalid JSON: {exc.msg}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream appraisal payloads from a JSONL file, validate and score them "
+        "in a process pool and bulk insert them in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSONL file, one appraisal record per line")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes for validation/scoring (1 = run in-process)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Checkpoint file; defaults to <path>.checkpoint. Re-running resumes after the last committed batch.",
+        )
+        parser.add_argument(
+            "--errors",
+            help="Per-record error report (JSONL); defaults to <path>.errors.jsonl",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore any existing checkpoint and start from the first line",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate and score only; nothing is written and no checkpoint is kept",
+        )
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options["path"])
+        if not os.path.exists(source):
+            raise CommandError(f"File not found: {source}")
+
+        batch_size = max(1, options["batch_size"])
+        workers = max(1, options["workers"])
+        dry_run = options["dry_run"]
+        checkpoint_path = None if dry_run else (options["checkpoint"] or f"{source}.checkpoint")
+        errors_path = options["errors"] or f"{source}.errors.jsonl"
+
+        start_after, imported, failed = (
+            (0, 0, 0) if options["restart"] else _read_checkpoint(checkpoint_path, source)
+        )
+        if start_after:
+            self.stdout.write(f"Resuming after line {start_after}")
+
+        writer = ImportBatchWriter(dry_run=dry_run)
+        executor = (
+            ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+            if workers > 1
+            else None
+        )
+        mapper = executor.map if executor else map
+
+        started = perf_counter()
+        error_mode = "a" if start_after else "w"
+        try:
+            with open(source, "r", encoding="utf-8") as fh, open(errors_path, error_mode, encoding="utf-8") as err_fh:
+                records = _iter_records(fh, start_after)
+                while True:
+                    batch = list(islice(records, batch_size))
+                    if not batch:
+                        break
+
+                    decode_errors = [
+                        {"line": line_no, "ok": False, "error": error}
+                        for line_no, _, error in batch
+                        if error
+                    ]
+                    parsed = [(line_no, record) for line_no, record, error in batch if not error]
+                    kwargs = {"chunksize": max(1, len(parsed) // (workers * 4))} if executor else {}
+                    prepared = list(
+                        mapper(
+                            prepare_record,
+                            [line_no for line_no, _ in parsed],
+                            [record for _, record in parsed],
+                            **kwargs,
+                        )
+                    )
+
+                    written, errors = writer.write(prepared)
+                    errors.extend({"line": e["line"], "error": e["error"]} for e in decode_errors)
+                    for error in sorted(errors, key=lambda e: e["line"]):
+                        err_fh.write(json.dumps(error) + "\n")
+                    err_fh.flush()
+
+                    imported += written
+                    failed += len(errors)
+                    last_line = batch[-1][0]
+                    _write_checkpoint(checkpoint_path, source, last_line, imported, failed)
+                    self.stdout.write(
+                        f"line {last_line}: imported={imported} failed={failed} "
+                        f"elapsed={perf_counter() - started:.1f}s"
+                    )
+        finally:
+            if executor:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. imported={imported} failed={failed} errors={errors_path}"
+            + (" (dry run)" if dry_run else "")
+        ))
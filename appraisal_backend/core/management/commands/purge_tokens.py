@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding refresh tokens and their blacklist entries "
+        "in batches. An expired token is rejected on its exp claim alone, so "
+        "its rows are dead weight. Run periodically from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"outstanding={expired.count()} "
+                f"blacklisted={BlacklistedToken.objects.filter(token__in=expired).count()}"
+            )
+            return
+
+        outstanding = blacklisted = 0
+        while True:
+            ids = list(expired.order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+                outstanding += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+            self.stdout.write(f"batch outstanding={len(ids)}")
+            if len(ids) < batch_size:
+                break
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Done. outstanding={outstanding} blacklisted={blacklisted}"))
@@ -0,0 +1,19 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from workflow.inbox import rebuild_inbox
+
+
+class Command(BaseCommand):
+    help = "Recompute the ReviewInbox read model from the appraisals table (drift repair)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        processed = rebuild_inbox(batch_size=max(1, options["batch_size"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. appraisals={processed} elapsed={perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,45 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import AuditLog
+from core.services.audit_writer import FALLBACK_PATH, from_record
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert audit entries that were written to the fallback file while the "
+        "database was unavailable, then remove the file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=FALLBACK_PATH)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        # Take the file away from the writers first; a previous run that
+        # failed part-way left its claimed file behind.
+        claimed = f"{path}.replaying"
+        if not os.path.exists(claimed):
+            if not os.path.exists(path):
+                self.stdout.write("Nothing to replay.")
+                return
+            os.replace(path, claimed)
+
+        entries = []
+        with open(claimed, encoding="utf-8") as fh:
+            for number, line in enumerate(fh, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(from_record(json.loads(line)))
+                except (ValueError, TypeError) as exc:
+                    raise CommandError(f"{claimed}:{number}: {exc}")
+
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(entries, batch_size=max(1, options["batch_size"]))
+        os.remove(claimed)
+        self.stdout.write(self.style.SUCCESS(f"Done. replayed={len(entries)}"))
@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from workflow.aging import rollup_day
+
+
+class Command(BaseCommand):
+    help = (
+        "Store p50/p95 time-in-state per department for states exited on a day "
+        "(default: yesterday). Run nightly; re-running a day replaces its rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Day to roll up (YYYY-MM-DD); defaults to yesterday")
+        parser.add_argument("--days", type=int, default=1, help="Number of days ending at --date to (re)compute")
+
+    def handle(self, *args, **options):
+        if options["date"]:
+            try:
+                last_day = date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD")
+        else:
+            last_day = timezone.localdate() - timedelta(days=1)
+
+        for offset in range(max(1, options["days"]) - 1, -1, -1):
+            day = last_day - timedelta(days=offset)
+            rows = rollup_day(day)
+            self.stdout.write(f"{day}: {len(rows)} row(s)")
+
+        self.stdout.write(self.style.SUCCESS("Done."))
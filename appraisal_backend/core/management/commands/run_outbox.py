@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.outbox import MAX_ATTEMPTS, dispatch_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Dispatch pending outbox events (PDF generation, notifications) to their "
+        "registered handlers. Safe to run several workers in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to sleep when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the currently due events and exit instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        max_attempts = max(1, options["max_attempts"])
+        total_ok = total_failed = 0
+
+        try:
+            while True:
+                succeeded, failed = dispatch_batch(batch_size=batch_size, max_attempts=max_attempts)
+                total_ok += succeeded
+                total_failed += failed
+                if succeeded or failed:
+                    self.stdout.write(f"dispatched={succeeded} failed={failed}")
+
+                if succeeded + failed < batch_size:
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Done. dispatched={total_ok} failed={total_failed}"))
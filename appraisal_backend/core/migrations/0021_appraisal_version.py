@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_appraisal_appraisals_faculty_89fe62_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appraisal',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:07
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill_department(apps, schema_editor):
+    """Copy faculty.department_id onto existing appraisals, one pk range per transaction."""
+    Appraisal = apps.get_model('core', 'Appraisal')
+    FacultyProfile = apps.get_model('core', 'FacultyProfile')
+
+    faculty_department = FacultyProfile.objects.filter(
+        pk=OuterRef('faculty_id')
+    ).values('department_id')[:1]
+
+    last_id = 0
+    while True:
+        ids = list(
+            Appraisal.objects.filter(appraisal_id__gt=last_id)
+            .order_by('appraisal_id')
+            .values_list('appraisal_id', flat=True)[:BACKFILL_BATCH_SIZE]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            Appraisal.objects.filter(
+                appraisal_id__gte=ids[0],
+                appraisal_id__lte=ids[-1],
+                department__isnull=True,
+            ).update(department_id=Subquery(faculty_department))
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    # Each backfill batch commits on its own so large tables are not
+    # locked for the whole run.
+    atomic = False
+
+    dependencies = [
+        ('core', '0022_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appraisal',
+            name='department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='appraisals', to='core.department'),
+        ),
+        migrations.RunPython(backfill_department, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='appraisal',
+            index=models.Index(fields=['department', 'is_hod_appraisal', 'status', 'updated_at'], name='appraisals_dept_queue_idx'),
+        ),
+    ]
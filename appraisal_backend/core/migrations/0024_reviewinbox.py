@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_appraisal_department'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewInbox',
+            fields=[
+                ('inbox_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('role', models.CharField(choices=[('HOD', 'HOD'), ('PRINCIPAL', 'PRINCIPAL')], max_length=10)),
+                ('faculty_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('designation', models.CharField(blank=True, max_length=50, null=True)),
+                ('department_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('form_type', models.CharField(max_length=20)),
+                ('academic_year', models.CharField(max_length=20)),
+                ('semester', models.CharField(max_length=10)),
+                ('is_hod_appraisal', models.BooleanField(default=False)),
+                ('status', models.CharField(max_length=30)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('total_score', models.DecimalField(decimal_places=2, max_digits=6, null=True)),
+                ('verified_grade', models.CharField(blank=True, max_length=50, null=True)),
+                ('status_since', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('appraisal', models.ForeignKey(db_column='appraisal_id', on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='core.appraisal')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.department')),
+            ],
+            options={
+                'db_table': 'review_inbox',
+                'indexes': [models.Index(fields=['role', 'department', 'updated_at'], name='review_inbox_dept_idx'), models.Index(fields=['role', 'status', 'updated_at'], name='review_inbox_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('role', 'appraisal'), name='review_inbox_role_appraisal_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_counters(apps, schema_editor):
+    Appraisal = apps.get_model('core', 'Appraisal')
+    WorkflowCounter = apps.get_model('core', 'WorkflowCounter')
+
+    rows = (
+        Appraisal.objects.values('department_id', 'academic_year', 'status')
+        .annotate(n=Count('appraisal_id'))
+        .order_by()
+    )
+    WorkflowCounter.objects.bulk_create(
+        [
+            WorkflowCounter(
+                department_key=row['department_id'] or 0,
+                academic_year=row['academic_year'],
+                status=row['status'],
+                count=row['n'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_reviewinbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowCounter',
+            fields=[
+                ('counter_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('department_key', models.IntegerField(default=0)),
+                ('academic_year', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=30)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'workflow_counters',
+                'constraints': [models.UniqueConstraint(fields=('department_key', 'academic_year', 'status'), name='workflow_counter_key_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
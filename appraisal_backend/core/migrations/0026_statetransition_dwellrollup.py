@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+SEED_BATCH_SIZE = 2000
+
+
+def seed_current_states(apps, schema_editor):
+    """
+    History before this log existed is unknown; start every appraisal's log
+    with its current state, entered at its last update.
+    """
+    Appraisal = apps.get_model('core', 'Appraisal')
+    StateTransition = apps.get_model('core', 'StateTransition')
+
+    batch = []
+    rows = Appraisal.objects.order_by('appraisal_id').values_list(
+        'appraisal_id', 'department_id', 'status', 'updated_at'
+    )
+    for appraisal_id, department_id, status, updated_at in rows.iterator(chunk_size=SEED_BATCH_SIZE):
+        batch.append(StateTransition(
+            appraisal_id=appraisal_id,
+            department_id=department_id,
+            to_state=status,
+            entered_at=updated_at,
+        ))
+        if len(batch) >= SEED_BATCH_SIZE:
+            StateTransition.objects.bulk_create(batch)
+            batch = []
+    StateTransition.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_workflowcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DwellRollup',
+            fields=[
+                ('rollup_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('state', models.CharField(max_length=30)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('p50_seconds', models.PositiveIntegerField(default=0)),
+                ('p95_seconds', models.PositiveIntegerField(default=0)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.department')),
+            ],
+            options={
+                'db_table': 'dwell_rollups',
+                'indexes': [models.Index(fields=['day', 'state'], name='dwell_rollu_day_9217de_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StateTransition',
+            fields=[
+                ('transition_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('from_state', models.CharField(blank=True, max_length=30, null=True)),
+                ('to_state', models.CharField(max_length=30)),
+                ('entered_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('appraisal', models.ForeignKey(db_column='appraisal_id', on_delete=django.db.models.deletion.CASCADE, related_name='state_transitions', to='core.appraisal')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.department')),
+            ],
+            options={
+                'db_table': 'state_transitions',
+                'indexes': [models.Index(fields=['to_state', 'entered_at'], name='state_transition_aging_idx'), models.Index(fields=['appraisal', 'transition_id'], name='state_transition_seq_idx')],
+            },
+        ),
+        migrations.RunPython(seed_current_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_statetransition_dwellrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DraftBuffer',
+            fields=[
+                ('appraisal', models.OneToOneField(db_column='appraisal_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='draft_buffer', serialize=False, to='core.appraisal')),
+                ('sections', models.JSONField(default=dict)),
+                ('saves', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'draft_buffers',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_draftbuffer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppraisalChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('is_hod_appraisal', models.BooleanField(default=False)),
+                ('status', models.CharField(max_length=30)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('appraisal', models.ForeignKey(db_column='appraisal_id', on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='core.appraisal')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.department')),
+                ('faculty', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.facultyprofile')),
+            ],
+            options={
+                'db_table': 'appraisal_changes',
+                'indexes': [models.Index(fields=['faculty', 'seq'], name='appraisal_change_faculty_idx'), models.Index(fields=['department', 'seq'], name='appraisal_change_dept_idx'), models.Index(fields=['appraisal', 'seq'], name='appraisal_change_seq_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION audit_logs_immutable() RETURNS trigger AS $$
+    BEGIN
+        RAISE EXCEPTION 'Audit logs are immutable';
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER audit_logs_immutable
+    BEFORE UPDATE OR DELETE ON audit_logs
+    FOR EACH ROW EXECUTE FUNCTION audit_logs_immutable()
+    """,
+]
+
+POSTGRES_DROP = [
+    "DROP TRIGGER IF EXISTS audit_logs_immutable ON audit_logs",
+    "DROP FUNCTION IF EXISTS audit_logs_immutable()",
+]
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER audit_logs_no_update BEFORE UPDATE ON audit_logs
+    BEGIN SELECT RAISE(ABORT, 'Audit logs are immutable'); END
+    """,
+    """
+    CREATE TRIGGER audit_logs_no_delete BEFORE DELETE ON audit_logs
+    BEGIN SELECT RAISE(ABORT, 'Audit logs are immutable'); END
+    """,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS audit_logs_no_update",
+    "DROP TRIGGER IF EXISTS audit_logs_no_delete",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_TRIGGERS)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_TRIGGERS)
+
+
+def drop_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_DROP)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_user_token_generation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='logged_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:44
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+
+def _month(value):
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_audit_logs(apps, schema_editor):
+    """
+    Rebuild audit_logs as a table range-partitioned by month on logged_at
+    (PostgreSQL 13+). The primary key must include the partition key, so it
+    becomes (log_id, logged_at); log_id keeps its own sequence.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    AuditLog = apps.get_model("core", "AuditLog")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'audit_logs'")
+        if cursor.fetchone()[0] == "p":
+            return
+        cursor.execute("SELECT min(logged_at), max(logged_at), max(log_id) FROM audit_logs")
+        first, last, last_id = cursor.fetchone()
+
+    now = datetime.now(timezone.utc)
+    month = _month(first or now)
+    until = _next_month(_next_month(_next_month(_month(max(last or now, now)))))
+
+    schema_editor.execute("ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned")
+    schema_editor.execute(
+        "CREATE TABLE audit_logs (LIKE audit_logs_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (logged_at)"
+    )
+    schema_editor.execute("CREATE SEQUENCE audit_logs_log_id_partitioned_seq OWNED BY audit_logs.log_id")
+    schema_editor.execute(
+        "ALTER TABLE audit_logs ALTER COLUMN log_id SET DEFAULT nextval('audit_logs_log_id_partitioned_seq')"
+    )
+    while month < until:
+        schema_editor.execute(
+            f"CREATE TABLE audit_logs_p{month:%Y%m} PARTITION OF audit_logs FOR VALUES FROM (%s) TO (%s)",
+            [month, _next_month(month)],
+        )
+        month = _next_month(month)
+    schema_editor.execute("CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT")
+
+    schema_editor.execute("INSERT INTO audit_logs SELECT * FROM audit_logs_unpartitioned")
+    if last_id:
+        schema_editor.execute("SELECT setval('audit_logs_log_id_partitioned_seq', %s)", [last_id])
+    schema_editor.execute("DROP TABLE audit_logs_unpartitioned")
+
+    schema_editor.execute("ALTER TABLE audit_logs ADD PRIMARY KEY (log_id, logged_at)")
+    for index in AuditLog._meta.indexes:
+        schema_editor.add_index(AuditLog, index)
+    schema_editor.execute(
+        "CREATE TRIGGER audit_logs_immutable BEFORE UPDATE OR DELETE ON audit_logs "
+        "FOR EACH ROW EXECUTE FUNCTION audit_logs_immutable()"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_auditlog_immutable'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_audit_logs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['logged_at', 'log_id'], name='audit_logs_logged_idx'),
+        ),
+    ]
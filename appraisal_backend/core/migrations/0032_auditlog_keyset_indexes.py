@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_auditlog_partitions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_logs_entity_22e216_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_logs_user_id_a34a04_idx',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['entity', 'entity_id', 'logged_at', 'log_id'], name='audit_logs_entity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user_id_snapshot', 'logged_at', 'log_id'], name='audit_logs_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['action', 'logged_at', 'log_id'], name='audit_logs_action_idx'),
+        ),
+    ]
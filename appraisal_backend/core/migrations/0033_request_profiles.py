@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_auditlog_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('profile_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.TextField()),
+                ('route', models.CharField(max_length=255)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('user_id_snapshot', models.IntegerField(blank=True, null=True)),
+                ('requested_by', models.IntegerField(blank=True, null=True)),
+                ('trigger', models.CharField(choices=[('SIGNED', 'Signed header'), ('SAMPLED', 'Random sample')], max_length=10)),
+                ('duration_ms', models.FloatField()),
+                ('samples', models.PositiveIntegerField()),
+                ('file_path', models.TextField()),
+            ],
+            options={
+                'db_table': 'request_profiles',
+                'indexes': [models.Index(fields=['route', 'created_at'], name='request_pro_route_a74fb9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def position_existing_changes(apps, schema_editor):
+    # Existing rows are all committed; reusing seq keeps clients' cursors valid.
+    AppraisalChange = apps.get_model("core", "AppraisalChange")
+    AppraisalChange.objects.update(position=F("seq"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_request_profiles'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appraisalchange',
+            name='appraisal_change_faculty_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appraisalchange',
+            name='appraisal_change_dept_idx',
+        ),
+        migrations.AddField(
+            model_name='appraisalchange',
+            name='from_status',
+            field=models.CharField(blank=True, max_length=30, null=True),
+        ),
+        migrations.AddField(
+            model_name='appraisalchange',
+            name='position',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(position_existing_changes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='appraisalchange',
+            index=models.Index(fields=['faculty', 'position'], name='appraisal_change_faculty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appraisalchange',
+            index=models.Index(fields=['department', 'position'], name='appraisal_change_dept_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:29
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def close_earlier_transitions(apps, schema_editor):
+    # Every row but an appraisal's latest was exited when the next one was entered.
+    StateTransition = apps.get_model("core", "StateTransition")
+    following = StateTransition.objects.filter(
+        appraisal_id=OuterRef("appraisal_id"),
+        transition_id__gt=OuterRef("transition_id"),
+    ).order_by("transition_id").values("entered_at")[:1]
+    StateTransition.objects.update(exited_at=Subquery(following))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_appraisal_change_positions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='statetransition',
+            name='state_transition_aging_idx',
+        ),
+        migrations.AddField(
+            model_name='statetransition',
+            name='exited_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(close_earlier_transitions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='statetransition',
+            index=models.Index(condition=models.Q(('exited_at__isnull', True)), fields=['to_state', 'entered_at', 'transition_id'], name='state_transition_current_idx'),
+        ),
+    ]
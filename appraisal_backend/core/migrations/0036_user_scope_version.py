@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_statetransition_exited_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='scope_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
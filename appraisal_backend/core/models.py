@@ -67,6 +67,11 @@ class User(AbstractBaseUser, PermissionsMixin):
     promotion_designation = models.CharField(max_length=50, null=True, blank=True)
     eligibility_date = models.DateField(null=True, blank=True)
     assessment_period = models.DateField(max_length=50, null=True, blank=True)
+    # Bumped to revoke every access token issued so far (stateless JWT mode).
+    token_generation = models.PositiveIntegerField(default=0)
+    # Part of the cached UserScope's key; replaced whenever the scope changes
+    # (core.services.scope.invalidate_scope).
+    scope_version = models.PositiveIntegerField(default=0)
 
     objects = UserManager()
 
@@ -77,6 +82,23 @@ class User(AbstractBaseUser, PermissionsMixin):
         return f"{self.username} ({self.role})"
 
 
+class TokenUser(User):
+    """
+    User built from access-token claims without a query (stateless JWT
+    mode). Fields not carried by the token are deferred; touching any of
+    them loads all of them in one query.
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+
 class Department(models.Model):
     department_id = models.AutoField(primary_key=True)
     department_name = models.CharField(max_length=100, unique=True)
@@ -221,6 +243,17 @@ class Appraisal(models.Model):
         related_name='principal_appraisals'
     )
 
+    # Denormalized from faculty.department so HOD queues filter and sort on
+    # one index instead of joining faculty_profiles. Set on create and kept
+    # in sync on faculty transfers (core.signals).
+    department = models.ForeignKey(
+        Department,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name='appraisals'
+    )
+
     form_type = models.CharField(max_length=20, choices=FORM_TYPE_CHOICES)
     academic_year = models.CharField(max_length=20)
     semester = models.CharField(max_length=10)
@@ -235,6 +268,9 @@ class Appraisal(models.Model):
     # 👇 NEW (for return / correction comments)
     remarks = models.TextField(null=True, blank=True)
 
+    # Optimistic concurrency token, bumped on every write (see workflow.services).
+    version = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -251,12 +287,299 @@ class Appraisal(models.Model):
             models.Index(fields=['faculty', 'status', 'updated_at']),
             models.Index(fields=['faculty', 'is_hod_appraisal', 'updated_at']),
             models.Index(fields=['status', 'updated_at']),
+            models.Index(
+                fields=['department', 'is_hod_appraisal', 'status', 'updated_at'],
+                name='appraisals_dept_queue_idx',
+            ),
         ]
 
+    # Columns the workflow read models are derived from (workflow.signals
+    # skips them for saves that change none of these, e.g. draft edits).
+    READ_MODEL_FIELDS = (
+        "department_id",
+        "academic_year",
+        "status",
+        "remarks",
+        "semester",
+        "form_type",
+        "is_hod_appraisal",
+        "faculty_id",
+    )
+
     def __str__(self):
         return f"{self.academic_year} | {self.semester} | {self.form_type} | {self.faculty}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_read_model_state()
+        return instance
+
+    def read_model_state(self):
+        """Current READ_MODEL_FIELDS values, or None if any of them is deferred."""
+        if self.get_deferred_fields().intersection(self.READ_MODEL_FIELDS):
+            return None
+        return tuple(getattr(self, name) for name in self.READ_MODEL_FIELDS)
+
+    def remember_read_model_state(self):
+        """Record the values as stored, after a load or a write."""
+        self._stored_read_model_state = self.read_model_state()
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # A partial refresh leaves other fields as edited in memory.
+        if fields is None:
+            self.remember_read_model_state()
+        else:
+            self._stored_read_model_state = None
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.department_id is None and self.faculty_id:
+            self.department_id = self.faculty.department_id
+        # Plain saves must also invalidate concurrent readers' versions.
+        if not self._state.adding:
+            self.version += 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "version" not in update_fields:
+                kwargs["update_fields"] = [*update_fields, "version"]
+        super().save(*args, **kwargs)
+
+
+
+
+class ReviewInbox(models.Model):
+    """
+    Read model behind the HOD and principal queues: one row per
+    (reviewer role, appraisal) with the list columns precomputed.
+    Maintained by workflow.inbox; rebuild with `manage.py rebuild_inbox`.
+    """
+    ROLE_CHOICES = (
+        ('HOD', 'HOD'),
+        ('PRINCIPAL', 'PRINCIPAL'),
+    )
+
+    inbox_id = models.BigAutoField(primary_key=True)
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    department = models.ForeignKey(
+        Department,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    appraisal = models.ForeignKey(
+        Appraisal,
+        on_delete=models.CASCADE,
+        db_column='appraisal_id',
+        related_name='inbox_entries'
+    )
+
+    faculty_name = models.CharField(max_length=100, null=True, blank=True)
+    designation = models.CharField(max_length=50, null=True, blank=True)
+    department_name = models.CharField(max_length=100, null=True, blank=True)
+
+    form_type = models.CharField(max_length=20)
+    academic_year = models.CharField(max_length=20)
+    semester = models.CharField(max_length=10)
+    is_hod_appraisal = models.BooleanField(default=False)
+    status = models.CharField(max_length=30)
+    remarks = models.TextField(null=True, blank=True)
+    total_score = models.DecimalField(max_digits=6, decimal_places=2, null=True)
+    verified_grade = models.CharField(max_length=50, null=True, blank=True)
+
+    # When the appraisal entered its current status; age = now - status_since.
+    status_since = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'review_inbox'
+        constraints = [
+            models.UniqueConstraint(fields=['role', 'appraisal'], name='review_inbox_role_appraisal_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['role', 'department', 'updated_at'], name='review_inbox_dept_idx'),
+            models.Index(fields=['role', 'status', 'updated_at'], name='review_inbox_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.role} inbox | {self.appraisal_id} | {self.status}"
+
+
+class WorkflowCounter(models.Model):
+    """
+    Number of appraisals per (department, academic year, status), kept in
+    step with every workflow write by workflow.counters using F() increments.
+    Verify / repair with `manage.py reconcile_counters`.
+    """
+    counter_id = models.BigAutoField(primary_key=True)
+    # Plain integer rather than a nullable FK so the unique constraint also
+    # covers appraisals without a department (stored as 0).
+    department_key = models.IntegerField(default=0)
+    academic_year = models.CharField(max_length=20)
+    status = models.CharField(max_length=30)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'workflow_counters'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['department_key', 'academic_year', 'status'],
+                name='workflow_counter_key_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.department_key} | {self.academic_year} | {self.status}: {self.count}"
+
+
+class StateTransition(models.Model):
+    """
+    Append-only log of every workflow state an appraisal enters.
+    The dwell time in a state is the gap to the appraisal's next row.
+    exited_at is the one column written later, when the appraisal moves on;
+    rows with exited_at NULL are the current states.
+    """
+    transition_id = models.BigAutoField(primary_key=True)
+    appraisal = models.ForeignKey(
+        Appraisal,
+        on_delete=models.CASCADE,
+        db_column='appraisal_id',
+        related_name='state_transitions'
+    )
+    department = models.ForeignKey(
+        Department,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    from_state = models.CharField(max_length=30, null=True, blank=True)
+    to_state = models.CharField(max_length=30)
+    entered_at = models.DateTimeField(default=timezone.now)
+    exited_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'state_transitions'
+        indexes = [
+            models.Index(
+                fields=['to_state', 'entered_at', 'transition_id'],
+                condition=models.Q(exited_at__isnull=True),
+                name='state_transition_current_idx',
+            ),
+            models.Index(fields=['appraisal', 'transition_id'], name='state_transition_seq_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise RuntimeError("State transitions are append-only")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.appraisal_id}: {self.from_state} -> {self.to_state}"
+
+
+class DwellRollup(models.Model):
+    """Nightly p50/p95 time spent in each state, per department (manage.py rollup_dwell)."""
+    rollup_id = models.BigAutoField(primary_key=True)
+    day = models.DateField()
+    department = models.ForeignKey(
+        Department,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    state = models.CharField(max_length=30)
+    samples = models.PositiveIntegerField(default=0)
+    p50_seconds = models.PositiveIntegerField(default=0)
+    p95_seconds = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'dwell_rollups'
+        indexes = [
+            models.Index(fields=['day', 'state']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} | {self.department_id} | {self.state}"
+
+
+class AppraisalChange(models.Model):
+    """
+    Append-only feed of status / remarks changes. `position` is handed out
+    after the writing transaction commits and only grows in commit order,
+    so a client that remembers the last position it saw can ask for what
+    changed since with a single index range scan (workflow.changes).
+    """
+    seq = models.BigAutoField(primary_key=True)
+    appraisal = models.ForeignKey(
+        Appraisal,
+        on_delete=models.CASCADE,
+        db_column='appraisal_id',
+        related_name='changes'
+    )
+    faculty = models.ForeignKey(
+        FacultyProfile,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    department = models.ForeignKey(
+        Department,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    is_hod_appraisal = models.BooleanField(default=False)
+    from_status = models.CharField(max_length=30, null=True, blank=True)
+    status = models.CharField(max_length=30)
+    remarks = models.TextField(null=True, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+    # Null until workflow.changes.assign_positions runs after commit.
+    position = models.BigIntegerField(null=True, blank=True, unique=True)
+
+    class Meta:
+        db_table = 'appraisal_changes'
+        indexes = [
+            models.Index(fields=['faculty', 'position'], name='appraisal_change_faculty_idx'),
+            models.Index(fields=['department', 'position'], name='appraisal_change_dept_idx'),
+            models.Index(fields=['appraisal', 'seq'], name='appraisal_change_seq_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise RuntimeError("Appraisal changes are append-only")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"#{self.seq} {self.appraisal_id}: {self.status}"
+
+
+class DraftBuffer(models.Model):
+    """
+    Pending autosaves for a draft appraisal, keyed by top-level section of
+    appraisal_data. Rapid autosaves rewrite this small row instead of the
+    appraisal; core.services.draft_buffer folds it into the appraisal on
+    explicit save / submit or once it has been idle (manage.py flush_draft_buffers).
+    """
+    appraisal = models.OneToOneField(
+        Appraisal,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        db_column='appraisal_id',
+        related_name='draft_buffer'
+    )
+    # {section name: latest full value of that section}
+    sections = models.JSONField(default=dict)
+    saves = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'draft_buffers'
 
+    def __str__(self):
+        return f"{self.appraisal_id}: {', '.join(sorted(self.sections))}"
 
 
 class ApprovalHistory(models.Model):
@@ -366,7 +689,23 @@ class Document(models.Model):
 
 
 
+class AuditLogQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise RuntimeError("Audit logs are immutable")
+
+    def delete(self):
+        raise RuntimeError("Audit logs are immutable")
+
+
 class AuditLog(models.Model):
+    """
+    Append-only: rows are written in batches by core.services.audit_writer
+    and can be neither updated nor deleted, here or (triggers from
+    migration 0030) in the database. On PostgreSQL the table is partitioned
+    by month; old months move to compressed archives
+    (core.services.audit_archive).
+    """
+
     log_id = models.AutoField(primary_key=True)
     user_id_snapshot = models.IntegerField(null=True)
     username_snapshot = models.CharField(max_length=150)
@@ -382,26 +721,30 @@ class AuditLog(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
 
-    logged_at = models.DateTimeField(auto_now_add=True)
+    # When the action happened, not when the buffered row was inserted.
+    logged_at = models.DateTimeField(default=timezone.now)
+
+    objects = AuditLogQuerySet.as_manager()
 
     class Meta:
         db_table = "audit_logs"
         ordering = ["-logged_at"]
+        # Each filter of the audit API (api.views.audit) is an index prefix
+        # followed by the (logged_at, log_id) keyset.
         indexes = [
-            models.Index(fields=["entity", "entity_id"]),
-            models.Index(fields=["user_id_snapshot"]),
+            models.Index(fields=["entity", "entity_id", "logged_at", "log_id"], name="audit_logs_entity_idx"),
+            models.Index(fields=["user_id_snapshot", "logged_at", "log_id"], name="audit_logs_user_idx"),
+            models.Index(fields=["action", "logged_at", "log_id"], name="audit_logs_action_idx"),
+            models.Index(fields=["logged_at", "log_id"], name="audit_logs_logged_idx"),
         ]
 
-
     def save(self, *args, **kwargs):
-        if self.pk:
+        if not self._state.adding:
             raise RuntimeError("Audit logs are immutable")
         super().save(*args, **kwargs)
 
-
-    def save(self, *args, **kwargs):
-        if self.pk:
-            raise RuntimeError("Audit logs are immutable")
+    def delete(self, *args, **kwargs):
+        raise RuntimeError("Audit logs are immutable")
 
 
 class GeneratedPDF(models.Model):
@@ -424,3 +767,71 @@ class GeneratedPDF(models.Model):
 
     def __str__(self):
         return f"PDF | {self.appraisal}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Side effect recorded in the same transaction as the state change that
+    caused it. Dispatched later by `manage.py run_outbox` (core.services.outbox).
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+
+    event_id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'outbox_events'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.event_id} ({self.status})"
+
+
+class RequestProfile(models.Model):
+    """
+    Index entry for one sampled-stack profile of an API request; the
+    collapsed stacks themselves are in `file_path` (core.services.profiler).
+    """
+    TRIGGER_CHOICES = (
+        ('SIGNED', 'Signed header'),
+        ('SAMPLED', 'Random sample'),
+    )
+
+    profile_id = models.BigAutoField(primary_key=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    route = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    user_id_snapshot = models.IntegerField(null=True, blank=True)
+    requested_by = models.IntegerField(null=True, blank=True)
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+
+    duration_ms = models.FloatField()
+    samples = models.PositiveIntegerField()
+    file_path = models.TextField()
+
+    class Meta:
+        db_table = 'request_profiles'
+        indexes = [
+            models.Index(fields=['route', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -0,0 +1,138 @@
+"""
+Appraisal export with score breakdowns (CSV or XLSX).
+
+Rows are read with `.iterator()` and written one at a time, so memory
+stays flat regardless of how many appraisals are exported: CSV is yielded
+line by line for StreamingHttpResponse, XLSX goes through openpyxl's
+write-only mode into a temporary file.
+"""
+
+import csv
+import tempfile
+
+from core.models import Appraisal
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _score(attr):
+    def get(appraisal):
+        score = getattr(appraisal, "appraisalscore", None)
+        value = getattr(score, attr, None) if score else None
+        return float(value) if value is not None else None
+    return get
+
+
+def _department(appraisal):
+    department = appraisal.faculty.department
+    return department.department_name if department else None
+
+
+# name -> (header, value getter); insertion order is the default column order
+COLUMNS = {
+    "appraisal_id": ("Appraisal ID", lambda a: a.appraisal_id),
+    "faculty_name": ("Faculty", lambda a: a.faculty.full_name),
+    "designation": ("Designation", lambda a: a.faculty.designation),
+    "department": ("Department", _department),
+    "academic_year": ("Academic Year", lambda a: a.academic_year),
+    "semester": ("Semester", lambda a: a.semester),
+    "form_type": ("Form", lambda a: a.form_type),
+    "is_hod_appraisal": ("HOD Appraisal", lambda a: a.is_hod_appraisal),
+    "status": ("Status", lambda a: a.status),
+    "teaching_score": ("Teaching", _score("teaching_score")),
+    "research_score": ("Research", _score("research_score")),
+    "activity_score": ("Activity", _score("activity_score")),
+    "feedback_score": ("Feedback", _score("feedback_score")),
+    "acr_score": ("ACR", _score("acr_score")),
+    "total_score": ("Total", _score("total_score")),
+    "verified_grade": ("Verified Grade", lambda a: getattr(getattr(a, "appraisalscore", None), "verified_grade", None)),
+    "updated_at": ("Last Updated", lambda a: a.updated_at.isoformat() if a.updated_at else None),
+}
+
+# Only the columns the exporter reads; appraisal_data is never loaded.
+_LOAD_FIELDS = (
+    "appraisal_id",
+    "academic_year",
+    "semester",
+    "form_type",
+    "is_hod_appraisal",
+    "status",
+    "updated_at",
+    "faculty__full_name",
+    "faculty__designation",
+    "faculty__department__department_name",
+    "appraisalscore__teaching_score",
+    "appraisalscore__research_score",
+    "appraisalscore__activity_score",
+    "appraisalscore__feedback_score",
+    "appraisalscore__acr_score",
+    "appraisalscore__total_score",
+    "appraisalscore__verified_grade",
+)
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def resolve_columns(raw):
+    """Parse a comma-separated column list; None/empty means every column."""
+    if not raw:
+        return list(COLUMNS)
+    columns = [c.strip() for c in raw.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}. Available: {', '.join(COLUMNS)}")
+    return columns
+
+
+def export_queryset(queryset=None):
+    queryset = Appraisal.objects.all() if queryset is None else queryset
+    return (
+        queryset.select_related("appraisalscore", "faculty__department")
+        .only(*_LOAD_FIELDS)
+        .order_by("appraisal_id")
+    )
+
+
+def iter_rows(queryset, columns):
+    getters = [COLUMNS[c][1] for c in columns]
+    for appraisal in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [get(appraisal) for get in getters]
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, columns):
+    """Yield the CSV export line by line (header first)."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([COLUMNS[c][0] for c in columns])
+    for row in iter_rows(queryset, columns):
+        yield writer.writerow(row)
+
+
+def write_xlsx(queryset, columns, fileobj=None):
+    """
+    Write the export to `fileobj` (default: a new temporary file) using
+    openpyxl's write-only mode. Returns the file object, rewound.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportUnavailable("XLSX export requires openpyxl; use format=csv or install openpyxl")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Appraisals")
+    sheet.append([COLUMNS[c][0] for c in columns])
+    for row in iter_rows(queryset, columns):
+        sheet.append(row)
+
+    fileobj = fileobj or tempfile.TemporaryFile(suffix=".xlsx")
+    workbook.save(fileobj)
+    fileobj.seek(0)
+    return fileobj
@@ -0,0 +1,225 @@
+"""
+Offline import of legacy appraisal payloads.
+
+`prepare_record` is the CPU-bound half (normalize -> validate -> score) and
+only touches pure-python modules, so it can run inside a process pool.
+`ImportBatchWriter` is the DB half: it resolves faculty for a whole batch,
+skips rows that already exist and persists the rest with `bulk_create`.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+
+from core.models import Appraisal, AppraisalScore, FacultyProfile
+from scoring.activity_selection import normalize_appraisal_activity_mapping
+from scoring.engine import calculate_full_score
+from validation.master_validator import validate_full_form
+from workflow.projections import record_writes
+from workflow.states import States
+
+REQUIRED_META_FIELDS = ("academic_year", "semester", "form_type")
+VALID_FORM_TYPES = {choice for choice, _ in Appraisal.FORM_TYPE_CHOICES}
+IMPORTABLE_STATES = {
+    value for key, value in vars(States).items() if not key.startswith("_")
+}
+
+
+def _score_row(score_result):
+    return {
+        "teaching_score": score_result["teaching"]["score"],
+        "research_score": score_result["research"]["total"],
+        "activity_score": score_result["activities"]["score"],
+        "feedback_score": score_result["pbas"]["total"],
+        "total_score": score_result["total_score"],
+        "acr_score": score_result["acr"]["credit_point"],
+    }
+
+
+def prepare_record(line_no, record):
+    """
+    Normalize, validate and score one record.
+    Returns a plain dict so it can travel back from a worker process.
+    """
+    result = {"line": line_no, "ok": False, "error": None}
+
+    if not isinstance(record, dict):
+        result["error"] = "Record must be a JSON object"
+        return result
+
+    missing = [field for field in REQUIRED_META_FIELDS if not record.get(field)]
+    if missing:
+        result["error"] = f"Missing meta fields: {missing}"
+        return result
+
+    if record["form_type"] not in VALID_FORM_TYPES:
+        result["error"] = f"Unknown form_type '{record['form_type']}'"
+        return result
+
+    if not record.get("faculty_id") and not record.get("username"):
+        result["error"] = "Either faculty_id or username is required"
+        return result
+
+    faculty_id = record.get("faculty_id")
+    if faculty_id:
+        try:
+            faculty_id = int(faculty_id)
+        except (TypeError, ValueError):
+            result["error"] = f"Invalid faculty_id '{faculty_id}'"
+            return result
+
+    payload = record.get("appraisal_data")
+    if not isinstance(payload, dict) or not payload:
+        result["error"] = "appraisal_data is required"
+        return result
+
+    try:
+        payload = normalize_appraisal_activity_mapping(payload)
+    except Exception as exc:
+        result["error"] = f"Normalization failed: {exc}"
+        return result
+
+    submit_action = str(payload.get("submit_action", "submit")).lower()
+    status = record.get("status") or (
+        States.SUBMITTED if submit_action == "submit" else States.DRAFT
+    )
+    if status not in IMPORTABLE_STATES:
+        result["error"] = f"Unknown status '{status}'"
+        return result
+
+    scores = None
+    if status != States.DRAFT:
+        ok, err = validate_full_form(payload, record)
+        if not ok:
+            result["error"] = err
+            return result
+        try:
+            scores = _score_row(calculate_full_score(payload))
+        except Exception as exc:
+            result["error"] = f"Scoring failed: {exc!r}"
+            return result
+
+    result.update({
+        "ok": True,
+        "faculty_id": faculty_id,
+        "username": record.get("username"),
+        "academic_year": str(record["academic_year"]),
+        "semester": str(record["semester"]),
+        "form_type": record["form_type"],
+        "is_hod_appraisal": bool(record.get("is_hod_appraisal", False)),
+        "remarks": record.get("remarks"),
+        "status": status,
+        "appraisal_data": payload,
+        "scores": scores,
+    })
+    return result
+
+
+class ImportBatchWriter:
+    """
+    Persist prepared records batch by batch.
+    Each batch is one transaction: either every valid row of the batch is
+    written or none is, which keeps checkpoints consistent.
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+
+    def _resolve_faculty(self, prepared):
+        ids = {p["faculty_id"] for p in prepared if p.get("faculty_id")}
+        usernames = {p["username"] for p in prepared if not p.get("faculty_id")}
+
+        lookup = Q(pk__in=ids) | Q(user__username__in=usernames)
+        profiles = FacultyProfile.objects.select_related(
+            "user", "department", "department__hod"
+        ).filter(lookup)
+
+        by_id = {}
+        by_username = {}
+        for profile in profiles:
+            by_id[profile.pk] = profile
+            by_username[profile.user.username] = profile
+        return by_id, by_username
+
+    def _existing_keys(self, faculty_ids):
+        return set(
+            Appraisal.objects.filter(faculty_id__in=faculty_ids).values_list(
+                "faculty_id", "academic_year", "semester", "form_type"
+            )
+        )
+
+    def write(self, prepared):
+        """
+        Returns (imported_count, errors) where errors is a list of
+        {"line": ..., "error": ...} dicts for this batch.
+        """
+        errors = [
+            {"line": p["line"], "error": p["error"]} for p in prepared if not p["ok"]
+        ]
+        valid = [p for p in prepared if p["ok"]]
+        if not valid:
+            return 0, errors
+
+        by_id, by_username = self._resolve_faculty(valid)
+
+        rows = []
+        for item in valid:
+            faculty = (
+                by_id.get(item["faculty_id"])
+                if item.get("faculty_id")
+                else by_username.get(item["username"])
+            )
+            if faculty is None:
+                errors.append({"line": item["line"], "error": "Faculty profile not found"})
+                continue
+            rows.append((item, faculty))
+
+        existing = self._existing_keys({faculty.pk for _, faculty in rows})
+        appraisals = []
+        pending = []
+        for item, faculty in rows:
+            key = (faculty.pk, item["academic_year"], item["semester"], item["form_type"])
+            if key in existing:
+                errors.append({"line": item["line"], "error": "Appraisal already exists for this period"})
+                continue
+            existing.add(key)
+
+            department = faculty.department
+            hod = department.hod if department and item["status"] != States.DRAFT else None
+            appraisals.append(
+                Appraisal(
+                    faculty=faculty,
+                    # bulk_create skips Appraisal.save(), so copy it here
+                    department_id=faculty.department_id,
+                    hod=None if item["is_hod_appraisal"] else hod,
+                    form_type=item["form_type"],
+                    academic_year=item["academic_year"],
+                    semester=item["semester"],
+                    is_hod_appraisal=item["is_hod_appraisal"],
+                    appraisal_data=item["appraisal_data"],
+                    status=item["status"],
+                    remarks=item["remarks"],
+                )
+            )
+            pending.append(item)
+
+        if self.dry_run or not appraisals:
+            return len(appraisals), errors
+
+        with transaction.atomic():
+            created = Appraisal.objects.bulk_create(appraisals)
+            AppraisalScore.objects.bulk_create([
+                AppraisalScore(
+                    appraisal=appraisal,
+                    **{
+                        field: Decimal(str(value)) if value is not None else None
+                        for field, value in item["scores"].items()
+                    },
+                )
+                for appraisal, item in zip(created, pending)
+                if item["scores"]
+            ])
+            record_writes([(appraisal, None) for appraisal in created])
+
+        return len(created), errors
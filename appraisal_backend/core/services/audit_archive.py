@@ -0,0 +1,415 @@
+"""
+Monthly audit log partitions and their compressed archives.
+
+On PostgreSQL `audit_logs` is range-partitioned by month on logged_at
+(migration 0031): one partition `audit_logs_pYYYYMM` per month plus a
+default partition that stays empty as long as `ensure_partitions()` runs
+ahead of the clock (the archive_audit_logs command does so on every run).
+If it falls behind, rows land in the default partition; creating their
+month's partition later moves them into it (see `create_partition()`), and
+`live_months()` lists their months so they are archived like any other.
+Archiving a month writes its rows to AUDIT_ARCHIVE_DIR/audit_logs_YYYY_MM.jsonl.gz
+and then detaches and drops the partition, which is DDL and so not blocked
+by the immutability triggers. Both happen in one transaction, and the file
+is only renamed into place just before it commits.
+
+An archive is a series of gzip members of BLOCK_ROWS rows each (still one
+valid .jsonl.gz file), with a sidecar audit_logs_YYYY_MM.index.json giving
+each block's byte offset and key range and, for the INDEXED_FIELDS, the
+blocks holding each value. A page of history decompresses only the blocks
+that can hold its rows instead of the whole month.
+
+SQLite (tests, development) has no partitioning; a month there is the
+logged_at range of the single table, and archiving deletes that range with
+the delete trigger suspended inside the same transaction.
+
+`iter_audit_logs()` reads the live table first and then the archives,
+newest first, so callers see one history regardless of where a row lives.
+"""
+
+import gzip
+import json
+import io
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import AuditLog
+from core.services.audit_writer import FIELDS, RecordEncoder, from_record, to_record
+
+ARCHIVE_DIR = getattr(settings, "AUDIT_ARCHIVE_DIR", os.path.join(settings.BASE_DIR, "audit_archive"))
+PARTITIONS_AHEAD = 2
+BLOCK_ROWS = 1000
+# Filters the archive index can answer without decompressing a block.
+INDEXED_FIELDS = ("entity", "entity_id", "user_id_snapshot", "action")
+
+DEFAULT_PARTITION = "audit_logs_default"
+
+_PARTITION_RE = re.compile(r"^audit_logs_p(\d{4})(\d{2})$")
+_ARCHIVE_RE = re.compile(r"^audit_logs_(\d{4})_(\d{2})\.jsonl\.gz$")
+
+
+def month_start(value):
+    """First instant (UTC) of the month containing `value`."""
+    value = value.astimezone(dt_timezone.utc) if timezone.is_aware(value) else value
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f"audit_logs_p{month:%Y%m}"
+
+
+def archive_path(month, directory=None):
+    return os.path.join(directory or ARCHIVE_DIR, f"audit_logs_{month:%Y_%m}.jsonl.gz")
+
+
+def index_path(month, directory=None):
+    return os.path.join(directory or ARCHIVE_DIR, f"audit_logs_{month:%Y_%m}.index.json")
+
+
+def is_partitioned():
+    return connection.vendor == "postgresql"
+
+
+def partition_months():
+    """Months that have their own partition (PostgreSQL only)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'audit_logs'
+            """
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = []
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if match:
+            months.append(datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc))
+    return sorted(months)
+
+
+def default_months():
+    """Months with rows in the default partition (PostgreSQL only)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', logged_at AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}"
+        )
+        return sorted(row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall())
+
+
+def create_partition(cursor, month):
+    """
+    Create the partition of `month` unless it exists.
+
+    PostgreSQL refuses to while the default partition holds rows in that
+    range. The default partition is then swapped for an empty one and its
+    rows are inserted again through audit_logs, which routes them to the
+    new partition; as in migration 0031 nothing is deleted, so the
+    immutability trigger stays in force. Run inside a transaction.
+    """
+    cursor.execute("SELECT to_regclass(%s)", [partition_name(month)])
+    if cursor.fetchone()[0] is not None:
+        return
+    bounds = [month, add_months(month, 1)]
+    # Keep new rows out of the default partition until the transaction ends.
+    cursor.execute(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE MODE")
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE logged_at >= %s AND logged_at < %s)",
+        bounds,
+    )
+    stranded = cursor.fetchone()[0]
+    if stranded:
+        cursor.execute(f"ALTER TABLE audit_logs DETACH PARTITION {DEFAULT_PARTITION}")
+        cursor.execute(f"ALTER TABLE {DEFAULT_PARTITION} RENAME TO {DEFAULT_PARTITION}_old")
+    cursor.execute(
+        f"CREATE TABLE {partition_name(month)} PARTITION OF audit_logs FOR VALUES FROM (%s) TO (%s)",
+        bounds,
+    )
+    if stranded:
+        columns = ", ".join(["log_id", *FIELDS])
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF audit_logs DEFAULT")
+        cursor.execute(f"INSERT INTO audit_logs ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION}_old")
+        cursor.execute(f"DROP TABLE {DEFAULT_PARTITION}_old")
+
+
+def ensure_partitions(ahead=PARTITIONS_AHEAD):
+    """Create the partitions for this month and the next `ahead` months."""
+    if not is_partitioned():
+        return []
+    current = month_start(timezone.now())
+    months = [add_months(current, offset) for offset in range(ahead + 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for month in months:
+            create_partition(cursor, month)
+    return months
+
+
+def live_months():
+    """
+    Months with rows (or, on PostgreSQL, a partition) in the live table,
+    including months whose rows sit in the default partition.
+    """
+    if is_partitioned():
+        return sorted(set(partition_months()) | set(default_months()))
+    return sorted(
+        month_start(value)
+        for value in AuditLog.objects.datetimes("logged_at", "month", order="ASC", tzinfo=dt_timezone.utc)
+    )
+
+
+def archived_months(directory=None):
+    directory = directory or ARCHIVE_DIR
+    if not os.path.isdir(directory):
+        return []
+    months = []
+    for name in os.listdir(directory):
+        match = _ARCHIVE_RE.match(name)
+        if match:
+            months.append(datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc))
+    return sorted(months)
+
+
+def _month_rows(month):
+    if is_partitioned():
+        # Read the partition itself, which archive_month() has just made
+        # sure exists and holds every row of the month.
+        query = f"SELECT log_id, {', '.join(FIELDS)} FROM {partition_name(month)} ORDER BY logged_at, log_id"
+        return AuditLog.objects.raw(query)
+    return AuditLog.objects.filter(
+        logged_at__gte=month, logged_at__lt=add_months(month, 1)
+    ).order_by("logged_at", "log_id")
+
+
+def _month_count(month):
+    if is_partitioned():
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {partition_name(month)}")
+            return cursor.fetchone()[0]
+    return _month_rows(month).count()
+
+
+def _lock_month(month):
+    """Keep rows out of `month` until the transaction ends, so the archive stays complete."""
+    if is_partitioned():
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {partition_name(month)} IN SHARE MODE")
+
+
+def _key(entry):
+    return [entry.logged_at.isoformat(), entry.log_id]
+
+
+def _write_archive(path, index, entries):
+    """
+    Write `entries`, oldest first, to `path`.partial in blocks and their
+    index to `index`.partial. Returns the number of rows written.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    blocks = []
+    fields = {name: {} for name in INDEXED_FIELDS}
+    count = 0
+    with open(f"{path}.partial", "wb") as fh:
+        while chunk := list(islice(entries, BLOCK_ROWS)):
+            number = len(blocks)
+            blocks.append({"offset": fh.tell(), "rows": len(chunk), "first": _key(chunk[0]), "last": _key(chunk[-1])})
+            with gzip.GzipFile(fileobj=fh, mode="wb") as member:
+                for entry in chunk:
+                    record = {"log_id": entry.log_id, **to_record(entry)}
+                    member.write((json.dumps(record, cls=RecordEncoder) + "\n").encode("utf-8"))
+                    for name in INDEXED_FIELDS:
+                        holding = fields[name].setdefault(str(getattr(entry, name)), [])
+                        if not holding or holding[-1] != number:
+                            holding.append(number)
+            count += len(chunk)
+        fh.flush()
+        os.fsync(fh.fileno())
+    with open(f"{index}.partial", "w", encoding="utf-8") as fh:
+        json.dump({"rows": count, "blocks": blocks, "fields": fields}, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    return count
+
+
+def _drop_month(month):
+    if is_partitioned():
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE audit_logs DETACH PARTITION {partition_name(month)}")
+            cursor.execute(f"DROP TABLE {partition_name(month)}")
+        return
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("DROP TRIGGER IF EXISTS audit_logs_no_delete")
+        cursor.execute(
+            "DELETE FROM audit_logs WHERE logged_at >= %s AND logged_at < %s",
+            [connection.ops.adapt_datetimefield_value(value) for value in (month, add_months(month, 1))],
+        )
+        cursor.execute(
+            "CREATE TRIGGER audit_logs_no_delete BEFORE DELETE ON audit_logs "
+            "BEGIN SELECT RAISE(ABORT, 'Audit logs are immutable'); END"
+        )
+
+
+def archive_month(month, directory=None):
+    """
+    Export `month` to its archive file and remove it from the live table, in
+    one transaction. Returns the number of rows archived.
+
+    The archive is renamed into place only once the rows are dropped, so a
+    failed drop leaves no archive behind. If a run died after the rename but
+    before the commit, the archive exists while the month is still live; it
+    is then accepted, and the month dropped, when it holds as many rows as
+    the live month. Any other existing archive raises FileExistsError.
+    """
+    path = archive_path(month, directory)
+    index = index_path(month, directory)
+    with transaction.atomic():
+        if is_partitioned():
+            # Gives rows stranded in the default partition a partition to archive from.
+            with connection.cursor() as cursor:
+                create_partition(cursor, month)
+        _lock_month(month)
+        if os.path.exists(path):
+            archived, live = archived_rows(month, directory), _month_count(month)
+            if archived != live:
+                raise FileExistsError(f"{path} already exists with {archived} rows, the live month has {live}")
+            _drop_month(month)
+            return archived
+
+        try:
+            count = _write_archive(path, index, _month_rows(month).iterator())
+            _drop_month(month)
+            os.replace(f"{index}.partial", index)
+            os.replace(f"{path}.partial", path)
+        except BaseException:
+            for partial in (f"{index}.partial", f"{path}.partial"):
+                if os.path.exists(partial):
+                    os.remove(partial)
+            raise
+    return count
+
+
+def read_index(month, directory=None):
+    """The archive index of `month`, or None for an archive written without one."""
+    try:
+        with open(index_path(month, directory), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def archived_rows(month, directory=None):
+    index = read_index(month, directory)
+    if index is not None:
+        return index["rows"]
+    return sum(1 for _ in read_archive(month, directory))
+
+
+def _entries(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        entry = from_record(record)
+        entry.log_id = record["log_id"]
+        entry._state.adding = False
+        yield entry
+
+
+def read_archive(month, directory=None):
+    """AuditLog rows of an archived month, oldest first (not saveable)."""
+    with gzip.open(archive_path(month, directory), "rt", encoding="utf-8") as fh:
+        yield from _entries(fh)
+
+
+def _read_block(fh, block):
+    """Rows of one block of an open archive; a block without "rows" runs to the end of the file."""
+    fh.seek(block["offset"])
+    member = gzip.GzipFile(fileobj=fh, mode="rb")
+    return list(_entries(islice(io.TextIOWrapper(member, encoding="utf-8"), block.get("rows"))))
+
+
+def _blocks(index, filters):
+    """Blocks of an archive that can hold rows matching `filters`, oldest first."""
+    if index is None:
+        return [{"offset": 0}]
+    numbers = set(range(len(index["blocks"])))
+    for name, value in filters.items():
+        if name in index["fields"]:
+            numbers &= set(index["fields"][name].get(str(value), ()))
+    return [index["blocks"][number] for number in sorted(numbers)]
+
+
+def _bound(key):
+    return parse_datetime(key[0]), key[1]
+
+
+def _matches(entry, filters):
+    return all(getattr(entry, name) == value for name, value in filters.items())
+
+
+def iter_audit_logs(since=None, until=None, before=None, limit=None, directory=None, include_archived=True, **filters):
+    """
+    AuditLog rows with `since <= logged_at < until` matching `filters`
+    (exact field lookups such as entity="Appraisal", entity_id=7), newest
+    first, from the live table and then from the archives.
+
+    `before` is a (logged_at, log_id) keyset position: only rows strictly
+    older are returned. `limit` caps the number of rows read from the live
+    table (the caller stops iterating once it has enough); archived blocks
+    are decompressed one at a time as iteration reaches them.
+    """
+    live = AuditLog.objects.filter(**filters).order_by("-logged_at", "-log_id")
+    if since is not None:
+        live = live.filter(logged_at__gte=since)
+    if until is not None:
+        live = live.filter(logged_at__lt=until)
+    if before is not None:
+        live = live.filter(Q(logged_at__lt=before[0]) | Q(logged_at=before[0], log_id__lt=before[1]))
+    if limit is not None:
+        yield from live[:limit]
+    else:
+        yield from live.iterator()
+
+    if not include_archived:
+        return
+    for month in reversed(archived_months(directory)):
+        if until is not None and month >= until:
+            continue
+        if before is not None and month > before[0]:
+            continue
+        if since is not None and add_months(month, 1) <= since:
+            break
+        with open(archive_path(month, directory), "rb") as fh:
+            for block in reversed(_blocks(read_index(month, directory), filters)):
+                if "first" in block:
+                    if before is not None and _bound(block["first"]) >= tuple(before):
+                        continue
+                    if until is not None and _bound(block["first"])[0] >= until:
+                        continue
+                    if since is not None and _bound(block["last"])[0] < since:
+                        break
+                entries = [
+                    entry
+                    for entry in _read_block(fh, block)
+                    if _matches(entry, filters)
+                    and (since is None or entry.logged_at >= since)
+                    and (until is None or entry.logged_at < until)
+                    and (before is None or (entry.logged_at, entry.log_id) < tuple(before))
+                ]
+                entries.sort(key=lambda entry: (entry.logged_at, entry.log_id), reverse=True)
+                yield from entries
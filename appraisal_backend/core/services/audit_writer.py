@@ -0,0 +1,127 @@
+"""
+Per-process buffer that writes AuditLog rows in batches.
+
+core.utils.audit queues entries with `transaction.on_commit`, so an audit
+row exists only if the action it describes committed, and the request
+never waits on an audit INSERT of its own. The buffer is written with one
+bulk_create when it holds AUDIT_BUFFER_SIZE entries or its oldest entry is
+AUDIT_FLUSH_SECONDS old (a timer thread covers quiet periods), and at
+process exit.
+
+If the database rejects a batch, the entries are appended to the JSONL file
+at AUDIT_FALLBACK_PATH (fsynced) instead of being dropped; the
+replay_audit_fallback command loads them once the database is back. Entries
+still buffered when a process is killed are lost.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from core.models import AuditLog
+
+logger = logging.getLogger("api.performance")
+
+BUFFER_SIZE = getattr(settings, "AUDIT_BUFFER_SIZE", 100)
+FLUSH_SECONDS = getattr(settings, "AUDIT_FLUSH_SECONDS", 2.0)
+FALLBACK_PATH = getattr(settings, "AUDIT_FALLBACK_PATH", os.path.join(settings.BASE_DIR, "audit_fallback.jsonl"))
+
+# Columns written to the fallback file; log_id is assigned on replay.
+FIELDS = [field.attname for field in AuditLog._meta.concrete_fields if not field.primary_key]
+
+
+class RecordEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, but keeping microseconds (logged_at orders rows)."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def to_record(entry):
+    return {name: getattr(entry, name) for name in FIELDS}
+
+
+def from_record(record):
+    entry = AuditLog(**{name: record.get(name) for name in FIELDS})
+    if isinstance(entry.logged_at, str):
+        entry.logged_at = parse_datetime(entry.logged_at)
+    return entry
+
+
+class AuditWriter:
+    def __init__(self, max_entries=BUFFER_SIZE, max_delay=FLUSH_SECONDS, fallback_path=FALLBACK_PATH):
+        self.max_entries = max_entries
+        self.max_delay = max_delay
+        self.fallback_path = fallback_path
+        self._entries = []
+        self._oldest = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entries):
+        if not entries:
+            return
+        with self._lock:
+            self._entries.extend(entries)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = len(self._entries) >= self.max_entries or (
+                self.max_delay and time.monotonic() - self._oldest >= self.max_delay
+            )
+            if not due and self._timer is None and self.max_delay:
+                self._timer = threading.Timer(self.max_delay, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered; returns the number of entries handled."""
+        with self._lock:
+            entries, self._entries = self._entries, []
+            self._oldest = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not entries:
+            return 0
+
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create(entries, batch_size=500)
+        except DatabaseError:
+            logger.exception("audit.flush_failed entries=%s fallback=%s", len(entries), self.fallback_path)
+            self.spill(entries)
+        return len(entries)
+
+    def spill(self, entries):
+        lines = "".join(json.dumps(to_record(entry), cls=RecordEncoder) + "\n" for entry in entries)
+        with open(self.fallback_path, "a", encoding="utf-8") as fh:
+            fh.write(lines)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread opened its own connection.
+            connection.close()
+
+
+audit_writer = AuditWriter()
+atexit.register(audit_writer.flush)
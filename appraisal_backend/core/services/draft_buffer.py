@@ -0,0 +1,153 @@
+"""
+Autosave buffer for draft appraisals.
+
+Autosaves land in a small DraftBuffer row holding only the top-level
+sections of appraisal_data that changed since the last flush. The
+appraisal row (and its large JSON column) is written once, when the buffer
+is flushed:
+
+* on an explicit save (autosave with "flush": true, or a JSON Patch save),
+* when the buffer has been accumulating for MAX_AGE_SECONDS,
+* by `manage.py flush_draft_buffers` once it has been idle.
+
+Full-payload submits / draft saves supersede the buffer and discard it.
+Reads for the owner go through `merged_data()` so autosaved edits are
+visible immediately.
+"""
+
+import copy
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Appraisal, DraftBuffer
+from scoring.activity_selection import normalize_appraisal_activity_mapping
+from workflow.services import update_appraisal
+from workflow.states import States
+
+EDITABLE_STATES = (States.DRAFT, States.RETURNED_BY_HOD, States.RETURNED_BY_PRINCIPAL)
+
+# Sections read and rewritten by normalize_appraisal_activity_mapping.
+NORMALIZED_SECTIONS = frozenset({"activities", "pbas"})
+
+IDLE_SECONDS = getattr(settings, "DRAFT_BUFFER_IDLE_SECONDS", 120)
+MAX_AGE_SECONDS = getattr(settings, "DRAFT_BUFFER_MAX_AGE_SECONDS", 900)
+
+
+def get_buffer(appraisal):
+    """The appraisal's DraftBuffer or None (uses select_related data when loaded)."""
+    try:
+        return appraisal.draft_buffer
+    except DraftBuffer.DoesNotExist:
+        return None
+
+
+def merge_sections(data, sections):
+    """Copy of `data` with buffered sections applied; None removes a section."""
+    merged = dict(data or {})
+    for name, value in sections.items():
+        if value is None:
+            merged.pop(name, None)
+        else:
+            merged[name] = value
+    return merged
+
+
+def merged_data(appraisal, buffer=None):
+    buffer = buffer or get_buffer(appraisal)
+    if buffer is None or not buffer.sections:
+        return appraisal.appraisal_data
+    return merge_sections(appraisal.appraisal_data, buffer.sections)
+
+
+def normalize_sections(data, touched):
+    """Re-run the activity mapping normalizer if `touched` includes its sections."""
+    if not set(touched) & NORMALIZED_SECTIONS:
+        return data
+    data = dict(data)
+    for section in NORMALIZED_SECTIONS:
+        # The normalizer edits both sections in place.
+        if section in data:
+            data[section] = copy.deepcopy(data[section])
+    normalized = normalize_appraisal_activity_mapping(data)
+    for section in NORMALIZED_SECTIONS:
+        data[section] = normalized[section]
+    return data
+
+
+def _locked_buffer(appraisal_id):
+    DraftBuffer.objects.bulk_create([DraftBuffer(appraisal_id=appraisal_id)], ignore_conflicts=True)
+    return DraftBuffer.objects.select_for_update().get(appraisal_id=appraisal_id)
+
+
+@transaction.atomic
+def buffer_autosave(appraisal, sections):
+    """
+    Record `sections` ({name: value, None to remove}) for `appraisal`.
+    Returns (buffer, flushed); the buffer is flushed straight away when it
+    has been accumulating for longer than MAX_AGE_SECONDS.
+    """
+    now = timezone.now()
+    buffer = _locked_buffer(appraisal.appraisal_id)
+    buffer.sections = {**buffer.sections, **sections}
+    buffer.saves += 1
+    buffer.updated_at = now
+
+    if buffer.created_at <= now - timedelta(seconds=MAX_AGE_SECONDS):
+        flush_buffer(appraisal.appraisal_id, buffer=buffer)
+        return buffer, True
+
+    buffer.save(update_fields=["sections", "saves", "updated_at"])
+    return buffer, False
+
+
+@transaction.atomic
+def flush_buffer(appraisal_id, buffer=None):
+    """
+    Fold the buffered sections into the appraisal (one version-guarded
+    write) and delete the buffer. Buffers of appraisals that are no longer
+    editable are discarded. Returns the appraisal, or None if nothing was
+    buffered.
+    """
+    if buffer is None:
+        buffer = DraftBuffer.objects.select_for_update().filter(appraisal_id=appraisal_id).first()
+        if buffer is None:
+            return None
+
+    appraisal = Appraisal.objects.select_for_update().get(appraisal_id=appraisal_id)
+    if buffer.sections and appraisal.status in EDITABLE_STATES:
+        data = merge_sections(appraisal.appraisal_data, buffer.sections)
+        update_appraisal(appraisal, appraisal_data=normalize_sections(data, buffer.sections))
+    DraftBuffer.objects.filter(appraisal_id=appraisal_id).delete()
+    return appraisal
+
+
+def discard_buffer(appraisal_id):
+    """Drop pending autosaves, e.g. after a full-payload save replaced them."""
+    DraftBuffer.objects.filter(appraisal_id=appraisal_id).delete()
+
+
+def flush_idle(idle_seconds=IDLE_SECONDS, limit=None):
+    """Flush every buffer untouched for `idle_seconds`. Returns the count."""
+    cutoff = timezone.now() - timedelta(seconds=idle_seconds)
+    ids = DraftBuffer.objects.filter(updated_at__lte=cutoff).order_by("updated_at").values_list(
+        "appraisal_id", flat=True
+    )
+    if limit:
+        ids = ids[:limit]
+
+    flushed = 0
+    for appraisal_id in list(ids):
+        with transaction.atomic():
+            buffer = (
+                DraftBuffer.objects.select_for_update(skip_locked=True)
+                .filter(appraisal_id=appraisal_id, updated_at__lte=cutoff)
+                .first()
+            )
+            # Skip buffers an autosave is writing to right now.
+            if buffer is not None:
+                flush_buffer(appraisal_id, buffer=buffer)
+                flushed += 1
+    return flushed
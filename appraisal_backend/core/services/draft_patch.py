@@ -0,0 +1,39 @@
+"""
+Partial draft saves: apply a JSON Patch to an appraisal's appraisal_data.
+
+Only the sections the patch touched are copied and re-normalized; the
+activity mapping normalizer runs only when `activities` or `pbas` changed,
+instead of on every save as with a full upload to the submit endpoints.
+Pending autosaves (core.services.draft_buffer) are folded into the same write.
+"""
+
+from django.db import transaction
+
+from core.models import DraftBuffer
+from core.utils.json_patch import apply_patch
+from workflow.services import update_appraisal
+from .draft_buffer import merge_sections, normalize_sections
+
+MAX_OPERATIONS = 500
+
+
+@transaction.atomic
+def patch_draft(appraisal, operations):
+    """
+    Apply `operations` (RFC 6902) to the appraisal's data, including any
+    buffered autosaves, and save it with the optimistic version check.
+    Raises JSONPatchError for a bad patch and TransitionConflict if the
+    appraisal changed concurrently. Returns the sorted list of top-level
+    sections that were written.
+    """
+    buffer = DraftBuffer.objects.select_for_update().filter(appraisal_id=appraisal.appraisal_id).first()
+    buffered = buffer.sections if buffer else {}
+
+    data, touched = apply_patch(merge_sections(appraisal.appraisal_data, buffered), operations)
+    touched |= set(buffered)
+
+    if touched:
+        update_appraisal(appraisal, appraisal_data=normalize_sections(data, touched))
+    if buffer is not None:
+        buffer.delete()
+    return sorted(touched)
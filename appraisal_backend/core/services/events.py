@@ -0,0 +1,197 @@
+"""
+In-process pub/sub for live updates, with a pluggable cross-process backend.
+
+`publish(channels, event, data)` can be called from any (sync) code. The
+backend carries the message to every process serving the SSE endpoint
+(api.views.events), where the Broker hands it to the asyncio queue of each
+connected subscriber on one of `channels` ("user:<id>", "role:PRINCIPAL").
+
+Backends (settings.EVENTS_BACKEND):
+
+* "local": deliver straight to this process's broker. Enough when the
+  writes and the SSE connections are served by the same process (one ASGI
+  server, tests, development).
+* "postgres": NOTIFY on a channel; every ASGI process runs one LISTEN
+  thread that forwards notifications to its broker. Use this when writes
+  come from gunicorn/WSGI workers or the outbox worker.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+logger = logging.getLogger("api.performance")
+
+NOTIFY_CHANNEL = "appraisal_events"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+MAX_NOTIFY_BYTES = 7900
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, channels, loop, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        # Set when messages were dropped; the stream tells the client to reload.
+        self.overflowed = False
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Broker:
+    """Fan-out from channels to subscriber queues; deliver() is thread-safe."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def deliver(self, message):
+        with self._lock:
+            targets = set()
+            for channel in message["channels"]:
+                targets |= self._subscribers.get(channel, set())
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, message)
+            except RuntimeError:
+                # The subscriber's event loop is closed; it will unsubscribe.
+                pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+
+broker = Broker()
+
+
+class LocalBackend:
+    def publish(self, message):
+        broker.deliver(message)
+
+    def start_listener(self):
+        pass
+
+
+class PostgresBackend:
+    def __init__(self):
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        payload = json.dumps(message, cls=DjangoJSONEncoder)
+        if len(payload.encode("utf-8")) > MAX_NOTIFY_BYTES:
+            logger.warning("events.payload_too_large event=%s bytes=%s", message["event"], len(payload))
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, payload])
+
+    def start_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen_forever, name="events-listener", daemon=True)
+                self._listener.start()
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        db = settings.DATABASES["default"]
+        conn = psycopg2.connect(
+            dbname=db["NAME"],
+            user=db["USER"],
+            password=db["PASSWORD"],
+            host=db["HOST"],
+            port=db["PORT"],
+            **db.get("OPTIONS", {}),
+        )
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        return conn
+
+    def _listen_forever(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                backoff = 1
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            broker.deliver(json.loads(notify.payload))
+                        except (ValueError, KeyError):
+                            logger.warning("events.bad_notification payload=%r", notify.payload[:200])
+            except Exception:
+                logger.exception("events.listener_error retry_in=%ss", backoff)
+                if conn is not None:
+                    with contextlib.suppress(Exception):
+                        conn.close()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+
+BACKENDS = {
+    "local": LocalBackend,
+    "postgres": PostgresBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        name = getattr(settings, "EVENTS_BACKEND", "local")
+        try:
+            _backend = BACKENDS[name]()
+        except KeyError:
+            raise ValueError(f"Unknown EVENTS_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    return _backend
+
+
+def publish(channels, event, data):
+    """Send `event` with `data` to subscribers of any of `channels`."""
+    channels = sorted(set(channels))
+    if not channels:
+        return
+    try:
+        get_backend().publish({"channels": channels, "event": event, "data": data})
+    except Exception:
+        # Live updates are best effort; clients fall back to the change feed.
+        logger.exception("events.publish_failed event=%s", event)
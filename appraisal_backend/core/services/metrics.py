@@ -0,0 +1,303 @@
+"""
+In-process metrics: counters and fixed-bucket histograms, exposed in the
+Prometheus text format at /metrics (core.views.metrics_views).
+
+    REQUESTS = Histogram("http_request_duration_seconds", "...", ["method", "route"])
+    REQUESTS.observe(0.042, method="GET", route="api/me/")
+
+Recording is a dict update under a lock, cheap enough to leave on.
+
+Under gunicorn every worker has its own registry. Set METRICS_MULTIPROC_DIR
+to a directory shared by the workers (empty it before starting the server,
+as with prometheus_client): each process then writes a snapshot of its
+values there at most every METRICS_FLUSH_SECONDS and at exit, under an id
+unique to the process (pid plus a random suffix, so a reused pid never
+overwrites an earlier worker's file), and whichever worker serves /metrics
+adds up all snapshots. When a worker exits, gunicorn's child_exit hook
+(gunicorn.conf.py) calls `mark_process_dead()`, which folds its snapshots
+into one accumulated file, so counters do not go backwards when a worker
+is recycled and the directory does not grow with every recycle.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+MULTIPROC_DIR = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+FLUSH_SECONDS = getattr(settings, "METRICS_FLUSH_SECONDS", 5.0)
+# Snapshot that exited processes are folded into (mark_process_dead).
+DEAD_FILE = "metrics-dead.json"
+
+
+def _process_id():
+    return f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+
+
+class Registry:
+    def __init__(self, multiproc_dir=MULTIPROC_DIR, flush_seconds=FLUSH_SECONDS):
+        self.multiproc_dir = multiproc_dir
+        self.flush_seconds = flush_seconds
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self._recorded = False
+        self.process_id = _process_id()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name!r} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def reset(self):
+        """Zero every metric (tests; a forked child must not inherit its parent's values)."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+        self._flushed_at = time.monotonic()
+        self._recorded = False
+        self.process_id = _process_id()
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+    def _path(self):
+        return os.path.join(self.multiproc_dir, f"metrics-{self.process_id}.json")
+
+    def recorded(self):
+        """Called after every update; writes this process's snapshot when due."""
+        self._recorded = True
+        if self.multiproc_dir and time.monotonic() - self._flushed_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        # A process that never recorded anything (the gunicorn master) leaves no file.
+        if not self.multiproc_dir or not self._recorded:
+            return
+        self._flushed_at = time.monotonic()
+        _write_snapshot(self._path(), self.snapshot())
+
+    def collect(self):
+        """Snapshots to expose: this process's, plus every other process's file."""
+        snapshots = [self.snapshot()]
+        if self.multiproc_dir and os.path.isdir(self.multiproc_dir):
+            own = os.path.basename(self._path())
+            for name in sorted(os.listdir(self.multiproc_dir)):
+                if name == own or not name.startswith("metrics-") or not name.endswith(".json"):
+                    continue
+                snapshot = _read_snapshot(os.path.join(self.multiproc_dir, name))
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        merged = _merge(self.collect())
+        lines = []
+        for name in sorted(merged):
+            data = merged[name]
+            lines.append(f"# HELP {name} {_escape_help(data['help'])}")
+            lines.append(f"# TYPE {name} {data['kind']}")
+            for key in sorted(data["values"]):
+                labels = list(zip(data["labelnames"], key))
+                value = data["values"][key]
+                if data["kind"] == "counter":
+                    lines.append(f"{name}_total{_labels(labels)} {_number(value)}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip([*data["buckets"], "+Inf"], counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path, snapshot):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.partial"
+    with open(partial, "w", encoding="utf-8") as fh:
+        json.dump(snapshot, fh)
+    os.replace(partial, path)
+
+
+def _merge(snapshots):
+    """Sum snapshots into {name: metric data with values keyed by label tuple}."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            target = merged.setdefault(name, {**data, "values": {}})
+            for labels, value in data["values"]:
+                key = tuple(labels)
+                if key in target["values"]:
+                    target["values"][key] = _add(target["values"][key], value)
+                else:
+                    target["values"][key] = value
+    return merged
+
+
+def mark_process_dead(pid, multiproc_dir=MULTIPROC_DIR):
+    """
+    Fold the snapshots of exited process `pid` into DEAD_FILE and remove
+    them. Call it from the process manager once the process is gone
+    (gunicorn's child_exit hook), never concurrently with itself.
+    """
+    if not multiproc_dir or not os.path.isdir(multiproc_dir):
+        return
+    prefix = f"metrics-{pid}-"
+    paths = [
+        os.path.join(multiproc_dir, name)
+        for name in os.listdir(multiproc_dir)
+        if name.startswith(prefix) and name.endswith(".json")
+    ]
+    if not paths:
+        return
+    dead_path = os.path.join(multiproc_dir, DEAD_FILE)
+    snapshots = [_read_snapshot(path) for path in [dead_path, *paths]]
+    merged = _merge(snapshot for snapshot in snapshots if snapshot is not None)
+    for data in merged.values():
+        data["values"] = [[list(key), value] for key, value in data["values"].items()]
+    _write_snapshot(dead_path, merged)
+    for path in paths:
+        os.remove(path)
+
+
+def _add(left, right):
+    if isinstance(left, list):
+        counts = [a + b for a, b in zip(left[0], right[0])]
+        return [counts, left[1] + right[1]]
+    return left + right
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self._values = {}
+        self._lock = threading.Lock()
+        self.registry.register(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as exc:
+            raise ValueError(f"{self.name} is missing label {exc.args[0]!r}")
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+    def _snapshot_values(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def snapshot(self):
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": self._snapshot_values(),
+        }
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.registry.recorded()
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+        self.registry.recorded()
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def _snapshot_values(self):
+        with self._lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+    def snapshot(self):
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=REGISTRY.reset)
@@ -0,0 +1,141 @@
+"""
+Transactional outbox.
+
+Views call `enqueue()` inside the same transaction.atomic() block as the
+state change, so an event exists if and only if the change committed.
+`dispatch_batch()` (driven by `manage.py run_outbox`, which start.sh runs
+next to gunicorn) claims pending rows in a short transaction with
+SELECT ... FOR UPDATE SKIP LOCKED: a claim counts an attempt and leases
+the row for LEASE_SECONDS by moving available_at forward, so no lock is
+held while handlers run. Each handler then runs in its own transaction,
+which also marks the event done; failures are retried with exponential
+backoff. A worker that dies mid-event leaves the lease to expire and the
+event is picked up again.
+
+Handlers must be idempotent: an event runs again if its worker dies
+before the handler's transaction commits.
+"""
+
+import logging
+from datetime import timedelta
+from time import perf_counter
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import OutboxEvent
+
+logger = logging.getLogger("api.performance")
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+# Longer than any handler should run (a few Playwright renders).
+LEASE_SECONDS = 600
+
+_handlers = {}
+
+
+def handler(topic):
+    """Register `func(payload)` as the handler for `topic`."""
+
+    def register(func):
+        if topic in _handlers:
+            raise ValueError(f"Outbox handler for '{topic}' already registered")
+        _handlers[topic] = func
+        return func
+
+    return register
+
+
+def enqueue(topic, payload):
+    """
+    Record an event for `topic`.
+    MUST be called inside transaction.atomic()
+    """
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def _run(event, max_attempts):
+    func = _handlers.get(event.topic)
+    started = perf_counter()
+    try:
+        if func is None:
+            raise LookupError(f"No outbox handler registered for '{event.topic}'")
+        # The handler's writes and the DONE mark commit together.
+        with transaction.atomic():
+            func(event.payload)
+            OutboxEvent.objects.filter(pk=event.pk).update(
+                status="DONE",
+                last_error=None,
+                processed_at=timezone.now(),
+            )
+    except Exception as exc:
+        event.last_error = f"{type(exc).__name__}: {exc}"
+        if event.attempts >= max_attempts:
+            event.status = "FAILED"
+        else:
+            event.available_at = timezone.now() + _retry_delay(event.attempts)
+        OutboxEvent.objects.filter(pk=event.pk).update(
+            status=event.status,
+            last_error=event.last_error,
+            available_at=event.available_at,
+        )
+        logger.warning(
+            "outbox.dispatch topic=%s event_id=%s attempts=%s status=%s error=%s",
+            event.topic,
+            event.event_id,
+            event.attempts,
+            event.status,
+            event.last_error,
+        )
+        return False
+
+    logger.info(
+        "outbox.dispatch topic=%s event_id=%s duration_ms=%.2f",
+        event.topic,
+        event.event_id,
+        (perf_counter() - started) * 1000,
+    )
+    return True
+
+
+def claim(batch_size=50):
+    """
+    Lease up to `batch_size` due events to this worker and count the attempt.
+    Concurrent workers skip rows another worker has locked or leased.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = OutboxEvent.objects.filter(
+            status="PENDING",
+            available_at__lte=now,
+        ).order_by("event_id")
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        events = list(queryset[:batch_size])
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            attempts=F("attempts") + 1,
+            available_at=now + timedelta(seconds=LEASE_SECONDS),
+        )
+    for event in events:
+        event.attempts += 1
+    return events
+
+
+def dispatch_batch(batch_size=50, max_attempts=MAX_ATTEMPTS):
+    """
+    Claim up to `batch_size` due events and run their handlers, each in
+    its own transaction. Returns (succeeded, failed).
+    """
+    succeeded = failed = 0
+    for event in claim(batch_size):
+        if _run(event, max_attempts):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
@@ -11,8 +11,16 @@ import logging
 from glob import glob
 from time import perf_counter
 
+from core.services.metrics import Histogram
+
 logger = logging.getLogger(__name__)
 perf_logger = logging.getLogger("api.performance")
+ENGINE_SECONDS = Histogram(
+    "pdf_render_duration_seconds",
+    "Time spent in one PDF rendering engine call.",
+    ["engine"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
 
 
 def _discover_playwright_binaries() -> list[str]:
@@ -55,10 +63,12 @@ def _render_with_xhtml2pdf(html: str) -> bytes:
     pdf = pisa.pisaDocument(BytesIO(html.encode("utf-8")), result)
     if pdf.err:
         raise Exception("Error generating PDF with xhtml2pdf")
-    perf_logger.info(
+    duration = perf_counter() - started
+    ENGINE_SECONDS.observe(duration, engine="xhtml2pdf")
+    perf_logger.debug(
         "pdf.engine_timing engine=xhtml2pdf html_size=%s duration_ms=%.2f",
         len(html),
-        (perf_counter() - started) * 1000,
+        duration * 1000,
     )
     return result.getvalue()
 
@@ -133,12 +143,14 @@ def _render_with_playwright(html: str) -> bytes:
                 prefer_css_page_size=True,
             )
             pdf_ms = (perf_counter() - pdf_started) * 1000
-            perf_logger.info(
+            duration = perf_counter() - started
+            ENGINE_SECONDS.observe(duration, engine="playwright")
+            perf_logger.debug(
                 "pdf.engine_timing engine=playwright html_size=%s launch_ms=%.2f pdf_ms=%.2f total_ms=%.2f",
                 len(html),
                 launch_ms,
                 pdf_ms,
-                (perf_counter() - started) * 1000,
+                duration * 1000,
             )
             return pdf_bytes
         finally:
@@ -186,11 +198,13 @@ def _render_with_edge_cli(html: str) -> bytes:
 
         with open(pdf_path, "rb") as f:
             pdf_bytes = f.read()
-        perf_logger.info(
+        duration = perf_counter() - started
+        ENGINE_SECONDS.observe(duration, engine="edge-cli")
+        perf_logger.debug(
             "pdf.engine_timing engine=edge-cli html_size=%s cli_ms=%.2f total_ms=%.2f",
             len(html),
             render_ms,
-            (perf_counter() - started) * 1000,
+            duration * 1000,
         )
         return pdf_bytes
 
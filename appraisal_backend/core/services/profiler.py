@@ -0,0 +1,107 @@
+"""
+Statistical profiling of single API requests.
+
+While a profiled request runs, a StackSampler thread reads the request
+thread's Python stack every PROFILE_INTERVAL_SECONDS and tallies identical
+stacks. The result is saved in the collapsed-stack format understood by
+flamegraph.pl, speedscope and inferno ("frame;frame;frame count" per line)
+under PROFILE_DIR, with a RequestProfile row as its index entry.
+
+Requests are profiled when they carry a PROFILE_HEADER token issued to an
+admin (`issue_token`, served by api.views.profiling) or, at random, for a
+PROFILE_SAMPLE_RATE fraction of API traffic (api.middleware).
+"""
+
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from core.models import RequestProfile, User
+
+PROFILE_HEADER = "X-Profile-Token"
+TOKEN_SALT = "core.services.profiler"
+
+
+def issue_token(user):
+    """Signed token that makes requests carrying it profiled, for PROFILE_TOKEN_SECONDS."""
+    return signing.dumps({"uid": user.pk, "gen": user.token_generation}, salt=TOKEN_SALT)
+
+
+def token_user_id(token):
+    """
+    Admin id a token was issued to, or None when it is invalid or expired,
+    or its admin has since been deactivated, lost the ADMIN role or had
+    their tokens revoked (core.services.revocation). Checked on every use:
+    a token outlives the role change otherwise.
+    """
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=getattr(settings, "PROFILE_TOKEN_SECONDS", 3600))
+    except signing.BadSignature:
+        return None
+    generation = (
+        User.objects.filter(pk=data.get("uid"), is_active=True, role="ADMIN")
+        .values_list("token_generation", flat=True)
+        .first()
+    )
+    if generation is None or generation != data.get("gen"):
+        return None
+    return data["uid"]
+
+
+def _frame_name(frame):
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}".replace(";", ":")
+
+
+def collapse(frame):
+    """One stack, outermost frame first, joined with ';'."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Samples another thread's stack until stop() is called."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+            del frame
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def save_profile(sampler, directory=None, **fields):
+    """Write the sampler's stacks to a .folded file and index it; returns the RequestProfile."""
+    directory = directory or getattr(settings, "PROFILE_DIR", os.path.join(settings.BASE_DIR, "profiles"))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.folded")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(sampler.collapsed())
+    return RequestProfile.objects.create(samples=sampler.samples, file_path=path, **fields)
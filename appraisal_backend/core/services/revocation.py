@@ -0,0 +1,59 @@
+"""
+Token revocation.
+
+Access tokens (stateless JWT mode, settings.JWT_STATELESS):
+
+Every access token carries the user's `token_generation` as the "gen"
+claim. Bumping the generation (`revoke_tokens`) invalidates all tokens
+issued before, which is how logouts are forced without a per-request user
+lookup: the authenticator only compares the claim with
+`current_generation()`, a cache read. The cached value is written through
+on every bump and expires after JWT_GENERATION_CACHE_SECONDS, which bounds
+how long another process with its own local-memory cache can miss a bump;
+use a shared cache backend to make revocation immediate everywhere.
+
+Refresh tokens (rest_framework_simplejwt.token_blacklist):
+
+Refresh and logout check the blacklist table on every use, an indexed
+lookup by jti. A refresh token is only used once per rotation, so the
+check is not worth caching, and any cache would let a rotated token be
+replayed in a process that has not seen its blacklisting yet. Expired rows
+are removed by the purge_tokens command, which keeps the table small.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from core.models import User
+
+GENERATION_CACHE_SECONDS = getattr(settings, "JWT_GENERATION_CACHE_SECONDS", 60)
+
+
+def _cache_key(user_id):
+    return f"token-generation:{user_id}"
+
+
+def current_generation(user_id):
+    """The user's token generation, or None when the user no longer exists."""
+    key = _cache_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        generation = User.objects.filter(pk=user_id).values_list("token_generation", flat=True).first()
+        if generation is None:
+            return None
+        cache.set(key, generation, GENERATION_CACHE_SECONDS)
+    return generation
+
+
+def revoke_tokens(user):
+    """Invalidate every access token issued to `user` so far."""
+    User.objects.filter(pk=user.pk).update(token_generation=F("token_generation") + 1)
+    user.token_generation = User.objects.filter(pk=user.pk).values_list("token_generation", flat=True).get()
+    cache.set(_cache_key(user.pk), user.token_generation, GENERATION_CACHE_SECONDS)
+    return user.token_generation
+
+
+def forget_generation(user_id):
+    cache.delete(_cache_key(user_id))
+
@@ -0,0 +1,134 @@
+"""
+Who the caller is: role, department and profile ids, resolved once.
+
+`get_scope(request)` memoizes a UserScope on the request and keeps it in
+the Django cache for SCOPE_CACHE_SECONDS, so role checks and profile
+lookups cost nothing after the first request.
+
+The default cache is per process, so deleting an entry would only reach
+the worker that made the change. Instead the cache key carries the user's
+`scope_version`, a column loaded with the user on every request:
+`invalidate_scope()` gives it a new value, and every process misses its
+old entry on the user's next request. The receivers in core.signals and
+the core.admin hooks call it whenever a User, profile or Department.hod
+change could alter the scope; the TTL bounds staleness for writes that
+bypass both (queryset.update()).
+
+`hod_department_id` is not cached: it decides which department an HOD may
+act on, and the default cache is per process, so an invalidation would
+reach only the worker that handled the reassignment. It is looked up once
+per request instead.
+"""
+
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.models import Department, FacultyProfile, HODProfile, PrincipalProfile, User
+
+SCOPE_CACHE_SECONDS = getattr(settings, "SCOPE_CACHE_SECONDS", 60)
+
+_FIELDS = (
+    "user_id",
+    "role",
+    "faculty_profile_id",
+    "faculty_department_id",
+    "hod_profile_id",
+    "hod_department_id",
+    "principal_profile_id",
+)
+
+
+class UserScope:
+    """
+    `faculty_department_id` is the department of the user's faculty profile;
+    `hod_department_id` is the department an HOD heads (None otherwise).
+    """
+
+    __slots__ = _FIELDS
+
+    def __init__(self, **values):
+        for field in _FIELDS:
+            setattr(self, field, values.get(field))
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in _FIELDS}
+
+    def __repr__(self):
+        return f"UserScope({self.as_dict()})"
+
+
+def _cache_key(user_id, version):
+    return f"user-scope:{user_id}:{version}"
+
+
+def _hod_department_id(user):
+    department_id = Department.objects.filter(hod=user).values_list("pk", flat=True).first()
+    if department_id:
+        return department_id
+
+    # Legacy records only link the HOD through HODProfile; repair
+    # Department.hod so later lookups take the fast path.
+    hod_profile = HODProfile.objects.select_related("department").filter(user=user).first()
+    if not hod_profile or not hod_profile.department_id:
+        return None
+    if hod_profile.department.hod_id != user.id:
+        hod_profile.department.hod = user
+        hod_profile.department.save(update_fields=["hod"])
+    return hod_profile.department_id
+
+
+def _compute(user):
+    values = {"user_id": user.pk, "role": user.role}
+
+    faculty = FacultyProfile.objects.filter(user=user).values_list("pk", "department_id").first()
+    if faculty:
+        values["faculty_profile_id"], values["faculty_department_id"] = faculty
+
+    if user.role == "HOD":
+        values["hod_profile_id"] = HODProfile.objects.filter(user=user).values_list("pk", flat=True).first()
+    elif user.role == "PRINCIPAL":
+        values["principal_profile_id"] = (
+            PrincipalProfile.objects.filter(user=user).values_list("pk", flat=True).first()
+        )
+    return values
+
+
+def scope_for_user(user):
+    """The UserScope of `user`; everything but hod_department_id comes from the cache."""
+    key = _cache_key(user.pk, user.scope_version)
+    values = cache.get(key)
+    # A role change invalidates too, but never trust a mismatching entry.
+    if values is None or values.get("role") != user.role:
+        values = _compute(user)
+        cache.set(key, values, SCOPE_CACHE_SECONDS)
+    if user.role == "HOD":
+        values = {**values, "hod_department_id": _hod_department_id(user)}
+    return UserScope(**values)
+
+
+def get_scope(request):
+    """UserScope of the authenticated caller, computed at most once per request."""
+    scope = getattr(request, "_user_scope", None)
+    if scope is None or scope.user_id != request.user.pk:
+        scope = scope_for_user(request.user)
+        request._user_scope = scope
+    return scope
+
+
+def invalidate_scope(*user_ids):
+    """
+    Give the users a new scope version so no process uses its cached scope
+    again. The version is random rather than incremented: a stale instance
+    saved later writes its old version back, which must not revive an entry
+    cached under a version that came after it.
+    """
+    user_ids = [user_id for user_id in user_ids if user_id]
+    if not user_ids:
+        return
+    current = User.objects.filter(pk__in=user_ids).values_list("pk", "scope_version")
+    # Instances this process still holds carry the old version.
+    cache.delete_many([_cache_key(user_id, version) for user_id, version in current])
+    for user_id in user_ids:
+        User.objects.filter(pk=user_id).update(scope_version=random.randint(1, 2**31 - 1))
@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import HODProfile, Department
+from .models import Appraisal, Department, FacultyProfile, HODProfile, PrincipalProfile, TokenUser, User
+from .services.revocation import forget_generation, revoke_tokens
+from .services.scope import invalidate_scope
+from workflow.counters import appraisal_key
+from workflow.projections import record_writes
 
 
 @receiver(post_save, sender=HODProfile)
@@ -10,3 +15,102 @@ def sync_hod_to_department(sender, instance, created, **kwargs):
     if department.hod != instance.user:
         department.hod = instance.user
         department.save()
+
+
+@receiver(post_save, sender=FacultyProfile)
+def sync_appraisal_department(sender, instance, created, **kwargs):
+    # Appraisal.department is a denormalized copy used by the HOD queues.
+    if created:
+        return
+    moved = list(
+        Appraisal.objects.filter(faculty=instance)
+        .exclude(department_id=instance.department_id)
+        .defer("appraisal_data")
+    )
+    if not moved:
+        return
+    # update() skips Appraisal.save(): bump the version by hand so stale
+    # editors get a conflict, and refresh the read models like a save would.
+    Appraisal.objects.filter(pk__in=[appraisal.pk for appraisal in moved]).update(
+        department_id=instance.department_id, version=F("version") + 1
+    )
+    writes = []
+    for appraisal in moved:
+        writes.append((appraisal, appraisal_key(appraisal)))
+        appraisal.department_id = instance.department_id
+        appraisal.version += 1
+    record_writes(writes)
+
+
+# Signals are sent with the instance's own class, so saves through the
+# TokenUser proxy (stateless JWT mode) need their own registrations.
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=TokenUser)
+@receiver(post_delete, sender=TokenUser)
+def invalidate_user_scope(sender, instance, created=False, update_fields=None, **kwargs):
+    # Nothing is cached for a new user, and of the user's own columns only
+    # the role is part of the scope.
+    if created or (update_fields is not None and "role" not in update_fields):
+        return
+    invalidate_scope(instance.pk)
+
+
+# Changes that must end existing sessions in stateless JWT mode, where the
+# token claims (role, password-change state) and the user being active are
+# trusted without a lookup.
+TOKEN_REVOKING_FIELDS = ("password", "role", "is_active", "must_change_password")
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=TokenUser)
+def remember_token_fields(sender, instance, update_fields=None, **kwargs):
+    instance._previous_token_fields = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(TOKEN_REVOKING_FIELDS):
+        return
+    instance._previous_token_fields = (
+        sender.objects.filter(pk=instance.pk).values_list(*TOKEN_REVOKING_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=TokenUser)
+def revoke_tokens_on_security_change(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_token_fields", None)
+    if created or previous is None:
+        return
+    if previous != tuple(getattr(instance, field) for field in TOKEN_REVOKING_FIELDS):
+        revoke_tokens(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=TokenUser)
+def forget_deleted_user_generation(sender, instance, **kwargs):
+    forget_generation(instance.pk)
+
+
+@receiver(post_save, sender=FacultyProfile)
+@receiver(post_delete, sender=FacultyProfile)
+@receiver(post_save, sender=HODProfile)
+@receiver(post_delete, sender=HODProfile)
+@receiver(post_save, sender=PrincipalProfile)
+@receiver(post_delete, sender=PrincipalProfile)
+def invalidate_profile_scope(sender, instance, **kwargs):
+    invalidate_scope(instance.user_id)
+
+
+@receiver(pre_save, sender=Department)
+def remember_department_hod(sender, instance, **kwargs):
+    instance._previous_hod_id = (
+        Department.objects.filter(pk=instance.pk).values_list("hod_id", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def invalidate_department_scope(sender, instance, **kwargs):
+    invalidate_scope(instance.hod_id, getattr(instance, "_previous_hod_id", None))
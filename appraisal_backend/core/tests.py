@@ -1,3 +1,373 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from itertools import islice
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Appraisal, AuditLog, Department, FacultyProfile, OutboxEvent, User
+from core.services import audit_archive, outbox
+from core.services.audit_archive import archived_months, iter_audit_logs
+from core.services.audit_writer import AuditWriter
+from core.services.metrics import REGISTRY, Counter, Histogram, Registry, mark_process_dead
+from core.utils.audit import log_action
+
+
+def _make_faculty(username="faculty@example.com", department=None):
+    user = User.objects.create_user(
+        username=username,
+        password="pass1234",
+        role="FACULTY",
+        department=department,
+        full_name="Test Faculty",
+    )
+    return FacultyProfile.objects.create(
+        user=user,
+        department=department,
+        full_name="Test Faculty",
+        designation="Assistant Professor",
+    )
+
+
+class ImportAppraisalsCommandTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(department_name="Computer")
+        self.faculty = _make_faculty(department=self.department)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "appraisals.jsonl")
+
+    def _write(self, lines):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+
+    def _draft(self, **overrides):
+        record = {
+            "username": self.faculty.user.username,
+            "academic_year": "2023-24",
+            "semester": "Odd",
+            "form_type": "SPPU",
+            "appraisal_data": {"submit_action": "draft", "general": {}},
+        }
+        record.update(overrides)
+        return json.dumps(record)
+
+    def test_imports_valid_rows_and_reports_errors(self):
+        self._write([
+            self._draft(),
+            "{not json",
+            self._draft(username="nobody@example.com"),
+            self._draft(form_type="UNKNOWN"),
+        ])
+
+        call_command("import_appraisals", self.path, workers=1, batch_size=2, stdout=StringIO())
+
+        appraisal = Appraisal.objects.get()
+        self.assertEqual(appraisal.faculty, self.faculty)
+        self.assertEqual(appraisal.status, "DRAFT")
+
+        with open(f"{self.path}.errors.jsonl", encoding="utf-8") as fh:
+            errors = [json.loads(line) for line in fh]
+        self.assertEqual([e["line"] for e in errors], [2, 3, 4])
+
+    def test_resumes_from_checkpoint(self):
+        self._write([self._draft(), self._draft(semester="Even")])
+        call_command("import_appraisals", self.path, workers=1, batch_size=1, stdout=StringIO())
+        self.assertEqual(Appraisal.objects.count(), 2)
+
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(self._draft(academic_year="2024-25") + "\n")
+        call_command("import_appraisals", self.path, workers=1, stdout=StringIO())
+
+        self.assertEqual(Appraisal.objects.count(), 3)
+        with open(f"{self.path}.checkpoint", encoding="utf-8") as fh:
+            self.assertEqual(json.load(fh)["line"], 3)
+
+
+class OutboxDispatchTests(TestCase):
+    def test_dispatches_and_retries_with_backoff(self):
+        calls = []
+
+        def flaky(payload):
+            calls.append(payload["n"])
+            if payload["n"] == 2:
+                raise RuntimeError("boom")
+
+        with mock.patch.dict(outbox._handlers, {"test.event": flaky}):
+            ok = outbox.enqueue("test.event", {"n": 1})
+            bad = outbox.enqueue("test.event", {"n": 2})
+            self.assertEqual(outbox.dispatch_batch(), (1, 1))
+            # The failed event is not due again until its backoff expires.
+            self.assertEqual(outbox.dispatch_batch(), (0, 0))
+
+        self.assertEqual(calls, [1, 2])
+        ok.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertEqual(ok.status, "DONE")
+        self.assertEqual((bad.status, bad.attempts), ("PENDING", 1))
+        self.assertIn("boom", bad.last_error)
+        self.assertGreater(bad.available_at, bad.created_at)
+
+    def test_claimed_events_are_leased_until_the_worker_finishes(self):
+        event = outbox.enqueue("test.event", {"n": 1})
+        self.assertEqual([claimed.pk for claimed in outbox.claim()], [event.pk])
+        # Another worker skips the leased row while its handler runs.
+        self.assertEqual(outbox.claim(), [])
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ("PENDING", 1))
+
+        # The first worker died: the event is claimed again once the lease expires.
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+        with mock.patch.dict(outbox._handlers, {"test.event": lambda payload: None}):
+            self.assertEqual(outbox.dispatch_batch(), (1, 0))
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ("DONE", 2))
+
+    def test_gives_up_after_max_attempts(self):
+        event = outbox.enqueue("test.unregistered", {})
+
+        call_command("run_outbox", once=True, max_attempts=1, stdout=StringIO())
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, "FAILED")
+        self.assertIn("No outbox handler", event.last_error)
+        self.assertFalse(OutboxEvent.objects.filter(status="PENDING").exists())
+
+
+class AppraisalDepartmentTests(TestCase):
+    def test_department_copied_on_create_and_follows_transfers(self):
+        computer = Department.objects.create(department_name="Computer")
+        civil = Department.objects.create(department_name="Civil")
+        faculty = _make_faculty(department=computer)
+        appraisal = Appraisal.objects.create(
+            faculty=faculty,
+            form_type="SPPU",
+            academic_year="2024-25",
+            semester="Odd",
+            appraisal_data={},
+        )
+        self.assertEqual(appraisal.department, computer)
+
+        faculty.department = civil
+        faculty.save()
+
+        appraisal.refresh_from_db()
+        self.assertEqual(appraisal.department, civil)
+
+
+class ExportAppraisalsCommandTests(TestCase):
+    def test_writes_csv_to_stdout(self):
+        faculty = _make_faculty(department=Department.objects.create(department_name="Computer"))
+        appraisal = Appraisal.objects.create(
+            faculty=faculty, form_type="SPPU", academic_year="2024-25", semester="Odd", appraisal_data={}
+        )
+
+        out = StringIO()
+        call_command("export_appraisals", columns="appraisal_id,status,total_score", stdout=out)
+
+        self.assertEqual(out.getvalue().splitlines(), ["Appraisal ID,Status,Total", f"{appraisal.pk},DRAFT,"])
+
+
+class AuditWriterTests(TestCase):
+    def setUp(self):
+        self.fallback = os.path.join(tempfile.mkdtemp(), "audit.jsonl")
+        self.writer = AuditWriter(max_entries=2, max_delay=0, fallback_path=self.fallback)
+        self.request = RequestFactory().post("/api/faculty/submit/", HTTP_USER_AGENT="tests")
+        self.request.user = _make_faculty().user
+
+    def _log(self, entity_id):
+        log_action(request=self.request, action="SUBMIT_APPRAISAL", entity="Appraisal", entity_id=entity_id)
+
+    def test_entries_are_written_in_batches_after_commit_and_are_immutable(self):
+        with mock.patch("core.utils.audit.audit_writer", self.writer):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._log(1)
+            self.assertEqual(len(self.writer), 1)
+            self.assertFalse(AuditLog.objects.exists())
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self._log(2)
+        self.assertEqual(sorted(AuditLog.objects.values_list("entity_id", flat=True)), [1, 2])
+
+        entry = AuditLog.objects.first()
+        with self.assertRaises(RuntimeError):
+            entry.save()
+        with self.assertRaises(RuntimeError):
+            AuditLog.objects.filter(pk=entry.pk).update(action="EDITED")
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("UPDATE audit_logs SET action = 'EDITED'")
+
+    def test_failed_flush_spills_to_fallback_file_for_replay(self):
+        with mock.patch("core.utils.audit.audit_writer", self.writer):
+            with mock.patch.object(AuditLog.objects, "bulk_create", side_effect=OperationalError("down")):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self._log(1)
+                    self._log(2)
+        self.assertFalse(AuditLog.objects.exists())
+        with open(self.fallback, encoding="utf-8") as fh:
+            self.assertEqual(len(fh.readlines()), 2)
+
+        out = StringIO()
+        call_command("replay_audit_fallback", "--path", self.fallback, stdout=out)
+        self.assertIn("replayed=2", out.getvalue())
+        self.assertEqual(AuditLog.objects.filter(user_id_snapshot=self.request.user.pk).count(), 2)
+        self.assertFalse(os.path.exists(self.fallback))
+
+
+class AuditArchiveTests(TestCase):
+    def _entry(self, logged_at, entity_id):
+        return AuditLog(
+            username_snapshot="hod@example.com",
+            role_snapshot="HOD",
+            action="HOD_APPROVE",
+            entity="Appraisal",
+            entity_id=entity_id,
+            logged_at=logged_at,
+        )
+
+    def test_old_months_move_to_archives_and_stay_queryable(self):
+        directory = tempfile.mkdtemp()
+        now = timezone.now()
+        AuditLog.objects.bulk_create([
+            self._entry(now - timedelta(days=400), 1),
+            self._entry(now - timedelta(days=399), 2),
+            self._entry(now, 1),
+        ])
+
+        out = StringIO()
+        call_command("archive_audit_logs", "--keep-months", "6", "--dir", directory, stdout=out)
+        self.assertIn("rows=2", out.getvalue())
+        self.assertEqual(AuditLog.objects.count(), 1)
+        self.assertEqual(len(archived_months(directory)), 1)
+
+        history = list(iter_audit_logs(directory=directory, entity="Appraisal", entity_id=1))
+        self.assertEqual([entry.logged_at for entry in history], [now, now - timedelta(days=400)])
+        with self.assertRaises(RuntimeError):
+            history[1].save()
+        # Deletes are blocked again once the archive step is done.
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM audit_logs")
+
+
+    def test_failed_drop_leaves_no_archive_and_a_rerun_finishes(self):
+        directory = tempfile.mkdtemp()
+        month = audit_archive.month_start(timezone.now() - timedelta(days=400))
+        AuditLog.objects.bulk_create([self._entry(month + timedelta(days=1), 1), self._entry(month + timedelta(days=2), 2)])
+
+        with mock.patch.object(audit_archive, "_drop_month", side_effect=OperationalError("down")):
+            with self.assertRaises(OperationalError):
+                audit_archive.archive_month(month, directory)
+        self.assertEqual(os.listdir(directory), [])
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+        self.assertEqual(audit_archive.archive_month(month, directory), 2)
+        self.assertEqual(AuditLog.objects.count(), 0)
+
+    def test_archive_left_by_an_interrupted_run_is_accepted_when_complete(self):
+        directory = tempfile.mkdtemp()
+        month = audit_archive.month_start(timezone.now() - timedelta(days=400))
+        AuditLog.objects.bulk_create([self._entry(month + timedelta(days=1), 1), self._entry(month + timedelta(days=2), 2)])
+        # The archive was renamed into place but the drop never committed.
+        with mock.patch.object(audit_archive, "_drop_month"):
+            audit_archive.archive_month(month, directory)
+
+        AuditLog.objects.bulk_create([self._entry(month + timedelta(days=3), 3)])
+        with self.assertRaises(FileExistsError):
+            audit_archive.archive_month(month, directory)
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER IF EXISTS audit_logs_no_delete")
+            cursor.execute("DELETE FROM audit_logs WHERE entity_id = 3")
+
+        self.assertEqual(audit_archive.archive_month(month, directory), 2)
+        self.assertEqual(AuditLog.objects.count(), 0)
+
+    def test_archived_pages_read_only_the_blocks_they_need(self):
+        directory = tempfile.mkdtemp()
+        month = audit_archive.month_start(timezone.now() - timedelta(days=400))
+        AuditLog.objects.bulk_create([self._entry(month + timedelta(hours=hour), hour % 3) for hour in range(9)])
+        with mock.patch.object(audit_archive, "BLOCK_ROWS", 2):
+            audit_archive.archive_month(month, directory)
+
+        with mock.patch.object(audit_archive, "_read_block", wraps=audit_archive._read_block) as read_block:
+            newest = list(islice(iter_audit_logs(directory=directory), 3))
+            self.assertEqual([entry.logged_at for entry in newest], [month + timedelta(hours=hour) for hour in (8, 7, 6)])
+            self.assertEqual(read_block.call_count, 2)
+
+            read_block.reset_mock()
+            history = list(iter_audit_logs(directory=directory, entity="Appraisal", entity_id=1))
+            self.assertEqual([entry.logged_at for entry in history], [month + timedelta(hours=hour) for hour in (7, 4, 1)])
+            # Hours 1, 4 and 7 sit in three of the five blocks.
+            self.assertEqual(read_block.call_count, 3)
+
+
+class MetricsTests(TestCase):
+    def test_render_merges_process_snapshots(self):
+        directory = tempfile.mkdtemp()
+        worker = Registry(multiproc_dir=directory, flush_seconds=0)
+        Counter("jobs", "Jobs run.", ["kind"], registry=worker).inc(kind="pdf")
+        Histogram("job_seconds", "Job time.", buckets=(1, 5), registry=worker).observe(2)
+
+        scraper = Registry(multiproc_dir=directory)
+        Counter("jobs", "Jobs run.", ["kind"], registry=scraper).inc(2, kind="pdf")
+        Histogram("job_seconds", "Job time.", buckets=(1, 5), registry=scraper).observe(0.5)
+
+        text = scraper.render()
+        self.assertIn("# TYPE jobs counter", text)
+        self.assertIn('jobs_total{kind="pdf"} 3', text)
+        self.assertIn('job_seconds_bucket{le="1"} 1', text)
+        self.assertIn('job_seconds_bucket{le="5"} 2', text)
+        self.assertIn('job_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn("job_seconds_sum 2.5", text)
+        self.assertIn("job_seconds_count 2", text)
+
+    def test_exited_workers_are_folded_into_one_snapshot(self):
+        directory = tempfile.mkdtemp()
+        # Two workers that got the same pid, one after the other.
+        for amount in (1, 2):
+            with mock.patch("os.getpid", return_value=4242):
+                worker = Registry(multiproc_dir=directory, flush_seconds=0)
+            Counter("jobs", "Jobs run.", ["kind"], registry=worker).inc(amount, kind="pdf")
+        self.assertEqual(len(os.listdir(directory)), 2)
+
+        mark_process_dead(4242, directory)
+        self.assertEqual(os.listdir(directory), ["metrics-dead.json"])
+        later = Registry(multiproc_dir=directory, flush_seconds=0)
+        Counter("jobs", "Jobs run.", ["kind"], registry=later).inc(kind="pdf")
+        mark_process_dead(later.process_id.split("-")[0], directory)
+
+        scraper = Registry(multiproc_dir=directory)
+        Counter("jobs", "Jobs run.", ["kind"], registry=scraper)
+        self.assertIn('jobs_total{kind="pdf"} 4', scraper.render())
+
+    def test_labels_must_match(self):
+        counter = Counter("labelled", "Labelled.", ["kind"], registry=Registry())
+        with self.assertRaises(ValueError):
+            counter.inc(other="x")
+
+    def test_endpoint_exposes_request_timings(self):
+        REGISTRY.reset()
+        self.client.get("/api/me/")
+        with override_settings(METRICS_TOKEN="scrape-secret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="api/me/",status="401"} 1',
+            response.content.decode(),
+        )
+
+    def test_endpoint_requires_a_token_unless_debugging(self):
+        with override_settings(METRICS_TOKEN="", DEBUG=False):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with override_settings(METRICS_TOKEN="", DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
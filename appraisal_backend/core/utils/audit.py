@@ -1,6 +1,8 @@
 from django.db import transaction
+from django.utils import timezone
+
 from core.models import AuditLog
-from django.db import transaction
+from core.services.audit_writer import audit_writer
 
 
 def get_client_ip(request):
@@ -10,7 +12,7 @@ def get_client_ip(request):
     return request.META.get("REMOTE_ADDR")
 
 
-def log_action(
+def build_audit_log(
     *,
     request,
     action,
@@ -20,12 +22,12 @@ def log_action(
     new_value=None,
 ):
     """
-    MUST be called inside transaction.atomic()
+    Build an unsaved AuditLog row for the current request.
     """
 
     user = request.user if request.user.is_authenticated else None
 
-    AuditLog.objects.create(
+    return AuditLog(
         user_id_snapshot=user.id if user else None,
         username_snapshot=user.username if user else "SYSTEM",
         role_snapshot=getattr(user, "role", "UNKNOWN"),
@@ -36,4 +38,40 @@ def log_action(
         new_value=new_value,
         ip_address=get_client_ip(request),
         user_agent=request.META.get("HTTP_USER_AGENT"),
-    )
\ No newline at end of file
+        logged_at=timezone.now(),
+    )
+
+
+def log_action(
+    *,
+    request,
+    action,
+    entity,
+    entity_id,
+    old_value=None,
+    new_value=None,
+):
+    """
+    Queue one AuditLog row; it is written (in a batch) only if the current
+    transaction commits.
+    """
+
+    log_actions([
+        build_audit_log(
+            request=request,
+            action=action,
+            entity=entity,
+            entity_id=entity_id,
+            old_value=old_value,
+            new_value=new_value,
+        )
+    ])
+
+
+def log_actions(entries):
+    """
+    Queue several AuditLog rows (from build_audit_log); they are written
+    only if the current transaction commits.
+    """
+    if entries:
+        transaction.on_commit(lambda: audit_writer.add(entries))
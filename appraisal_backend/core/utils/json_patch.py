@@ -0,0 +1,158 @@
+"""
+Minimal RFC 6902 (JSON Patch) implementation over plain dict/list data.
+
+`apply_patch(document, operations)` returns a patched copy plus the set of
+top-level keys the operations touched. Only those top-level sections are
+copied; untouched sections are shared with the input.
+"""
+
+import copy
+
+OPERATIONS = ("add", "remove", "replace", "move", "copy", "test")
+
+_MISSING = object()
+
+
+class JSONPatchError(ValueError):
+    pass
+
+
+def parse_pointer(pointer):
+    """RFC 6901 pointer -> list of unescaped reference tokens."""
+    if not isinstance(pointer, str):
+        raise JSONPatchError("path must be a string")
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JSONPatchError(f"Invalid JSON pointer {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _index(container, token, *, for_add=False):
+    if token == "-" and for_add:
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise JSONPatchError(f"Invalid array index {token!r}")
+    index = int(token)
+    limit = len(container) if for_add else len(container) - 1
+    if index > limit:
+        raise JSONPatchError(f"Array index {index} out of range")
+    return index
+
+
+def _resolve(document, tokens):
+    for token in tokens:
+        if isinstance(document, dict):
+            if token not in document:
+                raise JSONPatchError(f"Path segment {token!r} does not exist")
+            document = document[token]
+        elif isinstance(document, list):
+            document = document[_index(document, token)]
+        else:
+            raise JSONPatchError(f"Cannot descend into a scalar at {token!r}")
+    return document
+
+
+def _add(document, tokens, value):
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, key, for_add=True), value)
+    else:
+        raise JSONPatchError("Cannot add to a scalar")
+    return document
+
+
+def _remove(document, tokens):
+    if not tokens:
+        raise JSONPatchError("Cannot remove the whole document")
+    parent = _resolve(document, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise JSONPatchError(f"Path segment {key!r} does not exist")
+        return parent.pop(key)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, key))
+    raise JSONPatchError("Cannot remove from a scalar")
+
+
+def _field(operation, name):
+    value = operation.get(name, _MISSING)
+    if value is _MISSING:
+        raise JSONPatchError(f"'{operation.get('op')}' operation requires '{name}'")
+    return value
+
+
+def apply_patch(document, operations):
+    """
+    Apply `operations` atomically: either every operation succeeds and the
+    patched copy is returned, or JSONPatchError is raised and `document`
+    is left unchanged. Returns (patched, touched_top_level_keys).
+    """
+    if not isinstance(operations, list):
+        raise JSONPatchError("Patch must be a list of operations")
+    if not isinstance(document, dict):
+        raise JSONPatchError("Document must be a JSON object")
+
+    patched = dict(document)
+    copied = set()
+    touched = set()
+
+    def writable(tokens):
+        # Copy a top-level section the first time an operation writes into it.
+        if tokens:
+            section = tokens[0]
+            touched.add(section)
+            if section not in copied:
+                copied.add(section)
+                if section in patched:
+                    patched[section] = copy.deepcopy(patched[section])
+
+    for position, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise JSONPatchError(f"Operation {position} must be an object")
+        op = operation.get("op")
+        if op not in OPERATIONS:
+            raise JSONPatchError(f"Operation {position}: unknown op {op!r}")
+
+        try:
+            path = parse_pointer(_field(operation, "path"))
+            if not path and op != "test":
+                raise JSONPatchError("Operations on the whole document are not supported")
+
+            if op == "test":
+                if _resolve(patched, path) != _field(operation, "value"):
+                    raise JSONPatchError(f"Test failed at {operation['path']}")
+                continue
+
+            if op in ("move", "copy"):
+                source = parse_pointer(_field(operation, "from"))
+                if op == "move" and path[:len(source)] == source and path != source:
+                    raise JSONPatchError("Cannot move a value into one of its children")
+                if op == "move":
+                    writable(source)
+                    value = _remove(patched, source)
+                else:
+                    value = copy.deepcopy(_resolve(patched, source))
+                writable(path)
+                _add(patched, path, value)
+                continue
+
+            writable(path)
+            if op == "add":
+                _add(patched, path, copy.deepcopy(_field(operation, "value")))
+            elif op == "remove":
+                _remove(patched, path)
+            else:  # replace
+                value = copy.deepcopy(_field(operation, "value"))
+                _remove(patched, path)
+                _add(patched, path, value)
+        except JSONPatchError as exc:
+            raise JSONPatchError(f"Operation {position} ({op}): {exc}")
+
+    return patched, touched
@@ -0,0 +1,26 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from core.services.metrics import REGISTRY
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. The scraper must send settings.METRICS_TOKEN
+    as `Authorization: Bearer <token>`. Without a token the endpoint is only
+    served with DEBUG on; metrics name every route and their traffic.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token and not settings.DEBUG:
+        return HttpResponse("Forbidden: METRICS_TOKEN is not set\n", status=403, content_type="text/plain")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponse("Forbidden\n", status=403, content_type="text/plain")
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -69,5 +69,5 @@ else:
     print('Admin bootstrap skipped')
 "
 
-echo "Starting Gunicorn..."
-exec gunicorn appraisal_backend.wsgi:application --bind 0.0.0.0:8000
+echo "Starting Gunicorn, the outbox worker and the draft flusher..."
+exec bash /app/start.sh
@@ -0,0 +1,17 @@
+"""
+Gunicorn server hooks; the server options are the flags in start.sh and
+start_events.sh.
+"""
+
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "appraisal_backend.settings")
+
+
+def child_exit(server, worker):
+    # Runs in the master once a worker is gone (recycled by --max-requests,
+    # killed on timeout): fold its metrics snapshot into the accumulated one.
+    if os.getenv("METRICS_MULTIPROC_DIR"):
+        from core.services.metrics import mark_process_dead
+
+        mark_process_dead(worker.pid)
@@ -0,0 +1,47 @@
+#!/usr/bin/env bash
+# Web process plus the outbox worker (`manage.py run_outbox`), which renders
+# the final PDFs and runs the other deferred workflow side effects. The
+# worker writes into MEDIA_ROOT, which gunicorn serves, so both run in the
+# same service. Set RUN_OUTBOX_WORKER=False where a separate worker with a
+# shared MEDIA_ROOT is deployed instead.
+#
+# The draft flusher (`manage.py flush_draft_buffers`) writes autosaves that
+# have sat idle for DRAFT_BUFFER_IDLE_SECONDS into their appraisals, so a
+# draft is persisted even when its author autosaves and leaves. Set
+# RUN_DRAFT_FLUSHER=False where it runs elsewhere (e.g. a cron job).
+set -o errexit
+
+# Worker metrics snapshots from a previous run would be summed into this one.
+if [ -n "${METRICS_MULTIPROC_DIR:-}" ]; then
+  rm -f "${METRICS_MULTIPROC_DIR:?}"/metrics-*.json
+fi
+
+if [ "${RUN_OUTBOX_WORKER:-True}" = "True" ]; then
+  (
+    while true; do
+      python manage.py run_outbox || echo "run_outbox exited with status $?; restarting"
+      sleep 5
+    done
+  ) &
+fi
+
+if [ "${RUN_DRAFT_FLUSHER:-True}" = "True" ]; then
+  (
+    while true; do
+      python manage.py flush_draft_buffers || echo "flush_draft_buffers exited with status $?; restarting"
+      sleep 5
+    done
+  ) &
+fi
+
+# The live event stream (/api/events/) is served by start_events.sh.
+exec gunicorn appraisal_backend.wsgi:application \
+  --config gunicorn.conf.py \
+  --bind 0.0.0.0:${PORT:-8000} \
+  --workers ${WEB_CONCURRENCY:-4} \
+  --threads ${GUNICORN_THREADS:-4} \
+  --worker-class gthread \
+  --max-requests ${GUNICORN_MAX_REQUESTS:-1000} \
+  --max-requests-jitter ${GUNICORN_MAX_REQUESTS_JITTER:-100} \
+  --keep-alive ${GUNICORN_KEEPALIVE:-5} \
+  --timeout ${GUNICORN_TIMEOUT:-120}
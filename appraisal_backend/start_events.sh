@@ -0,0 +1,17 @@
+#!/usr/bin/env bash
+# Live workflow event stream (/api/events/, api.views.events), served apart
+# from the WSGI API in start.sh: an idle stream is a suspended coroutine on
+# the uvicorn event loop, and events_application answers 404 for every
+# other path. Events reach it from the API processes over Postgres
+# LISTEN/NOTIFY, so run both with EVENTS_BACKEND=postgres and the same
+# DJANGO_SECRET_KEY (stream tickets are signed by the API).
+set -o errexit
+
+# No --max-requests: recycling a worker would cut every open stream.
+exec gunicorn appraisal_backend.asgi:events_application \
+  --config gunicorn.conf.py \
+  --bind 0.0.0.0:${PORT:-8001} \
+  --workers ${EVENTS_WORKERS:-1} \
+  --worker-class uvicorn.workers.UvicornWorker \
+  --keep-alive ${GUNICORN_KEEPALIVE:-5} \
+  --timeout ${GUNICORN_TIMEOUT:-120}
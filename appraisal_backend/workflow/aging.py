@@ -0,0 +1,120 @@
+"""
+Time-in-state reporting on top of the append-only StateTransition log.
+
+`oldest_in_state()` answers "what has been stuck longest in X" from the
+current rows only: each row's exited_at is set when the appraisal's next
+row is logged, and a partial index on (to_state, entered_at) WHERE
+exited_at IS NULL holds just the appraisals still in a state, so the query
+does not grow with history. `rollup_day()` stores p50/p95 dwell times
+for the states that were left on a given day (manage.py rollup_dwell).
+"""
+
+import math
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import Lead
+from django.utils import timezone
+
+from core.models import DwellRollup, StateTransition
+
+
+def build_transition(appraisal, from_state):
+    """Unsaved StateTransition for `appraisal` entering its current status."""
+    return StateTransition(
+        appraisal_id=appraisal.appraisal_id,
+        department_id=appraisal.department_id,
+        from_state=from_state,
+        to_state=appraisal.status,
+        entered_at=appraisal.updated_at or timezone.now(),
+    )
+
+
+def log_transitions(entries):
+    """Close each appraisal's current row at the new row's entered_at, then append the new rows."""
+    if not entries:
+        return
+    by_time = defaultdict(list)
+    for entry in entries:
+        by_time[entry.entered_at].append(entry.appraisal_id)
+    for entered_at, appraisal_ids in by_time.items():
+        StateTransition.objects.filter(appraisal_id__in=appraisal_ids, exited_at__isnull=True).update(
+            exited_at=entered_at
+        )
+    StateTransition.objects.bulk_create(entries)
+
+
+def oldest_in_state(state, *, limit, after=None, department_id=None):
+    """
+    Appraisals currently in `state`, longest-waiting first.
+    `after` is the (entered_at, transition_id) of the last row already seen.
+    Returns up to `limit` StateTransition rows with `appraisal` loaded.
+    """
+    queryset = (
+        StateTransition.objects.filter(to_state=state, exited_at__isnull=True)
+        .select_related("appraisal__faculty", "department")
+        .defer("appraisal__appraisal_data")
+        .order_by("entered_at", "transition_id")
+    )
+    if department_id is not None:
+        queryset = queryset.filter(department_id=department_id)
+    if after is not None:
+        entered_at, transition_id = after
+        queryset = queryset.filter(
+            Q(entered_at__gt=entered_at)
+            | Q(entered_at=entered_at, transition_id__gt=transition_id)
+        )
+    return list(queryset[:limit])
+
+
+def _percentile(sorted_values, fraction):
+    # Nearest-rank percentile; the inputs are small per-day samples.
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@transaction.atomic
+def rollup_day(day):
+    """
+    Recompute DwellRollup rows for `day`: one row per (department, state)
+    over every state that was exited during that day. Returns the rows.
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = start + timedelta(days=1)
+
+    # Only appraisals that moved that day can have left a state that day.
+    moved = StateTransition.objects.filter(entered_at__gte=start, entered_at__lt=end).values("appraisal_id")
+    exits = (
+        StateTransition.objects.filter(appraisal_id__in=moved)
+        .annotate(
+            left_at=Window(
+                Lead("entered_at"),
+                partition_by=[F("appraisal_id")],
+                order_by=F("transition_id").asc(),
+            )
+        )
+        .filter(left_at__gte=start, left_at__lt=end)
+        .values_list("department_id", "to_state", "entered_at", "left_at")
+    )
+
+    samples = defaultdict(list)
+    for department_id, state, entered_at, left_at in exits:
+        samples[(department_id, state)].append(int((left_at - entered_at).total_seconds()))
+
+    rows = []
+    for (department_id, state), values in sorted(samples.items(), key=lambda item: (item[0][0] or 0, item[0][1])):
+        values.sort()
+        rows.append(DwellRollup(
+            day=day,
+            department_id=department_id,
+            state=state,
+            samples=len(values),
+            p50_seconds=_percentile(values, 0.50),
+            p95_seconds=_percentile(values, 0.95),
+        ))
+
+    DwellRollup.objects.filter(day=day).delete()
+    DwellRollup.objects.bulk_create(rows)
+    return rows
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WorkflowConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'workflow'
+
+    def ready(self):
+        import workflow.handlers
+        import workflow.signals
@@ -0,0 +1,182 @@
+"""
+"What changed since cursor N" feed for dashboards (GET /api/appraisals/changes/).
+
+`log_changes()` runs inside workflow.projections.record_writes and appends
+an AppraisalChange row whenever an appraisal's status or remarks differ
+from what was last logged for it. Clients load the full list once, keep
+the returned cursor, and from then on poll with `?since=<cursor>`; with no
+new changes that is a single range probe on the position index.
+
+The cursor is AppraisalChange.position, not seq: seq is allocated before
+commit, so a long transaction (a bulk transition, an outbox batch) could
+make seq N visible after a client had already read N+1. Positions are
+handed out by `assign_positions()` after the writing transaction commits,
+one sequencer at a time, so they become visible in the order they grow.
+Any later sequencer run positions rows whose own run never happened.
+
+A row is in a user's feed when the appraisal's old or new status puts it
+in one of their views; rows whose new status takes it out of every view
+(for the principal, a return to the faculty) carry `"removed": true` so
+the client can drop the appraisal from its list.
+"""
+
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Case, Max, Q, Value, When
+
+from core.models import AppraisalChange
+from .inbox import HOD_QUEUE_STATES, PRINCIPAL_QUEUE_STATES
+from .states import States
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+# pg_advisory_xact_lock key serializing assign_positions().
+POSITION_LOCK = 0x41505052
+POSITION_BATCH = 1000
+
+FeedScope = namedtuple("FeedScope", ["match", "visible"])
+
+
+def _last_logged(appraisal_ids):
+    """{appraisal_id: (status, remarks)} of the latest logged change."""
+    latest = (
+        AppraisalChange.objects.filter(appraisal_id__in=appraisal_ids)
+        .values("appraisal_id")
+        .annotate(last_seq=Max("seq"))
+        .values("last_seq")
+    )
+    return {
+        appraisal_id: (status, remarks)
+        for appraisal_id, status, remarks in AppraisalChange.objects.filter(seq__in=latest).values_list(
+            "appraisal_id", "status", "remarks"
+        )
+    }
+
+
+def log_changes(writes):
+    """
+    Append change rows for the (appraisal, old_counter_key) pairs that need
+    one. Returns the appraisals that were logged.
+    """
+    changed = []
+    unsure = []
+    for appraisal, old_key in writes:
+        if old_key is None or old_key[2] != appraisal.status:
+            changed.append(appraisal)
+        else:
+            unsure.append(appraisal)
+
+    if unsure:
+        # Same status: only remarks can have changed; compare with the log.
+        logged = _last_logged([appraisal.appraisal_id for appraisal in unsure])
+        for appraisal in unsure:
+            last_status, last_remarks = logged.get(appraisal.appraisal_id, (appraisal.status, None))
+            if (last_status, last_remarks or None) != (appraisal.status, appraisal.remarks or None):
+                changed.append(appraisal)
+
+    if changed:
+        old_status = {appraisal.appraisal_id: old_key[2] if old_key else None for appraisal, old_key in writes}
+        AppraisalChange.objects.bulk_create([
+            AppraisalChange(
+                appraisal_id=appraisal.appraisal_id,
+                faculty_id=appraisal.faculty_id,
+                department_id=appraisal.department_id,
+                is_hod_appraisal=appraisal.is_hod_appraisal,
+                from_status=old_status[appraisal.appraisal_id],
+                status=appraisal.status,
+                remarks=appraisal.remarks,
+                changed_at=appraisal.updated_at,
+            )
+            for appraisal in changed
+        ])
+        transaction.on_commit(assign_positions, robust=True)
+    return changed
+
+
+def assign_positions():
+    """
+    Give committed changes that have no feed position the next positions,
+    in seq order. Runs in its own transaction after the writer commits;
+    on PostgreSQL an advisory lock makes sequencers take turns, so each
+    one's positions are committed before the next reads Max(position).
+    SQLite serializes writers by itself.
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [POSITION_LOCK])
+        pending = list(
+            AppraisalChange.objects.filter(position__isnull=True)
+            .order_by("seq")
+            .values_list("seq", flat=True)[:POSITION_BATCH]
+        )
+        if not pending:
+            return 0
+        last = head()
+        AppraisalChange.objects.bulk_update(
+            [AppraisalChange(seq=seq, position=last + offset) for offset, seq in enumerate(pending, start=1)],
+            ["position"],
+        )
+    return len(pending)
+
+
+def head():
+    """Current end of the feed; a client's starting cursor."""
+    return AppraisalChange.objects.aggregate(last=Max("position"))["last"] or 0
+
+
+def _in_views(user_scope, field):
+    """Q over AppraisalChange rows whose `field` status shows them to the user."""
+    own = user_scope.faculty_profile_id
+    scope = Q(faculty_id=own) if own else None
+
+    queue = None
+    if user_scope.role == "HOD" and user_scope.hod_department_id:
+        queue = Q(
+            department_id=user_scope.hod_department_id,
+            is_hod_appraisal=False,
+            **{f"{field}__in": HOD_QUEUE_STATES},
+        )
+    elif user_scope.role == "PRINCIPAL":
+        queue = Q(**{f"{field}__in": PRINCIPAL_QUEUE_STATES}) | Q(**{field: States.SUBMITTED}, is_hod_appraisal=True)
+    if queue is not None:
+        scope = queue | scope if scope else queue
+    return scope
+
+
+def scope_for(user_scope):
+    """
+    FeedScope for the user (`user_scope` is a core.services.scope.UserScope),
+    or None when the user has no scope: `match` selects changes into or out
+    of what the user sees in their list views, `visible` those that leave
+    the appraisal in view.
+    """
+    visible = _in_views(user_scope, "status")
+    if visible is None:
+        return None
+    return FeedScope(match=visible | _in_views(user_scope, "from_status"), visible=visible)
+
+
+def changes_since(scope, since, limit=DEFAULT_LIMIT):
+    """
+    Up to `limit` changes after position `since` within `scope` (a
+    FeedScope), oldest first. Returns (rows, cursor, has_more); `cursor` is
+    the position to poll from next.
+    """
+    rows = list(
+        AppraisalChange.objects.filter(scope.match, position__gt=since)
+        .annotate(
+            removed=Case(When(scope.visible, then=Value(False)), default=Value(True), output_field=BooleanField())
+        )
+        .order_by("position")
+        .values(
+            "position", "appraisal_id", "from_status", "status", "remarks", "is_hod_appraisal", "changed_at", "removed"
+        )[: limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    for row in rows:
+        row["seq"] = row.pop("position")
+    cursor = rows[-1]["seq"] if rows else since
+    return rows, cursor, has_more
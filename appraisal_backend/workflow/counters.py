@@ -0,0 +1,161 @@
+"""
+Materialized appraisal counts per (department, academic year, status).
+
+Every write that creates, deletes or moves an appraisal between keys calls
+`apply_deltas()` in the same transaction, which adjusts WorkflowCounter
+rows with `count = count + delta`. Dashboards then read a few dozen
+counter rows instead of scanning the appraisals table.
+
+`live_rows()` is the equivalent GROUP BY over appraisals; it backs
+`reconcile()` and the `?verify=1` mode of the summary endpoints.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from core.models import Appraisal, Department, WorkflowCounter
+
+
+def counter_key(department_id, academic_year, status):
+    return (department_id or 0, academic_year, status)
+
+
+def appraisal_key(appraisal):
+    return counter_key(appraisal.department_id, appraisal.academic_year, appraisal.status)
+
+
+def move(deltas, old_key, new_key):
+    """Record one appraisal moving from `old_key` to `new_key` (either may be None)."""
+    if old_key == new_key:
+        return deltas
+    if old_key is not None:
+        deltas[old_key] -= 1
+    if new_key is not None:
+        deltas[new_key] += 1
+    return deltas
+
+
+@transaction.atomic
+def apply_deltas(deltas):
+    """
+    Apply {key: delta} to the counters. Keys are updated in sorted order so
+    concurrent transactions lock counter rows in the same order.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    WorkflowCounter.objects.bulk_create(
+        [
+            WorkflowCounter(department_key=key[0], academic_year=key[1], status=key[2])
+            for key in deltas
+        ],
+        ignore_conflicts=True,
+    )
+    for key in sorted(deltas):
+        WorkflowCounter.objects.filter(
+            department_key=key[0],
+            academic_year=key[1],
+            status=key[2],
+        ).update(count=F("count") + deltas[key])
+
+
+def _scope(queryset, department_field, department_id=None, academic_year=None):
+    if department_id is not None:
+        queryset = queryset.filter(**{department_field: department_id})
+    if academic_year:
+        queryset = queryset.filter(academic_year=academic_year)
+    return queryset
+
+
+def counter_rows(department_id=None, academic_year=None):
+    """(department_key, academic_year, status, count) rows from the counter table."""
+    queryset = _scope(WorkflowCounter.objects.filter(count__gt=0), "department_key", department_id, academic_year)
+    return queryset.values_list("department_key", "academic_year", "status", "count")
+
+
+def live_rows(department_id=None, academic_year=None):
+    """The same rows computed with GROUP BY over the appraisals table."""
+    queryset = _scope(Appraisal.objects.all(), "department_id", department_id, academic_year)
+    return [
+        (department or 0, year, status, n)
+        for department, year, status, n in queryset.values("department_id", "academic_year", "status")
+        .annotate(n=Count("appraisal_id"))
+        .order_by()
+        .values_list("department_id", "academic_year", "status", "n")
+    ]
+
+
+def summarize(rows):
+    """Fold counter rows into the dashboard summary payload."""
+    total = 0
+    by_status = Counter()
+    by_year = defaultdict(Counter)
+    by_department = defaultdict(Counter)
+    for department_key, academic_year, status, count in rows:
+        total += count
+        by_status[status] += count
+        by_year[academic_year][status] += count
+        by_department[department_key][status] += count
+
+    names = dict(
+        Department.objects.filter(pk__in=by_department).values_list("department_id", "department_name")
+    )
+    return {
+        "total": total,
+        "by_status": dict(by_status),
+        "by_academic_year": [
+            {"academic_year": year, "total": sum(counts.values()), "by_status": dict(counts)}
+            for year, counts in sorted(by_year.items(), reverse=True)
+        ],
+        "by_department": [
+            {
+                "department_id": department_key or None,
+                "department_name": names.get(department_key),
+                "total": sum(counts.values()),
+                "by_status": dict(counts),
+            }
+            for department_key, counts in sorted(by_department.items())
+        ],
+    }
+
+
+@transaction.atomic
+def reconcile(fix=False):
+    """
+    Compare the counters with a live GROUP BY. Returns a list of
+    (key, stored, actual) for every key that drifted; with `fix=True`
+    the counters are overwritten with the actual values.
+    """
+    # Lock the counters first so in-flight transitions either land before
+    # the GROUP BY below or apply their delta on top of the fixed value.
+    stored = {
+        (row.department_key, row.academic_year, row.status): row
+        for row in WorkflowCounter.objects.select_for_update()
+    }
+    actual = {row[:3]: row[3] for row in live_rows()}
+
+    drift = []
+    for key in sorted(set(stored) | set(actual)):
+        row = stored.get(key)
+        stored_count = row.count if row else 0
+        if stored_count != actual.get(key, 0):
+            drift.append((key, stored_count, actual.get(key, 0)))
+
+    if fix and drift:
+        to_update = []
+        to_create = []
+        for key, _, count in drift:
+            if key in stored:
+                stored[key].count = count
+                to_update.append(stored[key])
+            else:
+                to_create.append(
+                    WorkflowCounter(department_key=key[0], academic_year=key[1], status=key[2], count=count)
+                )
+        WorkflowCounter.objects.bulk_update(to_update, ["count"])
+        WorkflowCounter.objects.bulk_create(to_create)
+
+    return drift
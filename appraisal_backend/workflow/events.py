@@ -0,0 +1,77 @@
+"""
+Live workflow events for the SSE endpoint (see core.services.events).
+
+Events are published after the writing transaction commits, to:
+the appraisal's faculty member, the department HOD while the appraisal is
+in the HOD queue, and every principal while it is in the principal queue.
+
+* "appraisal.status": status changed (data has status and remarks)
+* "appraisal.returned": sent back to the faculty member, with remarks
+* "appraisal.pdf_ready": the final PDFs were generated
+"""
+
+from django.db import transaction
+
+from core.models import Department, FacultyProfile
+from core.services.events import publish
+from .inbox import inbox_roles
+from .states import States
+
+RETURNED_STATES = (States.RETURNED_BY_HOD, States.RETURNED_BY_PRINCIPAL)
+
+
+def _snapshot(appraisal):
+    return {
+        "appraisal_id": appraisal.appraisal_id,
+        "faculty_id": appraisal.faculty_id,
+        "department_id": appraisal.department_id,
+        "is_hod_appraisal": appraisal.is_hod_appraisal,
+        "academic_year": appraisal.academic_year,
+        "status": appraisal.status,
+        "remarks": appraisal.remarks,
+        "roles": inbox_roles(appraisal),
+    }
+
+
+def _channels(snapshots):
+    """{appraisal_id: set of channels} for the given snapshots (two queries)."""
+    users = dict(
+        FacultyProfile.objects.filter(pk__in={s["faculty_id"] for s in snapshots}).values_list("pk", "user_id")
+    )
+    hods = dict(
+        Department.objects.filter(
+            pk__in={s["department_id"] for s in snapshots if "HOD" in s["roles"]}
+        ).values_list("pk", "hod_id")
+    )
+
+    channels = {}
+    for snapshot in snapshots:
+        targets = set()
+        if users.get(snapshot["faculty_id"]):
+            targets.add(f"user:{users[snapshot['faculty_id']]}")
+        if "HOD" in snapshot["roles"] and hods.get(snapshot["department_id"]):
+            targets.add(f"user:{hods[snapshot['department_id']]}")
+        if "PRINCIPAL" in snapshot["roles"]:
+            targets.add("role:PRINCIPAL")
+        channels[snapshot["appraisal_id"]] = targets
+    return channels
+
+
+def _publish(snapshots, event=None):
+    channels = _channels(snapshots)
+    for snapshot in snapshots:
+        data = {key: snapshot[key] for key in ("appraisal_id", "academic_year", "status", "remarks")}
+        name = event or ("appraisal.returned" if snapshot["status"] in RETURNED_STATES else "appraisal.status")
+        publish(channels[snapshot["appraisal_id"]], name, data)
+
+
+def publish_status_changes(appraisals):
+    """Queue status/remarks events for `appraisals`, sent once the transaction commits."""
+    snapshots = [_snapshot(appraisal) for appraisal in appraisals]
+    if snapshots:
+        transaction.on_commit(lambda: _publish(snapshots))
+
+
+def publish_pdf_ready(appraisal):
+    snapshots = [_snapshot(appraisal)]
+    transaction.on_commit(lambda: _publish(snapshots, event="appraisal.pdf_ready"))
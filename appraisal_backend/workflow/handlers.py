@@ -0,0 +1,38 @@
+"""
+Outbox handlers for workflow events (see core.services.outbox).
+Imported from WorkflowConfig.ready() so they register on startup.
+"""
+
+from core.models import Appraisal, GeneratedPDF
+from core.services.outbox import handler
+from core.services.pdf.html_pdf import generate_pdf_from_html
+from core.services.pdf.pbas_mapper import get_pbas_pdf_data
+from core.services.pdf.save import save_pdf
+from core.services.pdf.sppu_mapper import get_sppu_pdf_data
+from .events import publish_pdf_ready
+
+FINAL_PDFS = (
+    ("SPPU_PBAS", "pdf/sppu_pbas_form.html", get_sppu_pdf_data),
+    ("AICTE_PBAS", "pdf/aicte_pbas_form.html", get_pbas_pdf_data),
+)
+
+
+@handler("appraisal.finalized")
+def generate_final_pdfs(payload):
+    appraisal = Appraisal.objects.select_related("faculty__user").get(
+        appraisal_id=payload["appraisal_id"]
+    )
+
+    # Retries must not duplicate PDFs that were already saved. A retry after
+    # a rolled-back attempt overwrites that attempt's file (the file name
+    # is fixed per appraisal and type), so no orphaned files pile up.
+    for pdf_type, template, get_data in FINAL_PDFS:
+        if GeneratedPDF.objects.filter(
+            appraisal=appraisal,
+            pdf_path__icontains=f"{pdf_type}_appraisal_",
+        ).exists():
+            continue
+        pdf = generate_pdf_from_html(template, get_data(appraisal))
+        save_pdf(appraisal, pdf, pdf_type)
+
+    publish_pdf_ready(appraisal)
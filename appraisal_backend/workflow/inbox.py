@@ -0,0 +1,159 @@
+"""
+Incremental maintenance of the ReviewInbox read model.
+
+`sync_inbox()` recomputes the inbox rows of the given appraisals and is
+called in the same transaction as every workflow write (workflow.services)
+and from post_save receivers for plain model saves (workflow.signals).
+`rebuild_inbox()` recomputes everything for drift repair.
+"""
+
+from django.db import transaction
+
+from core.models import Appraisal, AppraisalScore, ReviewInbox
+from .states import States
+
+HOD_QUEUE_STATES = (
+    States.SUBMITTED,
+    States.REVIEWED_BY_HOD,
+    States.HOD_APPROVED,
+    States.REVIEWED_BY_PRINCIPAL,
+    States.PRINCIPAL_APPROVED,
+    States.FINALIZED,
+    States.RETURNED_BY_HOD,
+    States.RETURNED_BY_PRINCIPAL,
+)
+
+PRINCIPAL_QUEUE_STATES = (
+    States.HOD_APPROVED,
+    States.REVIEWED_BY_PRINCIPAL,
+    States.PRINCIPAL_APPROVED,
+    States.FINALIZED,
+)
+
+INBOX_FIELDS = (
+    "department",
+    "faculty_name",
+    "designation",
+    "department_name",
+    "form_type",
+    "academic_year",
+    "semester",
+    "is_hod_appraisal",
+    "status",
+    "remarks",
+    "total_score",
+    "verified_grade",
+    "status_since",
+    "updated_at",
+)
+
+
+def inbox_roles(appraisal):
+    """Reviewer roles whose queue lists this appraisal."""
+    roles = []
+    if not appraisal.is_hod_appraisal and appraisal.department_id and appraisal.status in HOD_QUEUE_STATES:
+        roles.append("HOD")
+    if appraisal.status in PRINCIPAL_QUEUE_STATES or (
+        appraisal.status == States.SUBMITTED and appraisal.is_hod_appraisal
+    ):
+        roles.append("PRINCIPAL")
+    return roles
+
+
+def _score(appraisal):
+    try:
+        return appraisal.appraisalscore
+    except AppraisalScore.DoesNotExist:
+        return None
+
+
+def _build_row(appraisal, role, previous):
+    faculty = appraisal.faculty
+    department = appraisal.department
+    score = _score(appraisal)
+
+    status_since = appraisal.updated_at
+    if previous is not None and previous.status == appraisal.status:
+        status_since = previous.status_since
+
+    return ReviewInbox(
+        role=role,
+        appraisal=appraisal,
+        department=department,
+        faculty_name=faculty.full_name,
+        designation=faculty.designation,
+        department_name=department.department_name if department else faculty.user.department,
+        form_type=appraisal.form_type,
+        academic_year=appraisal.academic_year,
+        semester=appraisal.semester,
+        is_hod_appraisal=appraisal.is_hod_appraisal,
+        status=appraisal.status,
+        remarks=appraisal.remarks,
+        total_score=score.total_score if score else None,
+        verified_grade=score.verified_grade if score else None,
+        status_since=status_since,
+        updated_at=appraisal.updated_at,
+    )
+
+
+def sync_inbox(appraisal_ids):
+    """
+    Bring the inbox rows of `appraisal_ids` in line with the appraisals.
+    Three queries regardless of how many ids are passed.
+    """
+    appraisal_ids = list(appraisal_ids)
+    if not appraisal_ids:
+        return
+
+    appraisals = (
+        Appraisal.objects.filter(appraisal_id__in=appraisal_ids)
+        .select_related("faculty__user", "department", "appraisalscore")
+        .defer("appraisal_data")
+    )
+    existing = {
+        (row.role, row.appraisal_id): row
+        for row in ReviewInbox.objects.filter(appraisal_id__in=appraisal_ids).only(
+            "role", "appraisal_id", "status", "status_since"
+        )
+    }
+
+    rows = []
+    for appraisal in appraisals:
+        for role in inbox_roles(appraisal):
+            previous = existing.pop((role, appraisal.appraisal_id), None)
+            rows.append(_build_row(appraisal, role, previous))
+
+    with transaction.atomic():
+        # Whatever is left in `existing` no longer belongs in that queue.
+        if existing:
+            ReviewInbox.objects.filter(
+                pk__in=[row.pk for row in existing.values()]
+            ).delete()
+        if rows:
+            ReviewInbox.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["role", "appraisal"],
+                update_fields=INBOX_FIELDS,
+            )
+
+
+def rebuild_inbox(batch_size=500):
+    """
+    Recompute every inbox row in batches of `batch_size` appraisals.
+    Returns the number of appraisals processed.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Appraisal.objects.filter(appraisal_id__gt=last_id)
+            .order_by("appraisal_id")
+            .values_list("appraisal_id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        sync_inbox(ids)
+        processed += len(ids)
+        last_id = ids[-1]
+    return processed
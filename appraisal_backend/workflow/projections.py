@@ -0,0 +1,39 @@
+"""
+Read models derived from appraisal writes: the status counters
+(workflow.counters), the StateTransition log (workflow.aging), the
+ReviewInbox (workflow.inbox) and the change feed (workflow.changes), which
+also drives the live SSE events (workflow.events).
+"""
+
+from collections import Counter
+
+from .aging import build_transition, log_transitions
+from .changes import log_changes
+from .events import publish_status_changes
+from .counters import appraisal_key, apply_deltas, move
+from .inbox import sync_inbox
+
+
+def record_writes(writes):
+    """
+    Update every read model for a batch of written appraisals, in the
+    caller's transaction. `writes` is a list of (appraisal, old_key) pairs
+    where old_key is counters.appraisal_key() before the write, or None for
+    a newly created appraisal.
+    """
+    writes = list(writes)
+    if not writes:
+        return
+
+    deltas = Counter()
+    transitions = []
+    for appraisal, old_key in writes:
+        move(deltas, old_key, appraisal_key(appraisal))
+        from_state = old_key[2] if old_key else None
+        if old_key is None or from_state != appraisal.status:
+            transitions.append(build_transition(appraisal, from_state))
+
+    apply_deltas(deltas)
+    log_transitions(transitions)
+    publish_status_changes(log_changes(writes))
+    sync_inbox([appraisal.appraisal_id for appraisal, _ in writes])
@@ -0,0 +1,411 @@
+"""
+Workflow services that act on Appraisal rows.
+
+Every write goes through a conditional UPDATE
+(`WHERE status = <read status> AND version = <read version>`), so two
+reviewers acting on the same appraisal cannot silently overwrite each
+other: exactly one UPDATE matches and the loser gets TransitionConflict.
+
+`bulk_transition` applies one review action to many appraisals at once:
+every item is checked against VALID_TRANSITIONS and reviewer scope using a
+single fetch, then the valid ones are written inside one transaction with
+bulk ApprovalHistory / AuditLog inserts.
+
+Approvals persist the same review data and recalculated scores whether
+they come from the single-item views or from a bulk request; both use
+`hod_review_data`, `principal_review_data` and `approval_scores`.
+
+Every write also updates the read models (status counters, state
+transition log, review inbox) in the same transaction; see
+workflow.projections.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Appraisal, AppraisalScore, ApprovalHistory
+from core.services.sppu_verified import derive_overall_grade, extract_verified_grading
+from core.utils.audit import build_audit_log, log_actions
+from scoring.engine import calculate_full_score
+from .counters import appraisal_key
+from .engine import perform_action
+from .projections import record_writes
+from .states import States
+
+MAX_BULK_ITEMS = 200
+
+
+class TransitionConflict(Exception):
+    """The appraisal changed after it was read; the caller should reload."""
+
+    def __init__(self, message="Appraisal was modified by another request. Reload and try again."):
+        super().__init__(message)
+
+
+def _guarded_update(appraisal, **changes):
+    """
+    Write `changes` only if the row still has the status and version that
+    were read into `appraisal`. Bumps the version and refreshes the instance.
+    """
+    now = timezone.now()
+    updated = Appraisal.objects.filter(
+        pk=appraisal.pk,
+        status=appraisal.status,
+        version=appraisal.version,
+    ).update(version=F("version") + 1, updated_at=now, **changes)
+    if not updated:
+        raise TransitionConflict()
+
+    for field, value in changes.items():
+        setattr(appraisal, field, value)
+    appraisal.version += 1
+    appraisal.updated_at = now
+    appraisal.remember_read_model_state()
+
+
+def update_appraisal(appraisal, **changes):
+    """
+    Optimistically save field changes (e.g. appraisal_data) without a state change.
+    Raises TransitionConflict if someone else wrote the appraisal first.
+    """
+    old_key = appraisal_key(appraisal)
+    _guarded_update(appraisal, **changes)
+    record_writes([(appraisal, old_key)])
+
+
+def transition_appraisal(appraisal, next_state, *, role=None, **changes):
+    """
+    Validate and apply a workflow transition together with `changes`.
+    Raises ValueError for an invalid transition and TransitionConflict when
+    the appraisal was changed concurrently. Returns the new state.
+    """
+    perform_action(
+        current_state=appraisal.status,
+        next_state=next_state,
+        role=role,
+        appraisal=appraisal,
+    )
+    old_key = appraisal_key(appraisal)
+    _guarded_update(appraisal, status=next_state, **changes)
+    record_writes([(appraisal, old_key)])
+    return next_state
+
+
+def approval_scores(appraisal_data):
+    """
+    AppraisalScore fields recalculated from `appraisal_data` on approval,
+    or {} when the data cannot be scored (the stored scores are kept).
+    """
+    try:
+        result = calculate_full_score(appraisal_data)
+    except Exception:
+        return {}
+    return {
+        "teaching_score": result["teaching"]["score"],
+        "research_score": result["research"]["total"],
+        "activity_score": result["activities"]["score"],
+        "feedback_score": result["pbas"]["total"],
+        "total_score": result["total_score"],
+        "acr_score": result["acr"]["credit_point"],
+    }
+
+
+def hod_review_data(appraisal_data, data):
+    """`appraisal_data` with the HOD's approval comments from request `data`."""
+    appraisal_data = appraisal_data if isinstance(appraisal_data, dict) else {}
+    hod_review = appraisal_data.get("hod_review", {})
+    if not isinstance(hod_review, dict):
+        hod_review = {}
+    hod_review["comments_table1"] = data.get("hod_comments_table1", "") or ""
+    hod_review["comments_table2"] = data.get("hod_comments_table2", "") or ""
+    hod_review["remarks_suggestions"] = data.get("hod_remarks", "") or ""
+    hod_review["justification"] = data.get("hod_justification_not_satisfactory", "") or ""
+    appraisal_data["hod_review"] = hod_review
+    return appraisal_data
+
+
+def principal_review_data(appraisal_data, remarks):
+    """`appraisal_data` with the Principal's approval remarks."""
+    appraisal_data = appraisal_data if isinstance(appraisal_data, dict) else {}
+    principal_review = appraisal_data.get("principal_review", {})
+    if not isinstance(principal_review, dict):
+        principal_review = {}
+    principal_review["remarks"] = remarks
+    appraisal_data["principal_review"] = principal_review
+    return appraisal_data
+
+
+class BulkAction:
+    def __init__(self, *, target, sources, history_action=None, requires_grading=False, faculty_only=False):
+        self.target = target
+        self.sources = sources
+        # ApprovalHistory.action written for this transition (None = no history row)
+        self.history_action = history_action
+        # Verified Table 1 grading must already be saved via verify-grade
+        self.requires_grading = requires_grading
+        # HOD reviewers may only act on faculty appraisals, never HOD ones
+        self.faculty_only = faculty_only
+
+
+BULK_ACTIONS = {
+    "HOD": {
+        "start_review": BulkAction(
+            target=States.REVIEWED_BY_HOD,
+            sources=[States.SUBMITTED],
+            faculty_only=True,
+        ),
+        "approve": BulkAction(
+            target=States.HOD_APPROVED,
+            sources=[States.REVIEWED_BY_HOD],
+            history_action="APPROVED",
+            requires_grading=True,
+            faculty_only=True,
+        ),
+        "return": BulkAction(
+            target=States.RETURNED_BY_HOD,
+            sources=[States.SUBMITTED, States.REVIEWED_BY_HOD],
+            history_action="SENT_BACK",
+            faculty_only=True,
+        ),
+    },
+    "PRINCIPAL": {
+        "start_review": BulkAction(
+            target=States.REVIEWED_BY_PRINCIPAL,
+            sources=[States.SUBMITTED, States.HOD_APPROVED],
+        ),
+        "approve": BulkAction(
+            target=States.PRINCIPAL_APPROVED,
+            sources=[States.REVIEWED_BY_PRINCIPAL],
+            history_action="APPROVED",
+            requires_grading=True,
+        ),
+        "return": BulkAction(
+            target=States.RETURNED_BY_PRINCIPAL,
+            sources=[States.SUBMITTED, States.HOD_APPROVED, States.REVIEWED_BY_PRINCIPAL],
+            history_action="SENT_BACK",
+        ),
+    },
+}
+
+
+def _result(appraisal_id, status_code, error=None, new_state=None):
+    item = {"appraisal_id": appraisal_id, "ok": error is None, "status_code": status_code}
+    if error is None:
+        item["new_state"] = new_state
+    else:
+        item["error"] = error
+    return item
+
+
+def _check_item(appraisal, *, role, spec, department_id):
+    """
+    Return (status_code, error) for an appraisal that cannot take the
+    transition, or None when it can.
+    """
+    if role == "HOD" and appraisal.department_id != department_id:
+        return 403, "You cannot act on appraisals outside your department"
+
+    if spec.faculty_only and appraisal.is_hod_appraisal:
+        return 400, "HOD can act on faculty appraisals only"
+
+    if appraisal.status not in spec.sources:
+        return 400, f"Appraisal in state {appraisal.status} cannot move to {spec.target}"
+
+    try:
+        perform_action(
+            current_state=appraisal.status,
+            next_state=spec.target,
+            role=role,
+            appraisal=appraisal,
+        )
+    except ValueError as exc:
+        return 400, str(exc)
+
+    return None
+
+
+def _verified_grade(appraisal):
+    grading = extract_verified_grading(appraisal.appraisal_data, appraisal.is_hod_appraisal is True)
+    teaching = grading["table1_verified_teaching"]
+    activities = grading["table1_verified_activities"]
+    if not teaching or not activities:
+        return None
+    return derive_overall_grade(teaching, activities)
+
+
+def parse_bulk_request(data, role):
+    """
+    Validate a bulk transition request body.
+    Returns (appraisal_ids, action, remarks, error_message).
+    """
+    action = data.get("action")
+    if action not in BULK_ACTIONS[role]:
+        return None, None, None, f"action must be one of: {', '.join(sorted(BULK_ACTIONS[role]))}"
+
+    raw_ids = data.get("appraisal_ids")
+    if not isinstance(raw_ids, list) or not raw_ids:
+        return None, None, None, "appraisal_ids must be a non-empty list"
+
+    appraisal_ids = []
+    for raw_id in raw_ids:
+        try:
+            appraisal_id = int(raw_id)
+        except (TypeError, ValueError):
+            return None, None, None, f"Invalid appraisal id: {raw_id!r}"
+        if appraisal_id not in appraisal_ids:
+            appraisal_ids.append(appraisal_id)
+
+    if len(appraisal_ids) > MAX_BULK_ITEMS:
+        return None, None, None, f"At most {MAX_BULK_ITEMS} appraisals can be processed per request"
+
+    remarks = data.get("remarks")
+    return appraisal_ids, action, remarks, None
+
+
+def bulk_transition(*, request, role, action, appraisal_ids, remarks=None, department_id=None):
+    """
+    Apply `action` for `role` to every id in `appraisal_ids`.
+    Items that fail validation are reported and skipped; the rest are
+    written together. Returns a list of per-item result dicts in input order.
+    """
+    spec = BULK_ACTIONS[role][action]
+
+    # Only approvals read the verified grading from appraisal_data;
+    # skip loading the JSON blob for every other action.
+    queryset = Appraisal.objects.filter(appraisal_id__in=appraisal_ids)
+    if not spec.requires_grading:
+        queryset = queryset.defer("appraisal_data")
+    appraisals = {a.appraisal_id: a for a in queryset}
+
+    results = {}
+    accepted = []
+    grades = {}
+    for appraisal_id in appraisal_ids:
+        appraisal = appraisals.get(appraisal_id)
+        if appraisal is None:
+            results[appraisal_id] = _result(appraisal_id, 404, "Appraisal not found")
+            continue
+
+        failure = _check_item(appraisal, role=role, spec=spec, department_id=department_id)
+        if failure:
+            results[appraisal_id] = _result(appraisal_id, *failure)
+            continue
+
+        # HOD approves faculty appraisals with HOD grading; the Principal
+        # grades HOD appraisals only (same rule as the single-item views).
+        if spec.requires_grading and (role == "HOD" or appraisal.is_hod_appraisal):
+            grade = _verified_grade(appraisal)
+            if grade is None:
+                results[appraisal_id] = _result(
+                    appraisal_id,
+                    400,
+                    "Set Table 1 verified grading (Teaching and Activities) before approval",
+                )
+                continue
+            grades[appraisal_id] = grade
+
+        accepted.append(appraisal)
+
+    if accepted:
+        applied = _apply(request=request, role=role, action=action, spec=spec, appraisals=accepted, remarks=remarks, grades=grades)
+        for appraisal in accepted:
+            if appraisal.appraisal_id in applied:
+                results[appraisal.appraisal_id] = _result(appraisal.appraisal_id, 200, new_state=spec.target)
+            else:
+                results[appraisal.appraisal_id] = _result(appraisal.appraisal_id, 409, str(TransitionConflict()))
+
+    return [results[appraisal_id] for appraisal_id in appraisal_ids]
+
+
+@transaction.atomic
+def _apply(*, request, role, action, spec, appraisals, remarks, grades):
+    """
+    Write the accepted items. Each row gets its own conditional UPDATE so
+    items changed since the fetch lose (409) without affecting the rest.
+    Returns the set of appraisal ids that were transitioned.
+    """
+    changes = {}
+    # Returns always carry remarks; the Principal may also attach them on approval.
+    write_remarks = spec.history_action == "SENT_BACK" or (role == "PRINCIPAL" and remarks is not None)
+    if write_remarks:
+        changes["remarks"] = remarks or ""
+    if role == "PRINCIPAL":
+        changes["principal"] = request.user
+
+    applied = set()
+    writes = []
+    history = []
+    audit_entries = []
+    scores = []
+    for appraisal in appraisals:
+        from_state = appraisal.status
+        old_key = appraisal_key(appraisal)
+        item_changes = dict(changes)
+        # Approvals write what the single-item approve views write.
+        if spec.requires_grading and role == "HOD":
+            item_changes["appraisal_data"] = hod_review_data(appraisal.appraisal_data, request.data)
+        elif spec.requires_grading and remarks is not None:
+            item_changes["appraisal_data"] = principal_review_data(appraisal.appraisal_data, changes["remarks"])
+        try:
+            _guarded_update(appraisal, status=spec.target, **item_changes)
+        except TransitionConflict:
+            continue
+        applied.add(appraisal.appraisal_id)
+        writes.append((appraisal, old_key))
+
+        score_fields = approval_scores(appraisal.appraisal_data) if spec.requires_grading and role == "HOD" else {}
+        if appraisal.appraisal_id in grades:
+            score_fields["verified_grade"] = grades[appraisal.appraisal_id]
+        if score_fields:
+            scores.append((tuple(sorted(score_fields)), AppraisalScore(appraisal_id=appraisal.appraisal_id, **score_fields)))
+
+        if spec.history_action:
+            history.append(
+                ApprovalHistory(
+                    appraisal=appraisal,
+                    role=role,
+                    approved_by=request.user,
+                    action=spec.history_action,
+                    from_state=from_state,
+                    to_state=spec.target,
+                    remarks=appraisal.remarks if write_remarks else None,
+                    action_at=appraisal.updated_at,
+                )
+            )
+
+        audit_entries.append(
+            build_audit_log(
+                request=request,
+                action=f"{role}_{action.upper()}",
+                entity="Appraisal",
+                entity_id=appraisal.appraisal_id,
+                old_value={"status": from_state},
+                new_value={"status": spec.target, "bulk": True},
+            )
+        )
+
+    if history:
+        ApprovalHistory.objects.bulk_create(
+            history,
+            update_conflicts=True,
+            unique_fields=["appraisal", "role"],
+            update_fields=["approved_by", "action", "from_state", "to_state", "remarks", "action_at"],
+        )
+
+    # Items that could not be scored only update verified_grade, so group
+    # the upserts by the fields they carry.
+    by_fields = {}
+    for fields, score in scores:
+        by_fields.setdefault(fields, []).append(score)
+    for fields, rows in by_fields.items():
+        AppraisalScore.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["appraisal"],
+            update_fields=list(fields),
+        )
+
+    record_writes(writes)
+    log_actions(audit_entries)
+    return applied
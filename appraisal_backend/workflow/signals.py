@@ -0,0 +1,66 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core.models import Appraisal, AppraisalScore, FacultyProfile
+from .counters import apply_deltas, counter_key, move
+from .inbox import sync_inbox
+from .projections import record_writes
+
+
+def _stored_counter_key(instance):
+    stored = Appraisal.objects.filter(pk=instance.pk).values_list(
+        "department_id", "academic_year", "status"
+    ).first()
+    return counter_key(*stored) if stored else None
+
+
+@receiver(pre_save, sender=Appraisal)
+def remember_stored_state(sender, instance, **kwargs):
+    # Plain saves can change status; post_save needs the stored values to
+    # move the count. Instances loaded from the database already carry
+    # them (Appraisal.from_db); only partially loaded ones are re-read.
+    if instance._state.adding:
+        instance._stored_state = None
+        return
+    stored = getattr(instance, "_stored_read_model_state", None)
+    if stored is None:
+        stored = Appraisal.objects.filter(pk=instance.pk).values_list(*Appraisal.READ_MODEL_FIELDS).first()
+    instance._stored_state = stored
+
+
+@receiver(post_save, sender=Appraisal)
+def sync_read_models_on_appraisal_save(sender, instance, created, **kwargs):
+    stored = getattr(instance, "_stored_state", None)
+    instance.remember_read_model_state()
+    # Saves that leave every read-model column alone (draft edits) have
+    # nothing to count, log, publish or list.
+    if not created and stored is not None and stored == instance.read_model_state():
+        return
+    old_key = counter_key(*stored[:3]) if stored is not None else None
+    record_writes([(instance, old_key)])
+
+
+@receiver(pre_delete, sender=Appraisal)
+def remember_deleted_counter_key(sender, instance, **kwargs):
+    # The instance may be stale; count what is actually stored.
+    instance._stored_counter_key = _stored_counter_key(instance)
+
+
+@receiver(post_delete, sender=Appraisal)
+def uncount_deleted_appraisal(sender, instance, **kwargs):
+    apply_deltas(move(Counter(), getattr(instance, "_stored_counter_key", None), None))
+
+
+@receiver(post_save, sender=AppraisalScore)
+def sync_inbox_on_score_save(sender, instance, **kwargs):
+    sync_inbox([instance.appraisal_id])
+
+
+@receiver(post_save, sender=FacultyProfile)
+def sync_inbox_on_faculty_save(sender, instance, created, **kwargs):
+    # Names and department (see core.signals) are copied into the inbox.
+    if created:
+        return
+    sync_inbox(Appraisal.objects.filter(faculty=instance).values_list("appraisal_id", flat=True))
@@ -1,3 +1,471 @@
+import asyncio
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.views.events import _ticket_user, issue_ticket
+from appraisal_backend.asgi import events_application
+from core.models import (
+    Appraisal,
+    AppraisalScore,
+    ApprovalHistory,
+    Department,
+    FacultyProfile,
+    GeneratedPDF,
+    OutboxEvent,
+    ReviewInbox,
+    StateTransition,
+    User,
+    WorkflowCounter,
+)
+from core.services.events import broker
+from core.services.revocation import revoke_tokens
+from workflow.aging import rollup_day
+from workflow.counters import reconcile
+from workflow.services import TransitionConflict, transition_appraisal, update_appraisal
+from workflow.states import States
+
+
+class WorkflowTestMixin:
+    def setUp(self):
+        self.department = Department.objects.create(department_name="Computer")
+        self.other_department = Department.objects.create(department_name="Civil")
+
+        self.hod = User.objects.create_user(username="hod@example.com", password="x", role="HOD")
+        self.department.hod = self.hod
+        self.department.save()
+        self.principal = User.objects.create_user(username="principal@example.com", password="x", role="PRINCIPAL")
+
+        self.faculty = self._faculty("faculty@example.com", self.department)
+        self.outsider = self._faculty("outsider@example.com", self.other_department)
+        self.client = APIClient()
+
+    def _faculty(self, username, department):
+        user = User.objects.create_user(username=username, password="x", role="FACULTY")
+        return FacultyProfile.objects.create(user=user, department=department, full_name=username)
+
+    def _appraisal(self, faculty=None, status=States.SUBMITTED, year="2024-25", data=None, **extra):
+        return Appraisal.objects.create(
+            faculty=faculty or self.faculty,
+            form_type="SPPU",
+            academic_year=year,
+            semester="Odd",
+            appraisal_data=data or {},
+            status=status,
+            **extra,
+        )
+
+
+class BulkTransitionTests(WorkflowTestMixin, TestCase):
+    def test_hod_bulk_start_review_reports_per_item(self):
+        ok = self._appraisal()
+        wrong_state = self._appraisal(status=States.DRAFT, year="2023-24")
+        foreign = self._appraisal(faculty=self.outsider)
+
+        self.client.force_authenticate(self.hod)
+        response = self.client.post(
+            "/api/hod/appraisals/bulk-transition/",
+            {"action": "start_review", "appraisal_ids": [ok.pk, wrong_state.pk, foreign.pk, 999999]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        codes = {item["appraisal_id"]: item["status_code"] for item in response.data["results"]}
+        self.assertEqual(codes, {ok.pk: 200, wrong_state.pk: 400, foreign.pk: 403, 999999: 404})
+        ok.refresh_from_db()
+        wrong_state.refresh_from_db()
+        self.assertEqual(ok.status, States.REVIEWED_BY_HOD)
+        self.assertEqual(wrong_state.status, States.DRAFT)
+
+    def test_hod_bulk_approve_requires_saved_grading(self):
+        graded = self._appraisal(
+            status=States.REVIEWED_BY_HOD,
+            data={"hod_review": {"table1_verified_teaching": "Good", "table1_verified_activities": "Good"}},
+        )
+        ungraded = self._appraisal(status=States.REVIEWED_BY_HOD, year="2023-24")
+
+        self.client.force_authenticate(self.hod)
+        response = self.client.post(
+            "/api/hod/appraisals/bulk-transition/",
+            {"action": "approve", "appraisal_ids": [graded.pk, ungraded.pk]},
+            format="json",
+        )
+
+        self.assertEqual(response.data["succeeded"], 1)
+        graded.refresh_from_db()
+        self.assertEqual(graded.status, States.HOD_APPROVED)
+        self.assertEqual(AppraisalScore.objects.get(appraisal=graded).verified_grade, "Good")
+        history = ApprovalHistory.objects.get(appraisal=graded)
+        self.assertEqual((history.role, history.action), ("HOD", "APPROVED"))
+        self.assertFalse(ApprovalHistory.objects.filter(appraisal=ungraded).exists())
+
+    def test_bulk_approve_persists_what_single_approve_persists(self):
+        grading = {"hod_review": {"table1_verified_teaching": "Good", "table1_verified_activities": "Good"}}
+        single = self._appraisal(status=States.REVIEWED_BY_HOD, data=grading)
+        bulk = self._appraisal(status=States.REVIEWED_BY_HOD, year="2023-24", data=grading)
+        score = {
+            "teaching": {"score": 10}, "research": {"total": 20}, "activities": {"score": 5},
+            "pbas": {"total": 7}, "acr": {"credit_point": 3}, "total_score": 45,
+        }
+        comments = {"hod_comments_table1": "Solid", "hod_remarks": "Keep it up"}
+
+        self.client.force_authenticate(self.hod)
+        with mock.patch("workflow.services.calculate_full_score", return_value=score):
+            self.client.post(f"/api/hod/appraisal/{single.pk}/approve/", comments, format="json")
+            self.client.post(
+                "/api/hod/appraisals/bulk-transition/",
+                {"action": "approve", "appraisal_ids": [bulk.pk], **comments},
+                format="json",
+            )
+
+        fields = ("verified_grade", "teaching_score", "research_score", "activity_score", "feedback_score", "total_score", "acr_score")
+        single_score, bulk_score = (
+            AppraisalScore.objects.filter(appraisal=appraisal).values(*fields).get() for appraisal in (single, bulk)
+        )
+        self.assertEqual(single_score, bulk_score)
+        self.assertEqual(bulk_score["total_score"], 45)
+        single.refresh_from_db()
+        bulk.refresh_from_db()
+        review_keys = ("comments_table1", "comments_table2", "remarks_suggestions", "justification")
+        self.assertEqual(
+            {key: single.appraisal_data["hod_review"][key] for key in review_keys},
+            {key: bulk.appraisal_data["hod_review"][key] for key in review_keys},
+        )
+        self.assertEqual(bulk.appraisal_data["hod_review"]["comments_table1"], "Solid")
+
+    def test_plain_saves_touch_read_models_only_when_queue_columns_change(self):
+        draft = Appraisal.objects.get(pk=self._appraisal(status=States.DRAFT).pk)
+        draft.appraisal_data = {"teaching": {}}
+        with self.assertNumQueries(1):
+            draft.save()
+
+        draft.status = States.SUBMITTED
+        draft.save()
+        self.assertTrue(ReviewInbox.objects.filter(appraisal=draft, role="HOD").exists())
+        self.assertEqual(StateTransition.objects.filter(appraisal=draft, to_state=States.SUBMITTED).count(), 1)
+
+    def test_principal_bulk_return_sets_remarks(self):
+        appraisal = self._appraisal(status=States.HOD_APPROVED)
+
+        self.client.force_authenticate(self.principal)
+        response = self.client.post(
+            "/api/principal/appraisals/bulk-transition/",
+            {"action": "return", "appraisal_ids": [appraisal.pk], "remarks": "Attach proofs"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        appraisal.refresh_from_db()
+        self.assertEqual(appraisal.status, States.RETURNED_BY_PRINCIPAL)
+        self.assertEqual(appraisal.remarks, "Attach proofs")
+        self.assertEqual(appraisal.principal, self.principal)
+
+    def test_rejects_unknown_action(self):
+        self.client.force_authenticate(self.hod)
+        response = self.client.post(
+            "/api/hod/appraisals/bulk-transition/",
+            {"action": "finalize", "appraisal_ids": [1]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class OptimisticTransitionTests(WorkflowTestMixin, TestCase):
+    def test_only_one_concurrent_transition_wins(self):
+        appraisal = self._appraisal()
+        first = Appraisal.objects.get(pk=appraisal.pk)
+        second = Appraisal.objects.get(pk=appraisal.pk)
+
+        transition_appraisal(first, States.REVIEWED_BY_HOD)
+        with self.assertRaises(TransitionConflict):
+            transition_appraisal(second, States.RETURNED_BY_HOD, remarks="late")
+
+        appraisal.refresh_from_db()
+        self.assertEqual(appraisal.status, States.REVIEWED_BY_HOD)
+        self.assertEqual(appraisal.version, 1)
+        self.assertIsNone(appraisal.remarks)
+
+    def test_plain_save_invalidates_stale_readers(self):
+        appraisal = self._appraisal(status=States.REVIEWED_BY_HOD)
+        stale = Appraisal.objects.get(pk=appraisal.pk)
+
+        appraisal.appraisal_data = {"edited": True}
+        appraisal.save(update_fields=["appraisal_data"])
+
+        with self.assertRaises(TransitionConflict):
+            update_appraisal(stale, appraisal_data={"hod_review": {}})
+
+    def test_version_change_alone_is_a_conflict(self):
+        appraisal = self._appraisal()
+        stale = Appraisal.objects.get(pk=appraisal.pk)
+        Appraisal.objects.filter(pk=appraisal.pk).update(version=stale.version + 1)
+
+        with self.assertRaises(TransitionConflict):
+            transition_appraisal(stale, States.REVIEWED_BY_HOD)
+
+
+class FinalizeOutboxTests(WorkflowTestMixin, TestCase):
+    def test_finalize_defers_pdf_generation_to_outbox(self):
+        appraisal = self._appraisal(status=States.PRINCIPAL_APPROVED)
+
+        self.client.force_authenticate(self.principal)
+        response = self.client.post(f"/api/principal/appraisal/{appraisal.pk}/finalize/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(GeneratedPDF.objects.exists())
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.topic, "appraisal.finalized")
+        self.assertEqual(event.payload, {"appraisal_id": appraisal.pk})
+
+
+class ReviewInboxTests(WorkflowTestMixin, TestCase):
+    def _rows(self, appraisal):
+        return dict(ReviewInbox.objects.filter(appraisal=appraisal).values_list("role", "status"))
+
+    def test_inbox_follows_workflow(self):
+        appraisal = self._appraisal(status=States.DRAFT)
+        self.assertEqual(self._rows(appraisal), {})
+
+        appraisal.status = States.SUBMITTED
+        appraisal.save()
+        self.assertEqual(self._rows(appraisal), {"HOD": States.SUBMITTED})
+
+        transition_appraisal(appraisal, States.REVIEWED_BY_HOD)
+        transition_appraisal(appraisal, States.HOD_APPROVED)
+        self.assertEqual(
+            self._rows(appraisal),
+            {"HOD": States.HOD_APPROVED, "PRINCIPAL": States.HOD_APPROVED},
+        )
+
+        AppraisalScore.objects.create(appraisal=appraisal, total_score="42.50")
+        self.assertEqual(ReviewInbox.objects.get(appraisal=appraisal, role="PRINCIPAL").total_score, Decimal("42.50"))
+
+    def test_hod_queue_reads_inbox_and_rebuild_repairs_drift(self):
+        appraisal = self._appraisal()
+        self._appraisal(faculty=self.outsider)
+        ReviewInbox.objects.all().delete()
+
+        call_command("rebuild_inbox", stdout=StringIO())
+
+        self.client.force_authenticate(self.hod)
+        response = self.client.get("/api/hod/appraisals/")
+        self.assertEqual([row["appraisal_id"] for row in response.data], [appraisal.pk])
+        self.assertEqual(response.data[0]["faculty_name"], "faculty@example.com")
+
+
+class WorkflowCounterTests(WorkflowTestMixin, TestCase):
+    def _summary(self, **params):
+        self.client.force_authenticate(self.principal)
+        return self.client.get("/api/principal/dashboard/summary/", params).data
+
+    def test_counters_track_saves_transitions_and_bulk(self):
+        first = self._appraisal()
+        second = self._appraisal(year="2023-24")
+        self._appraisal(faculty=self.outsider, status=States.DRAFT)
+
+        transition_appraisal(first, States.REVIEWED_BY_HOD)
+        self.client.force_authenticate(self.hod)
+        self.client.post(
+            "/api/hod/appraisals/bulk-transition/",
+            {"action": "start_review", "appraisal_ids": [second.pk]},
+            format="json",
+        )
+        second.delete()
+
+        summary = self._summary()
+        self.assertEqual(summary["by_status"], {States.REVIEWED_BY_HOD: 1, States.DRAFT: 1})
+        self.assertEqual(summary["total"], 2)
+        live = self._summary(verify=1)
+        self.assertEqual(live["by_status"], summary["by_status"])
+        self.assertEqual(live["source"], "live")
+
+    def test_reconcile_repairs_drift(self):
+        self._appraisal()
+        WorkflowCounter.objects.update(count=5)
+
+        out = StringIO()
+        call_command("reconcile_counters", fix=True, stdout=out)
+
+        self.assertIn("stored=5 actual=1", out.getvalue())
+        self.assertEqual(reconcile(), [])
+        self.assertEqual(self._summary(department=self.department.pk)["total"], 1)
+
+
+class StateTransitionTests(WorkflowTestMixin, TestCase):
+    def _age(self, appraisal, hours):
+        StateTransition.objects.filter(appraisal=appraisal).update(
+            entered_at=timezone.now() - timedelta(hours=hours)
+        )
+
+    def test_aging_lists_oldest_current_rows_first(self):
+        old = self._appraisal(year="2022-23")
+        new = self._appraisal(year="2023-24")
+        moved_on = self._appraisal(year="2024-25")
+        self._age(old, 48)
+        self._age(new, 2)
+        self._age(moved_on, 96)
+        transition_appraisal(moved_on, States.REVIEWED_BY_HOD)
+        # Only the state moved_on is in now is left open.
+        self.assertEqual(
+            list(StateTransition.objects.filter(appraisal=moved_on, exited_at__isnull=True).values_list("to_state", flat=True)),
+            [States.REVIEWED_BY_HOD],
+        )
+
+        self.client.force_authenticate(self.principal)
+        response = self.client.get("/api/principal/appraisals/aging/", {"state": "SUBMITTED", "limit": 1})
+        page = response.data["states"][States.SUBMITTED]
+        self.assertEqual([row["appraisal_id"] for row in page["results"]], [old.pk])
+
+        response = self.client.get(
+            "/api/principal/appraisals/aging/",
+            {"state": "SUBMITTED", "limit": 1, "cursor": page["next_cursor"]},
+        )
+        page = response.data["states"][States.SUBMITTED]
+        self.assertEqual([row["appraisal_id"] for row in page["results"]], [new.pk])
+        self.assertIsNone(page["next_cursor"])
+
+    def test_rollup_records_dwell_percentiles(self):
+        appraisal = self._appraisal()
+        self._age(appraisal, 5)
+        transition_appraisal(appraisal, States.REVIEWED_BY_HOD)
+
+        rows = rollup_day(timezone.localdate())
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0].state, rows[0].samples), (States.SUBMITTED, 1))
+        self.assertAlmostEqual(rows[0].p50_seconds, 5 * 3600, delta=60)
+
+
+class ChangeFeedTests(WorkflowTestMixin, TestCase):
+    def test_feed_is_scoped_and_logs_status_and_remarks_changes(self):
+        self.client.force_authenticate(self.hod)
+        cursor = self.client.get("/api/appraisals/changes/").data["cursor"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mine = self._appraisal()
+            self._appraisal(faculty=self.outsider)
+            update_appraisal(mine, remarks="Please attach evidence")
+            update_appraisal(mine, appraisal_data={"x": 1})  # no status/remarks change
+
+        response = self.client.get("/api/appraisals/changes/", {"since": cursor})
+        self.assertEqual(response.status_code, 200)
+        changes = response.data["changes"]
+        self.assertEqual([c["appraisal_id"] for c in changes], [mine.pk, mine.pk])
+        self.assertEqual(changes[-1]["remarks"], "Please attach evidence")
+
+        # Nothing new: the cursor stays put and the page is empty.
+        again = self.client.get("/api/appraisals/changes/", {"since": response.data["cursor"]})
+        self.assertEqual(again.data["changes"], [])
+        self.assertEqual(again.data["cursor"], response.data["cursor"])
+
+        self.client.force_authenticate(self.outsider.user)
+        outsider = self.client.get("/api/appraisals/changes/", {"since": cursor}).data["changes"]
+        self.assertEqual(len(outsider), 1)
+        self.assertNotEqual(outsider[0]["appraisal_id"], mine.pk)
+
+    def test_changes_out_of_a_queue_reach_it_as_removals(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            appraisal = self._appraisal(status=States.REVIEWED_BY_PRINCIPAL)
+        self.client.force_authenticate(self.principal)
+        cursor = self.client.get("/api/appraisals/changes/").data["cursor"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_appraisal(appraisal, States.RETURNED_BY_PRINCIPAL, remarks="Add evidence")
+
+        changes = self.client.get("/api/appraisals/changes/", {"since": cursor}).data["changes"]
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]["from_status"], States.REVIEWED_BY_PRINCIPAL)
+        self.assertEqual(changes[0]["status"], States.RETURNED_BY_PRINCIPAL)
+        self.assertTrue(changes[0]["removed"])
+
+    def test_changes_reach_the_feed_only_once_positioned_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            appraisal = self._appraisal()
+        self.client.force_authenticate(self.faculty.user)
+        cursor = self.client.get("/api/appraisals/changes/").data["cursor"]
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            update_appraisal(appraisal, remarks="Still committing")
+        pending = self.client.get("/api/appraisals/changes/", {"since": cursor}).data
+        self.assertEqual((pending["changes"], pending["cursor"]), ([], cursor))
+
+        for callback in callbacks:
+            callback()
+        changes = self.client.get("/api/appraisals/changes/", {"since": cursor}).data["changes"]
+        self.assertEqual([(c["seq"], c["remarks"]) for c in changes], [(cursor + 1, "Still committing")])
+
+
+class LiveEventTests(WorkflowTestMixin, TestCase):
+    def test_transition_is_pushed_to_faculty_and_hod_after_commit(self):
+        appraisal = self._appraisal()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def subscribe():
+            return [
+                broker.subscribe([f"user:{user_id}"])
+                for user_id in (self.faculty.user_id, self.hod.id, self.outsider.user_id)
+            ]
+
+        subscriptions = loop.run_until_complete(subscribe())
+        for subscription in subscriptions:
+            self.addCleanup(broker.unsubscribe, subscription)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_appraisal(appraisal, States.RETURNED_BY_HOD, remarks="Add evidence")
+        loop.run_until_complete(asyncio.sleep(0))
+
+        faculty, hod, outsider = (subscription.queue for subscription in subscriptions)
+        message = faculty.get_nowait()
+        self.assertEqual(message["event"], "appraisal.returned")
+        self.assertEqual(message["data"]["remarks"], "Add evidence")
+        self.assertEqual(hod.get_nowait()["data"]["appraisal_id"], appraisal.pk)
+        self.assertTrue(outsider.empty())
+
+    async def test_stream_opens_with_a_ticket_and_sends_ready_event(self):
+        self.assertEqual((await self.async_client.get("/api/events/")).status_code, 401)
+        # Access tokens are not accepted in the URL.
+        token = str(AccessToken.for_user(self.faculty.user))
+        self.assertEqual((await self.async_client.get("/api/events/", {"token": token})).status_code, 401)
+
+        issued = await self.async_client.post("/api/events/ticket/", headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(issued.status_code, 200)
+        self.assertEqual(issued.json()["url"], "/api/events/")
+        response = await self.async_client.get("/api/events/", {"ticket": issued.json()["ticket"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = response.streaming_content.__aiter__()
+        self.assertTrue((await chunks.__anext__()).startswith(b"retry:"))
+        self.assertIn(b"event: ready", await chunks.__anext__())
+        await chunks.aclose()
+
+    async def test_events_application_serves_only_the_stream(self):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        scope = {"type": "http", "method": "GET", "path": "/api/me/", "headers": [], "query_string": b""}
+        await events_application(scope, receive, send)
+        self.assertEqual(sent[0]["status"], 404)
+
+    def test_ticket_is_revoked_with_the_users_tokens(self):
+        ticket = issue_ticket(self.faculty.user)
+        self.assertEqual(_ticket_user(ticket), self.faculty.user)
+
+        revoke_tokens(self.faculty.user)
+        self.assertIsNone(_ticket_user(ticket))
+        self.assertIsNone(_ticket_user(str(AccessToken.for_user(self.faculty.user))))
 
-# Create your tests here.
+    def test_stream_is_unavailable_under_wsgi(self):
+        self.assertEqual(self.client.get("/api/events/").status_code, 503)